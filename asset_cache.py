@@ -0,0 +1,81 @@
+"""素材缓存：解码并缩放好的图片按 (路径, 目标尺寸, 模式, 修改时间) 缓存，供 script.py 和 result.py 共用"""
+import os
+from collections import OrderedDict
+from PIL import Image
+from profiler import count_event, profile_stage
+
+# 配置参数
+SPRITE_CACHE_SIZE = 256  # 最多缓存的图片数量，超出后淘汰最久未使用的
+
+
+class SpriteCache:
+    """带 LRU 淘汰的图片缓存，返回可以直接粘贴的图片"""
+
+    def __init__(self, maxsize=SPRITE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, path, size, mode='RGBA', keep_ratio=True):
+        """读取图片并缩放到 size 以内
+
+        size 可以是整数（正方形框）或 (宽, 高)。keep_ratio 为 True 时保持原始比例缩放到框内，
+        宽或高为 None 表示只按另一边缩放；keep_ratio 为 False 时直接拉伸到 size。
+        文件不存在或无法解码时抛出异常，由调用方处理。
+        返回的图片被缓存共享，调用方不要修改它。
+        """
+        if isinstance(size, int):
+            size = (size, size)
+        # 文件被替换后修改时间会变，旧的缓存项自然失效
+        mtime = os.stat(path).st_mtime_ns
+        key = (path, size, mode, keep_ratio, mtime)
+
+        sprite = self._items.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        with profile_stage('sprite_decode'), Image.open(path) as image:
+            if keep_ratio:
+                ratio = min(limit / length for limit, length in zip(size, image.size) if limit is not None)
+                target = (int(image.width * ratio), int(image.height * ratio))
+            else:
+                target = size
+            sprite = image.resize(target)
+            if sprite.mode != mode:
+                sprite = sprite.convert(mode)
+        count_event('image_decode')
+        count_event('image_resize')
+
+        self._items[key] = sprite
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return sprite
+
+    def clear(self):
+        """清空缓存和计数"""
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """返回命中/未命中次数和当前缓存数量"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
+
+
+# 进程内共用的缓存实例
+sprite_cache = SpriteCache()
+
+
+def load_sprite(path, size, mode='RGBA', keep_ratio=True):
+    """从共用缓存中取图片，参数同 SpriteCache.get"""
+    return sprite_cache.get(path, size, mode, keep_ratio)
+
+
+def print_cache_stats():
+    """打印共用缓存的命中情况"""
+    stats = sprite_cache.stats()
+    print(f"素材缓存: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
@@ -0,0 +1,262 @@
+"""头像缩略图缓存：缩放好的 RGBA 头像按源文件内容哈希保存在磁盘上，用线程池提前加载
+
+玩家上传的头像通常是几百到上千像素的原图，每次出图都重新解码再缩到 80 像素很浪费。
+缩略图保存在 .cache/avatars/ 下，文件名由源文件内容的 SHA-1 和目标尺寸组成，
+头像文件被替换后哈希改变，自然用到新的缩略图；(路径, 修改时间, 大小) -> 哈希 记录在索引中，
+源文件没变时不需要重新读取计算哈希。
+不存在的头像记为负缓存，头像目录的修改时间不变（没有新增文件）时不再探测文件系统。
+"""
+import atexit
+import errno
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from PIL import Image
+from font_cache import CACHE_DIR
+from profiler import count_event, profile_stage
+
+# 配置参数
+AVATAR_CACHE_DIR = os.path.join(CACHE_DIR, "avatars")  # 缩略图目录
+AVATAR_MEMORY_SIZE = 2048  # 内存中最多保留的缩略图数量，超出后不再提前加载
+AVATAR_THREADS = 4  # 提前加载头像的线程数
+DIR_RECHECK_INTERVAL = 1.0  # 负缓存：头像目录的修改时间最多每隔这么多秒检查一次
+
+
+def _missing_error(path):
+    return FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+
+class AvatarCache:
+    """头像缩略图的内存 + 磁盘两级缓存"""
+
+    def __init__(self, cache_dir=AVATAR_CACHE_DIR, maxsize=AVATAR_MEMORY_SIZE, threads=AVATAR_THREADS):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.maxsize = maxsize
+        self.threads = threads
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # (路径, 尺寸, 是否保持比例) -> (修改时间, 缩略图)
+        self._pending = {}  # 提前加载中的 (路径, 尺寸, 是否保持比例) -> Future
+        self._executor = None
+        self._hashes = None  # 路径 -> [修改时间, 文件大小, 内容哈希]，第一次使用时从索引文件读取
+        self._missing = {}  # 目录 -> (目录修改时间, 不存在的文件名集合)
+        self._dir_mtimes = {}  # 目录 -> (检查时间, 目录修改时间)
+        self._dirty = False
+
+    # ---- 索引 ----
+
+    def _load_index(self):
+        if self._hashes is not None:
+            return
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                index = json.load(f)
+            self._hashes = dict(index.get('hashes', {}))
+            self._missing = {directory: (mtime, set(names)) for directory, (mtime, names) in index.get('missing', {}).items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            self._hashes = {}
+            self._missing = {}
+
+    def save_index(self):
+        """把哈希索引和负缓存写回磁盘，写入失败不影响出图"""
+        with self._lock:
+            if not self._dirty:
+                return
+            index = {
+                'hashes': self._hashes,
+                'missing': {directory: [mtime, sorted(names)] for directory, (mtime, names) in self._missing.items()},
+            }
+            self._dirty = False
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(tmp_file, mode='w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            print(f"头像缓存索引写入失败: {e}")
+
+    # ---- 负缓存 ----
+
+    def _dir_mtime(self, directory):
+        """头像目录的修改时间，短时间内重复查询时直接用上次的结果"""
+        now = time.monotonic()
+        checked = self._dir_mtimes.get(directory)
+        if checked is not None and now - checked[0] < DIR_RECHECK_INTERVAL:
+            return checked[1]
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        self._dir_mtimes[directory] = (now, mtime)
+        return mtime
+
+    def _known_missing(self, path):
+        directory, name = os.path.split(path)
+        entry = self._missing.get(directory)
+        return entry is not None and name in entry[1] and entry[0] == self._dir_mtime(directory)
+
+    def _mark_missing(self, path):
+        directory, name = os.path.split(path)
+        mtime = self._dir_mtime(directory)
+        with self._lock:
+            entry = self._missing.get(directory)
+            if entry is None or entry[0] != mtime:
+                # 目录有变化，之前记录的缺失文件可能已经补上了
+                entry = self._missing[directory] = (mtime, set())
+            entry[1].add(name)
+            self._dirty = True
+
+    # ---- 加载 ----
+
+    def _content_hash(self, path, stat):
+        """源文件的内容哈希；文件没变时用索引中的结果，返回 (哈希, 已读取的文件内容或 None)"""
+        key = os.path.abspath(path)
+        cached = self._hashes.get(key)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2], None
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            self._hashes[key] = [stat.st_mtime_ns, stat.st_size, digest]
+            self._dirty = True
+        return digest, data
+
+    def _thumbnail_file(self, digest, size, keep_ratio):
+        mode = "fit" if keep_ratio else "stretch"
+        return os.path.join(self.cache_dir, f"{digest}_{size[0]}x{size[1]}_{mode}.png")
+
+    def _decode(self, path, data, size, keep_ratio):
+        """解码原图并缩放，缩放方式与直接 Image.open(...).resize(...) 相同"""
+        with profile_stage('avatar_decode'):
+            with Image.open(io.BytesIO(data) if data is not None else path) as image:
+                if keep_ratio:
+                    ratio = min(size[0] / image.width, size[1] / image.height)
+                    target = (int(image.width * ratio), int(image.height * ratio))
+                else:
+                    target = size
+                thumbnail = image.resize(target)
+            if thumbnail.mode != 'RGBA':
+                thumbnail = thumbnail.convert('RGBA')
+        count_event('image_decode')
+        count_event('image_resize')
+        return thumbnail
+
+    def _store_thumbnail(self, thumbnail, thumbnail_file):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f"{thumbnail_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            thumbnail.save(tmp_file, format='PNG', compress_level=1)
+            os.replace(tmp_file, thumbnail_file)
+        except OSError as e:
+            print(f"头像缩略图写入失败: {e}")
+
+    def _load(self, path, size, keep_ratio):
+        key = (path, size, keep_ratio)
+        with self._lock:
+            self._load_index()
+        if self._known_missing(path):
+            count_event('avatar_missing_cached')
+            raise _missing_error(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._mark_missing(path)
+            raise
+
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None and cached[0] == stat.st_mtime_ns:
+                self._memory.move_to_end(key)
+                count_event('avatar_memory_hit')
+                return cached[1]
+
+        digest, data = self._content_hash(path, stat)
+        thumbnail_file = self._thumbnail_file(digest, size, keep_ratio)
+        thumbnail = None
+        try:
+            with Image.open(thumbnail_file) as cached_image:
+                thumbnail = cached_image.convert('RGBA') if cached_image.mode != 'RGBA' else cached_image.copy()
+            count_event('avatar_thumbnail_hit')
+        except OSError:
+            pass
+        if thumbnail is None:
+            thumbnail = self._decode(path, data, size, keep_ratio)
+            self._store_thumbnail(thumbnail, thumbnail_file)
+
+        with self._lock:
+            self._memory[key] = (stat.st_mtime_ns, thumbnail)
+            if len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+        return thumbnail
+
+    def get(self, path, size, keep_ratio=True):
+        """返回缩放到 size 以内（keep_ratio 为 False 时拉伸到 size）的 RGBA 头像
+
+        size 可以是整数（正方形框）或 (宽, 高)。头像不存在或无法解码时抛出异常。
+        返回的图片被缓存共享，调用方不要修改它。
+        """
+        if isinstance(size, int):
+            size = (size, size)
+        with self._lock:
+            future = self._pending.pop((path, size, keep_ratio), None)
+        if future is not None:
+            return future.result()
+        return self._load(path, size, keep_ratio)
+
+    def prefetch(self, path, size, keep_ratio=True):
+        """在后台线程中提前加载头像，之后 get 同样的参数时直接取结果"""
+        if isinstance(size, int):
+            size = (size, size)
+        key = (path, size, keep_ratio)
+        with self._lock:
+            if key in self._pending or key in self._memory:
+                return
+            if len(self._pending) + len(self._memory) >= self.maxsize:
+                return  # 内存放不下了，剩下的头像绘制时再加载
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="avatar")
+            self._pending[key] = self._executor.submit(self._load, path, size, keep_ratio)
+
+    def _before_fork(self):
+        """fork 之前等提前加载全部完成：加载线程可能正拿着锁（包括 Pillow 按需导入插件时的导入锁），
+        子进程中没有这些线程，锁永远不会释放，未完成的提前加载也永远等不到结果"""
+        with self._lock:
+            pending = list(self._pending.values())
+        wait(pending)
+
+    def _after_fork_in_child(self):
+        """子进程中没有父进程的加载线程，重新创建锁和线程池；已完成的提前加载结果照常使用"""
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def clear(self):
+        """清空内存中的缩略图（磁盘缓存保留）"""
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            self._memory.clear()
+
+
+# 进程内共用的头像缓存，进程退出时保存索引
+avatar_cache = AvatarCache()
+atexit.register(avatar_cache.save_index)
+if hasattr(os, 'register_at_fork'):  # 渲染进程池用 fork 启动进程
+    os.register_at_fork(before=avatar_cache._before_fork, after_in_child=avatar_cache._after_fork_in_child)
+
+
+def load_avatar(path, size, keep_ratio=True):
+    """从共用缓存中取头像，参数同 AvatarCache.get"""
+    return avatar_cache.get(path, size, keep_ratio)
+
+
+def prefetch_avatar(path, size, keep_ratio=True):
+    """在后台提前加载头像，参数同 AvatarCache.get"""
+    avatar_cache.prefetch(path, size, keep_ratio)
@@ -0,0 +1,187 @@
+"""批量出图：一次处理多个轮次的CSV，每轮写到自己的输出文件，多个轮次在进程池中并行
+
+用法:
+    python batch.py rounds/ --output-dir out/
+    python batch.py day1.csv day2.csv result_day1.csv --logos day2=team_logos/day2 --workers 4
+
+CSV 的类型自动识别：
+    腾讯文档导出的CSV（同 input.csv）  -> 预测图 out/<文件名>.png，中间CSV out/<文件名>_output.csv
+    第一行是“结果”的中间CSV（同 result.csv） -> 评分后的表格 out/<文件名>.png
+    其他中间CSV（同 output.csv）        -> 预测图 out/<文件名>.png
+每轮的队伍标志按表头中的队名在标志索引中查找（见 logo_index.py）；表头中没有队名或找不到时使用 match{n}_left/right.png，
+这些文件所在的目录：--logos 指定的优先，其次是 team_logos/<文件名>/（存在时），否则使用 team_logos/。
+所有渲染进程共用主进程查找到的字体；每个进程的字体和素材缓存在多个轮次之间复用，头像缩略图通过磁盘缓存共享。
+"""
+import csv
+import os
+import time
+import board
+import result
+import script
+from avatar_cache import avatar_cache
+from font_cache import find_system_chinese_font, load_fonts
+from image_encode import DEFAULT_PRESET, ENCODE_PRESETS, output_path
+from predictions import read_predictions_csv
+
+# 配置参数
+BATCH_OUTPUT_DIR = "batch_output"  # 默认输出目录
+ANSWER_ROW_LABEL = "结果"  # result.csv 中标准答案行的昵称
+
+
+def detect_kind(csv_path):
+    """识别CSV类型：export（腾讯文档导出）、result（带标准答案）、predictions（中间CSV）"""
+    with open(csv_path, mode='r', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        first_row = next((row for row in reader if row), [])
+    if not headers or headers[0].strip() != '昵称':
+        return 'export'
+    if first_row and first_row[0].strip() == ANSWER_ROW_LABEL:
+        return 'result'
+    return 'predictions'
+
+
+def collect_inputs(paths):
+    """展开输入：目录取其中所有 .csv 文件（按文件名排序）"""
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            inputs.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith('.csv'))
+        else:
+            inputs.append(path)
+    return inputs
+
+
+def round_logo_dir(stem, logo_map):
+    """一轮使用的队伍标志目录"""
+    if stem in logo_map:
+        return logo_map[stem]
+    per_round = os.path.join(board.TEAM_LOGO_DIR, stem)
+    return per_round if os.path.isdir(per_round) else board.TEAM_LOGO_DIR
+
+
+def plan_rounds(inputs, output_dir, logo_map, write_csv=True, preset=DEFAULT_PRESET):
+    """为每个输入生成一轮任务，输出文件名由输入文件名决定，不会互相覆盖"""
+    rounds = []
+    seen = {}
+    for input_file in inputs:
+        stem = os.path.splitext(os.path.basename(input_file))[0]
+        if stem in seen:
+            raise ValueError(f"输入文件重名，输出会互相覆盖: {seen[stem]} 和 {input_file}")
+        seen[stem] = input_file
+        kind = detect_kind(input_file)
+        rounds.append({
+            'input': input_file,
+            'kind': kind,
+            'logo_dir': round_logo_dir(stem, logo_map),
+            'output_image': os.path.join(output_dir, f"{stem}.png"),
+            'output_csv': os.path.join(output_dir, f"{stem}_output.csv") if write_csv and kind == 'export' else None,
+            'preset': preset,
+        })
+    return rounds
+
+
+def _init_batch_worker(font_path):
+    """渲染进程初始化：使用主进程查找到的字体，只加载一次"""
+    board.FONT_PATH = font_path
+    load_fonts(font_path)
+
+
+def render_round(job):
+    """渲染一轮，返回统计；失败时返回错误信息而不是抛出异常，不影响其他轮次"""
+    start = time.perf_counter()
+    stats = {'input': job['input'], 'kind': job['kind'], 'players': 0, 'outputs': [], 'error': None}
+    # 每个进程同一时间只渲染一轮，按轮次切换队伍标志目录（素材缓存按完整路径区分，不会混用）
+    board.TEAM_LOGO_DIR = job['logo_dir']
+    try:
+        if job['kind'] == 'result':
+            predictions = result.generate_table_visualization(job['input'], preset=job['preset'],
+                                                              output_file=job['output_image'])
+            outputs = [output_path(job['output_image'], job['preset'])]
+        else:
+            if job['kind'] == 'export':
+                predictions = script.process_predictions(job['input'], job['output_csv'])
+            else:
+                predictions = read_predictions_csv(job['input'])
+            outputs = script.generate_table_visualization(predictions, preset=job['preset'],
+                                                          output_image=job['output_image'])
+        stats['players'] = predictions.num_players
+        stats['outputs'] = outputs
+    except Exception as e:
+        stats['error'] = f"{type(e).__name__}: {e}"
+    # 进程池的工作进程退出时不执行 atexit，每轮结束后直接保存头像索引和负缓存
+    avatar_cache.save_index()
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def run_batch(rounds, workers=1):
+    """渲染所有轮次，workers 大于 1 时在进程池中并行，返回每轮的统计（顺序与输入相同）"""
+    font_path = find_system_chinese_font()
+    if workers > 1 and len(rounds) > 1:
+        from concurrent.futures import ProcessPoolExecutor  # 只有并行时才需要 multiprocessing
+        with ProcessPoolExecutor(max_workers=min(workers, len(rounds)), initializer=_init_batch_worker,
+                                 initargs=(font_path,)) as pool:
+            return list(pool.map(render_round, rounds))
+    _init_batch_worker(font_path)
+    return [render_round(job) for job in rounds]
+
+
+def print_summary(results, elapsed):
+    """打印每轮的结果和整体吞吐量"""
+    print()
+    print("批量出图结果:")
+    for stats in results:
+        if stats['error']:
+            print(f"  [失败] {stats['input']}: {stats['error']}")
+        else:
+            print(f"  {stats['input']} ({stats['kind']}, {stats['players']} 人, {stats['seconds']:.2f} 秒) -> "
+                  f"{', '.join(stats['outputs'])}")
+    done = [stats for stats in results if not stats['error']]
+    players = sum(stats['players'] for stats in done)
+    print(f"共 {len(results)} 轮，成功 {len(done)} 轮，{players} 人，总用时 {elapsed:.2f} 秒，"
+          f"{len(done) / elapsed:.2f} 轮/秒，{players / elapsed:.0f} 人/秒")
+
+
+def main(paths, output_dir=BATCH_OUTPUT_DIR, logo_map=None, workers=1, write_csv=True, preset=DEFAULT_PRESET):
+    """批量处理入口，返回失败的轮次数"""
+    inputs = collect_inputs(paths)
+    if not inputs:
+        print("没有找到要处理的CSV文件")
+        return 0
+    os.makedirs(output_dir, exist_ok=True)
+    rounds = plan_rounds(inputs, output_dir, logo_map or {}, write_csv, preset)
+
+    start = time.perf_counter()
+    results = run_batch(rounds, workers)
+    print_summary(results, time.perf_counter() - start)
+    return sum(1 for stats in results if stats['error'])
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="批量出图: python batch.py rounds/ --output-dir out/")
+    parser.add_argument('inputs', nargs='+', help="CSV文件或包含CSV文件的目录")
+    parser.add_argument('--output-dir', default=BATCH_OUTPUT_DIR, help="输出目录")
+    parser.add_argument('--logos', action='append', default=[], metavar='文件名=目录',
+                        help="指定某一轮的队伍标志目录，如 day2=team_logos/day2，可重复")
+    parser.add_argument('--workers', type=int, default=0, help="并行的进程数，0 表示使用全部CPU核心")
+    parser.add_argument('--no-csv', action='store_true', help="不写出中间CSV文件")
+    parser.add_argument('--encode', choices=list(ENCODE_PRESETS), default=DEFAULT_PRESET, help="输出编码预设")
+    args = parser.parse_args()
+
+    logo_map = {}
+    for item in args.logos:
+        stem, sep, logo_dir = item.partition('=')
+        if not sep:
+            parser.error(f"--logos 的格式应为 文件名=目录: {item}")
+        logo_map[stem] = logo_dir
+
+    try:
+        failures = main(args.inputs, args.output_dir, logo_map, args.workers or os.cpu_count() or 1,
+                        not args.no_csv, args.encode)
+    except ValueError as e:
+        parser.error(str(e))
+    sys.exit(1 if failures else 0)
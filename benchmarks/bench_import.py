@@ -0,0 +1,140 @@
+"""启动时间基准测试：在新的解释器中导入各个入口模块，用 -X importtime 计时，并检查有没有导入不该导入的重量级模块
+
+用法:
+    python benchmarks/bench_import.py                          # 结果打印为 JSON
+    python benchmarks/bench_import.py --repeat 10 --output import.json
+    python benchmarks/bench_import.py --compare import.json    # 与上次的结果对比，变慢超过阈值时返回非零
+
+script.py 和 result.py 的默认路径只需要标准库和 Pillow：numpy（评分、情形分析）、matplotlib（查找字体）、
+multiprocessing（多进程渲染）都要等到用到时才导入。某个入口在启动时导入了 FORBIDDEN 中的模块时同样返回非零。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["script", "result", "batch", "incremental", "render_server", "season"]
+HEAVY_MODULES = ["numpy", "pandas", "matplotlib", "multiprocessing"]  # 导入耗时明显的模块，结果中列出各入口导入了哪些
+FORBIDDEN = {  # 入口模块 -> 启动时不应导入的模块
+    "script": ["numpy", "pandas", "matplotlib", "multiprocessing"],
+    "result": ["numpy", "pandas", "matplotlib", "multiprocessing"],
+    "batch": ["numpy", "pandas", "matplotlib", "multiprocessing"],
+    "incremental": ["numpy", "pandas", "matplotlib", "multiprocessing"],
+}
+
+
+def import_once(module):
+    """在新的解释器中导入 module，返回 (导入耗时秒, {顶层包: 累计耗时秒})"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr[-2000:]}")
+    packages = {}
+    total = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.rstrip()
+        top = name.strip().split(".")[0]
+        seconds = int(cumulative) / 1e6
+        packages[top] = max(packages.get(top, 0.0), seconds)
+        if name == f" {module}":  # 入口模块本身在最外层
+            total = seconds
+    return total, packages
+
+
+def measure(module, repeat):
+    """导入 repeat 次，耗时取最小值"""
+    runs = [import_once(module) for _ in range(repeat)]
+    total, packages = min(runs, key=lambda run: run[0])
+    slowest = sorted(((name, seconds) for name, seconds in packages.items() if name != module),
+                     key=lambda item: -item[1])[:5]
+    return {
+        "module": module,
+        "import_s": round(total, 6),
+        "heavy": [name for name in HEAVY_MODULES if name in packages],
+        "slowest": {name: round(seconds, 6) for name, seconds in slowest},
+    }
+
+
+def check_forbidden(results):
+    """打印启动时导入了不该导入的模块的入口，返回违规数"""
+    violations = 0
+    for case in results:
+        for name in FORBIDDEN.get(case["module"], []):
+            if name in case["heavy"]:
+                print(f"{case['module']} 启动时导入了 {name}", file=sys.stderr)
+                violations += 1
+    return violations
+
+
+def compare(old_report, new_report, threshold, min_delta):
+    """打印两次结果的对比，返回变慢超过阈值（且超过 min_delta 秒）的入口数"""
+    old_cases = {r["module"]: r for r in old_report["results"]}
+    regressions = 0
+    for case in new_report["results"]:
+        old = old_cases.get(case["module"])
+        if old is None or old["import_s"] <= 0:
+            continue
+        ratio = case["import_s"] / old["import_s"]
+        flag = ""
+        if ratio > 1 + threshold and case["import_s"] - old["import_s"] > min_delta:
+            flag = "  <-- 变慢"
+            regressions += 1
+        added = sorted(set(case["heavy"]) - set(old["heavy"]))
+        if added:
+            flag += f"  新导入: {', '.join(added)}"
+        print(f"{case['module']:<14} {old['import_s'] * 1000:8.1f}ms -> {case['import_s'] * 1000:8.1f}ms  "
+              f"x{ratio:.2f}{flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动时间基准测试")
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES, help="要测的入口模块")
+    parser.add_argument('--repeat', type=int, default=5, help="每个模块导入次数，取最小值")
+    parser.add_argument('--output', help="结果JSON文件（默认打印到标准输出）")
+    parser.add_argument('--compare', help="与之前的结果JSON对比")
+    parser.add_argument('--threshold', type=float, default=0.2, help="对比时视为变慢的比例")
+    parser.add_argument('--min-delta', type=float, default=0.005, help="对比时忽略小于这么多秒的变化（计时抖动）")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        case = measure(module, args.repeat)
+        print(json.dumps(case, ensure_ascii=False), file=sys.stderr)
+        results.append(case)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failed = check_forbidden(results)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            old_report = json.load(f)
+        failed += compare(old_report, report, args.threshold, args.min_delta)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""出图流程基准测试：用合成数据分别计时 解析、评分、渲染、PNG编码 四个阶段
+
+用法:
+    python benchmarks/bench_pipeline.py                       # 默认规模，结果打印为 JSON
+    python benchmarks/bench_pipeline.py --players 10 1000 --matches 4 --output new.json
+    python benchmarks/bench_pipeline.py --compare old.json     # 与上次的结果对比，变慢超过阈值时返回非零
+
+玩家数不超过 --render-limit 时与默认出图相同：script.render_full_image 画出整张图，再用 save_image 编码保存；
+更大的规模直接调用 script.save_streamed 写出一整张 PNG（与 --stream 模式相同，内存占用不随玩家数量增长），
+调色板和 WebP 预设不能流式写入，改用 script.save_paginated 分页保存（与 --rows-per-page 相同）；
+渲染和编码的时间取自运行统计中的 encode 阶段（整段时间减去编码即为渲染）。
+玩家数超过 --strip-limit 的规模只测解析和评分，结果中标为 "render_mode": "skipped"。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import PIL
+import board
+import script
+from image_encode import DEFAULT_PRESET, ENCODE_PRESETS, output_path, save_image, stream_compress_level
+from profiler import profiler
+from scoring import score_round
+from synthetic import write_input_csv, write_stub_assets
+
+DEFAULT_PLAYERS = [10, 1000, 10000, 100000]
+DEFAULT_MATCHES = [4, 32]
+STAGES = ["parse", "score", "render", "encode"]
+PAGE_ROWS = 1000  # 不能流式写入的编码预设分页保存时每页的行数
+
+
+def time_stage(func, *args):
+    """执行一次 func，返回 (结果, 墙钟时间秒)；阶段内的进度输出被丢弃"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+    return result, elapsed
+
+
+def render_and_save(predictions, fonts, output_image, preset=DEFAULT_PRESET):
+    """与默认出图相同，渲染整张图并编码保存，返回 (渲染秒, 编码秒, 输出字节数)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        img = script.render_full_image(predictions, fonts)
+        render_time = time.perf_counter() - start
+        encode_time, output_bytes = save_image(img, output_path(output_image, preset), preset)
+    return render_time, encode_time, output_bytes
+
+
+def streaming_mode(preset=DEFAULT_PRESET):
+    """大规模时的出图方式：PNG 预设流式写入一整张图，其余预设分页保存"""
+    try:
+        stream_compress_level(preset)
+    except ValueError:
+        return "pages"
+    return "stream"
+
+
+def render_and_stream(predictions, fonts, output_image, preset=DEFAULT_PRESET):
+    """与 --stream（或 --rows-per-page）模式相同地写出文件，返回 (渲染秒, 编码秒, 输出字节数)"""
+    output_image = output_path(output_image, preset)
+    profiler.reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if streaming_mode(preset) == "stream":
+            output_files = script.save_streamed(predictions, fonts, output_image, preset=preset)
+        else:
+            output_files = script.save_paginated(predictions, PAGE_ROWS, fonts, output_image, preset=preset)
+        elapsed = time.perf_counter() - start
+    encode_time = profiler.stages.get('encode', [0, 0.0, 0.0])[1]
+    output_bytes = sum(os.path.getsize(path) for path in output_files)
+    for path in output_files:
+        os.remove(path)  # 大图只用于计时，不留在合成数据目录中
+    return elapsed - encode_time, encode_time, output_bytes
+
+
+def run_case(workdir, num_players, num_matches, render_limit, strip_limit, repeat, seed, preset=DEFAULT_PRESET):
+    """测一个规模，每个阶段重复 repeat 次取最小值"""
+    input_file = os.path.join(workdir, f"input_{num_players}x{num_matches}.csv")
+    write_input_csv(input_file, num_players, num_matches, seed=seed)
+    answers = np.random.default_rng(seed).integers(1, 3, size=num_matches, dtype=np.int8)
+    fonts = script.load_table_fonts()
+
+    result = {"players": num_players, "matches": num_matches}
+    if num_players > strip_limit:
+        result["render_mode"] = "skipped"
+        print(f"{num_players} 人超过 --strip-limit {strip_limit}，跳过渲染和编码，只测解析和评分", file=sys.stderr)
+    timings = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        predictions, elapsed = time_stage(script.process_predictions, input_file, None, False)
+        timings["parse"].append(elapsed)
+        _, elapsed = time_stage(score_round, predictions, answers)
+        timings["score"].append(elapsed)
+        if num_players <= render_limit:
+            result["render_mode"] = "full"
+            render_time, encode_time, output_bytes = render_and_save(
+                predictions, fonts, os.path.join(workdir, f"output_{num_players}x{num_matches}.png"), preset)
+        elif num_players <= strip_limit:
+            result["render_mode"] = streaming_mode(preset)
+            render_time, encode_time, output_bytes = render_and_stream(
+                predictions, fonts, os.path.join(workdir, f"output_{num_players}x{num_matches}.png"), preset)
+        else:
+            continue
+        timings["render"].append(render_time)
+        timings["encode"].append(encode_time)
+        result["output_bytes"] = output_bytes
+
+    for stage, values in timings.items():
+        if values:
+            result[f"{stage}_s"] = round(min(values), 6)
+    return result
+
+
+def compare(old_report, new_report, threshold):
+    """打印两次结果的对比，返回变慢超过阈值的条目数"""
+    old_cases = {(r["players"], r["matches"]): r for r in old_report["results"]}
+    regressions = 0
+    for case in new_report["results"]:
+        old = old_cases.get((case["players"], case["matches"]))
+        if old is None:
+            continue
+        for stage in STAGES:
+            key = f"{stage}_s"
+            if stage in ("render", "encode") and case.get("render_mode") != old.get("render_mode"):
+                continue  # 整张图、流式写入和分页保存的耗时不可比
+            if key not in case or key not in old or old[key] <= 0:
+                continue
+            ratio = case[key] / old[key]
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  <-- 变慢"
+                regressions += 1
+            print(f"{case['players']:>7} 人 {case['matches']:>3} 场 {stage:<7} "
+                  f"{old[key]:9.4f}s -> {case[key]:9.4f}s  x{ratio:.2f}{flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="出图流程基准测试")
+    parser.add_argument('--players', type=int, nargs='+', default=DEFAULT_PLAYERS, help="玩家数量")
+    parser.add_argument('--matches', type=int, nargs='+', default=DEFAULT_MATCHES, help="比赛场数")
+    parser.add_argument('--render-limit', type=int, default=100, help="不超过这个玩家数时渲染整张图（同默认出图）")
+    parser.add_argument('--strip-limit', type=int, default=10000, help="超过这个玩家数的规模不测渲染和编码（结果中标为 skipped），其余与 --stream 模式相同地写出")
+    parser.add_argument('--repeat', type=int, default=1, help="每个阶段重复次数，取最小值")
+    parser.add_argument('--encode', choices=list(ENCODE_PRESETS), default=DEFAULT_PRESET, help="编码预设")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--workdir', help="合成数据目录（默认使用临时目录）")
+    parser.add_argument('--output', help="结果JSON文件（默认打印到标准输出）")
+    parser.add_argument('--compare', help="与之前的结果JSON对比")
+    parser.add_argument('--threshold', type=float, default=0.2, help="对比时视为变慢的比例")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory(prefix="zvl_bench_"))
+        workdir = os.path.abspath(workdir)
+        os.makedirs(workdir, exist_ok=True)
+        write_stub_assets(workdir, max(args.matches), seed=args.seed)
+        # script.py 使用相对路径查找素材，切换到合成数据目录
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            results = []
+            for num_matches in args.matches:
+                for num_players in args.players:
+                    case = run_case(workdir, num_players, num_matches, args.render_limit, args.strip_limit,
+                                    args.repeat, args.seed, args.encode)
+                    print(json.dumps(case, ensure_ascii=False), file=sys.stderr)
+                    results.append(case)
+        finally:
+            os.chdir(previous_cwd)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "encode_preset": args.encode,
+            "font": board.FONT_PATH,  # 字体不同时渲染结果和PNG大小也不同
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            old_report = json.load(f)
+        if compare(old_report, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""合成测试数据：生成与 input.csv 格式相同的腾讯文档导出CSV，以及占位用的头像、队伍标志和背景图"""
+import csv
+import os
+import random
+from PIL import Image, ImageDraw
+
+# 常见答案写法及其出现权重（参考实际导出的 input.csv）
+ANSWER_MIX = [
+    ("2：0", 26),
+    ("0：2", 22),
+    ("2：1", 12),
+    ("1：2", 12),
+    ("1：1左赢", 8),
+    ("1：1右赢", 8),
+    ("右边赢，不想预测分数了", 4),
+    ("左边赢", 3),
+    ("2:0", 2),  # 半角冒号
+    (" 0 ： 2 ", 2),  # 多余空格
+    ("不知道", 1),  # 无法识别
+]
+TEAM_NAMES = ["AWG", "AXIZ", "RC", "Omni", "RD", "ZETA", "RVL", "FL", "GG", "TE", "MRC", "ITZY"]
+
+
+def match_header(match_idx):
+    """第 match_idx 场比赛的表头，如 "AWG vs AXIZ 的比分会是？（必填）" """
+    left = TEAM_NAMES[(2 * match_idx) % len(TEAM_NAMES)]
+    right = TEAM_NAMES[(2 * match_idx + 1) % len(TEAM_NAMES)]
+    return f"{left} vs {right} 的比分会是？（必填）"
+
+
+def nickname(player_idx, avatar_count):
+    """玩家昵称，循环使用 avatar_count 个有头像的昵称"""
+    return f"玩家{player_idx % avatar_count}"
+
+
+def write_input_csv(path, num_players, num_matches, avatar_count=256, seed=0):
+    """生成 num_players 条提交、num_matches 场比赛的输入CSV"""
+    rng = random.Random(seed)
+    answers = [answer for answer, _ in ANSWER_MIX]
+    weights = [weight for _, weight in ANSWER_MIX]
+    with open(path, mode='w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["\ufeff提交者（自动）", "提交时间（自动）", "大帅的昵称是？（必填）"]
+                        + [match_header(i) for i in range(num_matches)])
+        for i in range(num_players):
+            minute, second = divmod(i, 60)
+            writer.writerow([f"提交者{i}", f"2025/4/15 {19 + minute // 60 % 5}:{minute % 60:02d}:{second:02d}",
+                             nickname(i, avatar_count)]
+                            + rng.choices(answers, weights, k=num_matches))
+
+
+def _stub_image(path, size, color, mark=None):
+    """纯色方块，mark 不为空时画上简单的图形，避免所有占位图完全相同"""
+    image = Image.new('RGBA', size, color)
+    if mark is not None:
+        draw = ImageDraw.Draw(image)
+        w, h = size
+        draw.ellipse([w // 5, h // 5, w * 4 // 5, h * 4 // 5], fill=mark)
+    image.save(path)
+
+
+def write_stub_assets(root, max_matches, avatar_count=256, seed=0):
+    """在 root 下生成 avatars/、team_logos/、background/ 目录及占位图"""
+    rng = random.Random(seed)
+    for name in ("avatars", "team_logos", "background"):
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    for i in range(avatar_count):
+        path = os.path.join(root, "avatars", f"{nickname(i, avatar_count)}.png")
+        if not os.path.exists(path):
+            color = tuple(rng.randrange(256) for _ in range(3)) + (255,)
+            _stub_image(path, (512, 512), color, mark=(255, 255, 255, 255))
+
+    for i in range(max_matches):
+        for side in ("left", "right"):
+            path = os.path.join(root, "team_logos", f"match{i+1}_{side}.png")
+            if not os.path.exists(path):
+                color = tuple(rng.randrange(256) for _ in range(3)) + (255,)
+                _stub_image(path, (200, 200), color, mark=(0, 0, 0, 128))
+
+    _stub_image(os.path.join(root, "background", "head.png"), (1280, 300), (40, 60, 40, 255))
+    _stub_image(os.path.join(root, "background", "foot.png"), (1280, 400), (30, 40, 30, 255))
@@ -0,0 +1,489 @@
+"""出图引擎：预测图（script.py）和评分表（result.py）共用的表格布局和列类型
+
+一张表由若干列组成：名次、头像昵称、每场比赛的预测、正确场次、情形分析……每种列是一个 Column 子类，
+只负责画表头中的这一列和每行中的这一格。Board 创建时算好一次布局（每列的起点），
+每列第一次遇到某种格子（某场比赛选左/选右/平局）时算好图标或文字的位置，之后每行只是按位置粘贴。
+两种表的尺寸、颜色和画法上的差别都在 BoardStyle 中，列的组合由各自的模块（script.py、result.py、season.py）决定。
+字体、头像和队伍标志的位置，以及多进程渲染的进程池也由两种表共用。
+"""
+import os
+from collections import deque, namedtuple
+from PIL import Image, ImageDraw
+from asset_cache import load_sprite
+from avatar_cache import load_avatar
+from font_cache import find_system_chinese_font, load_fonts
+from logo_index import set_match_titles, team_logo_path
+from predictions import PICK_LABELS, PICK_SIDES
+from profiler import record_failure
+from text_cache import draw_text, text_bbox
+
+# 配置参数
+FONT_PATH = None  # 初始设为None，会自动查找系统中文字体
+AVATAR_DIR = "avatars"  # 头像目录
+TEAM_LOGO_DIR = "team_logos"  # 队伍标志目录（批量出图时按轮次切换）
+
+CHINESE_NUMBERS = ["一", "二", "三", "四", "五", "六", "七", "八", "九", "十"]
+
+# 表格中的一行：预测图只用昵称和预测，评分表还有是否正确、正确场次和情形分析
+BoardRow = namedtuple('BoardRow', ['nickname', 'picks', 'correct', 'correct_count', 'best_rank', 'probability'],
+                      defaults=((), None, None, None, None))
+
+
+def avatar_path(nickname):
+    """玩家头像文件路径"""
+    return os.path.join(AVATAR_DIR, f"{nickname}.png")
+
+
+def team_logo(match_idx, side):
+    """第 match_idx 场（从0开始）左边或右边队伍的标志路径"""
+    return team_logo_path(TEAM_LOGO_DIR, match_idx, side)
+
+
+def load_table_fonts():
+    """返回 (大, 中, 小) 三种字体 - 优先使用系统中文字体"""
+    global FONT_PATH
+    if FONT_PATH is None:
+        FONT_PATH = find_system_chinese_font()
+    return load_fonts(FONT_PATH)
+
+
+class BoardStyle:
+    """一种表的尺寸、颜色和画法
+
+    overlay 为 True 时（预测图）表格画在背景图上：图片保持比例并按透明度粘贴，加载失败时打印提示；
+    为 False 时（评分表）表格有底色和分割线：图片拉伸到固定大小，头像缺失时画占位框。
+    avatar_path(昵称) 和 logo_path(比赛下标, 'left'/'right') 返回图片路径，每次出图时调用，目录可以在运行中修改。
+    """
+
+    def __init__(self, header_height, row_height, header_row_y, header_row_height, avatar_path, logo_path,
+                 overlay=True, margin=0, col_spacing=0, title="", title_y=0, header_background=None, header_fill=None,
+                 header_text_color=(255, 255, 255), text_color=(255, 255, 255), header_logo_size=80,
+                 header_logo_spacing=5, match_labels=False, pick_logo_size=100, avatar_size=80, avatar_top=20,
+                 name_top=110, row_colors=None, grid_color=None, border_width=0, pick_colors=None):
+        self.header_height = header_height
+        self.row_height = row_height
+        self.header_row_y = header_row_y  # 表头第二行（各列标题）的起点和高度
+        self.header_row_height = header_row_height
+        self.avatar_path = avatar_path
+        self.logo_path = logo_path
+        self.overlay = overlay
+        self.margin = margin  # 左右边距
+        self.col_spacing = col_spacing  # 相邻两场比赛列之间的间距
+        self.title = title
+        self.title_y = title_y
+        self.header_background = header_background  # 整个表头的底色，None 表示不画（用背景图）
+        self.header_fill = header_fill  # 表头中每列的底色
+        self.header_outline = (50, 50, 50)
+        self.header_text_color = header_text_color
+        self.text_color = text_color  # 表格内容中文字的颜色
+        self.header_logo_size = header_logo_size  # 表头中队伍标志的大小
+        self.header_logo_spacing = header_logo_spacing  # 表头中两个队伍标志（和场次文字）之间的间距
+        self.match_labels = match_labels  # 表头中两个队伍标志之间是否写“第N场”
+        self.pick_logo_size = pick_logo_size  # 预测格子中队伍标志的大小
+        self.avatar_size = avatar_size
+        self.avatar_top = avatar_top  # 头像和昵称相对行顶部的位置
+        self.name_top = name_top
+        self.row_colors = row_colors  # 行背景（交替颜色），None 表示没有行背景
+        self.grid_color = grid_color
+        self.border_width = border_width
+        self.pick_colors = pick_colors  # (预测正确, 预测错误) 的格子底色
+
+
+class Column:
+    """表格中的一列：width 是列宽，grid 表示这一列是否在整行背景（底色和分割线）范围内"""
+
+    grid = True
+
+    def __init__(self, width, title=""):
+        self.width = width
+        self.title = title
+        self.style = None
+        self.fonts = None
+        self.board = None
+
+    def bind(self, style, fonts, board=None):
+        """绑定到一张表的样式和字体（board 是所在的表，单独使用这一列时为 None）"""
+        self.style = style
+        self.fonts = fonts
+        self.board = board
+        return self
+
+    def draw_header(self, img, draw, x):
+        """画表头中这一列：底色和居中的列标题"""
+        style = self.style
+        if style.header_fill is not None:
+            draw.rectangle([x, style.header_row_y, x + self.width, style.header_height],
+                           fill=style.header_fill, outline=style.header_outline)
+        if self.title:
+            font_medium = self.fonts[1]
+            bbox = text_bbox(self.title, font_medium)
+            draw_text(img, (x + self.width//2 - (bbox[2] - bbox[0])//2,
+                            style.header_row_y + (style.header_row_height - (bbox[3] - bbox[1]))//2),
+                      self.title, style.header_text_color, font_medium)
+
+    def draw_row_background(self, draw, x, color):
+        """在整行背景上画这一列的额外部分（默认没有）"""
+
+    def draw_cell(self, img, draw, x, y, row_idx, row):
+        """画第 row_idx 行（顶部位于 y）中这一列的格子"""
+        raise NotImplementedError
+
+
+class PlayerColumn(Column):
+    """头像和昵称"""
+
+    def draw_cell(self, img, draw, x, y, row_idx, row):
+        self.draw_player(img, draw, x, y, row.nickname, self.fonts[2])
+
+    def draw_player(self, img, draw, x, y, nickname, font_small):
+        """在从 x 开始的这一列中画头像和昵称"""
+        style = self.style
+        x_center = x + self.width//2
+        half = style.avatar_size//2
+        try:
+            avatar = load_avatar(style.avatar_path(nickname), style.avatar_size, keep_ratio=style.overlay)
+            if style.overlay:
+                # 保持比例的 RGBA 缩略图，按透明度粘贴
+                img.paste(avatar, (x_center - avatar.width//2, y + style.avatar_top), avatar)
+            else:
+                img.paste(avatar, (x_center - half, y + style.avatar_top))
+        except Exception as e:
+            record_failure('avatar', e)
+            if style.overlay:
+                print(f"头像加载失败: {e}")
+            else:
+                # 头像缺失时画占位框
+                draw.rectangle([x_center - half, y + style.avatar_top, x_center + half, y + style.avatar_top + style.avatar_size],
+                               outline=(100, 100, 100))
+                draw_text(img, (x_center - half//2, y + style.avatar_top + 30), "头像", (100, 100, 100), font_small)
+
+        bbox = text_bbox(nickname, font_small)
+        draw_text(img, (x_center - (bbox[2] - bbox[0])//2, y + style.name_top), nickname, style.text_color, font_small)
+
+
+class PickColumn(Column):
+    """一场比赛：表头是两队的标志，格子中是所选一方的标志（平局或无法识别时是文字）"""
+
+    def __init__(self, width, match_idx):
+        super().__init__(width)
+        self.match_idx = match_idx
+        self._marks = {}  # 预测编码 -> (图标, 文字, 相对格子左上角的 x, y)
+
+    def match_label(self):
+        num = self.match_idx
+        return f"第{CHINESE_NUMBERS[num] if num < len(CHINESE_NUMBERS) else num + 1}场"
+
+    def draw_header(self, img, draw, x):
+        style = self.style
+        if style.header_fill is not None:
+            draw.rectangle([x, style.header_row_y, x + self.width, style.header_height],
+                           fill=style.header_fill, outline=style.header_outline)
+        font_medium = self.fonts[1]
+        row_y, row_height = style.header_row_y, style.header_row_height
+        label = self.match_label() if style.match_labels else None
+
+        try:
+            logos = [load_sprite(style.logo_path(self.match_idx, side), style.header_logo_size, keep_ratio=style.overlay)
+                     for side in ("left", "right")]
+        except Exception as e:
+            if style.overlay:
+                print(f"队伍标志加载失败: {e}")
+            record_failure('team_logo', e)
+            # 如果图标加载失败，只绘制文字
+            text = label or f"比赛 {self.match_idx + 1}"
+            bbox = text_bbox(text, font_medium)
+            draw_text(img, (x + (self.width - (bbox[2] - bbox[0]))//2, row_y + (row_height - (bbox[3] - bbox[1]))//2),
+                      text, style.header_text_color, font_medium)
+            return
+
+        # 左图标、（场次文字、）右图标依次排开，整体居中
+        items = [(logos[0], logos[0].width)]
+        if label:
+            bbox = text_bbox(label, font_medium)
+            items.append((label, bbox[2] - bbox[0]))
+        items.append((logos[1], logos[1].width))
+        total_width = sum(width for _, width in items) + style.header_logo_spacing * (len(items) - 1)
+        cursor = x + (self.width - total_width)//2
+        for item, width in items:
+            if isinstance(item, str):
+                draw_text(img, (cursor, row_y + (row_height - (bbox[3] - bbox[1]))//2), item, style.header_text_color,
+                          font_medium)
+            else:
+                img.paste(item, (cursor, row_y + (row_height - item.height)//2), item if style.overlay else None)
+            cursor += width + style.header_logo_spacing
+
+    def _mark(self, code):
+        """所选一方的图标（或文字）和它在格子中居中的位置，每种预测只算一次"""
+        mark = self._marks.get(code)
+        if mark is not None:
+            return mark
+        style = self.style
+        team = PICK_SIDES.get(code)
+        logo = None
+        if team is not None:
+            try:
+                # 加载所选队伍的完整图标（保持原始比例缩放，同一图标只解码一次）
+                logo = load_sprite(style.logo_path(self.match_idx, team), style.pick_logo_size)
+            except Exception as e:
+                print(f"预测队伍标志加载失败: {e}")
+                record_failure('team_logo', e)
+        if logo is not None:
+            mark = (logo, None, self.width//2 - logo.width//2, style.row_height//2 - logo.height//2)
+        else:
+            # 如果图标不存在，只绘制文字
+            choice = PICK_LABELS[code]
+            bbox = text_bbox(choice, self.fonts[1])
+            mark = (None, choice, self.width//2 - (bbox[2] - bbox[0])//2, style.row_height//2 - (bbox[3] - bbox[1])//2)
+        self._marks[code] = mark
+        return mark
+
+    def draw_cell(self, img, draw, x, y, row_idx, row):
+        logo, text, dx, dy = self._mark(row.picks[self.match_idx])
+        if logo is not None:
+            img.paste(logo, (x + dx, y + dy), logo)
+        else:
+            draw_text(img, (x + dx, y + dy), text, self.style.text_color, self.fonts[1])
+
+
+class ScoredPickColumn(PickColumn):
+    """评分表中的一场比赛：格子按预测是否正确着色，每种 (预测, 是否正确) 的格子只渲染一次"""
+
+    def __init__(self, width, match_idx):
+        super().__init__(width, match_idx)
+        self._cells = {}
+
+    def pick_cell(self, code, is_correct):
+        """预测格子（不含边框）：高亮背景 + 所选队伍的图标，图标缺失时为文字占位符"""
+        key = (code, is_correct)
+        cell = self._cells.get(key)
+        if cell is not None:
+            return cell
+
+        style = self.style
+        border, row_height = style.border_width, style.row_height
+        # 格子从 (border, border) 开始，坐标都相对于格子所在列和行的左上角
+        cell = Image.new('RGB', (self.width - 2 * border + 1, row_height - 2 * border + 1),
+                         color=style.pick_colors[0] if is_correct else style.pick_colors[1])
+        origin = -border
+        team = PICK_SIDES.get(code)
+        logo_size = style.pick_logo_size
+        logo = None
+        if team is not None:
+            try:
+                logo = load_sprite(style.logo_path(self.match_idx, team), logo_size, keep_ratio=False)
+            except Exception as e:
+                record_failure('team_logo', e)
+
+        if logo is not None:
+            cell.paste(logo, (origin + self.width//2 - logo_size//2, origin + row_height//2 - logo_size//2))
+        else:
+            # 如果图标不存在，绘制占位符
+            choice = PICK_LABELS[code]
+            font_medium = self.fonts[1]
+            ImageDraw.Draw(cell).rectangle([origin + 10, origin + 10, origin + self.width - 10, origin + row_height - 10],
+                                           fill=(200, 200, 200), outline=style.grid_color)
+            bbox = text_bbox(choice, font_medium)
+            draw_text(cell, (origin + self.width//2 - (bbox[2] - bbox[0])//2, origin + row_height//2 - 10),
+                      choice, (0, 0, 0), font_medium)
+
+        self._cells[key] = cell
+        return cell
+
+    def draw_cell(self, img, draw, x, y, row_idx, row):
+        border = self.style.border_width
+        img.paste(self.pick_cell(row.picks[self.match_idx], bool(row.correct[self.match_idx])), (x + border, y + border))
+
+
+class StatColumn(Column):
+    """居中的一段文字（数字、百分比等）：text(row) 返回格子中的文字；该行的底色和分割线 + 文字，
+    每种 (行背景, 文字) 的格子只渲染一次"""
+
+    def __init__(self, width, title, text):
+        super().__init__(width, title)
+        self.text = text
+        self._cells = {}
+
+    def draw_row_background(self, draw, x, color):
+        draw.rectangle([x, 0, x + self.width, self.style.row_height], fill=color, outline=self.style.grid_color)
+
+    def draw_cell(self, img, draw, x, y, row_idx, row):
+        text = self.text(row)
+        key = (row_idx % 2, text)
+        cell = self._cells.get(key)
+        if cell is None:
+            font_medium = self.fonts[1]
+            row_height = self.style.row_height
+            cell = self.board.row_background(row_idx).crop((x, 0, x + self.width, row_height))
+            bbox = text_bbox(text, font_medium)
+            draw_text(cell, (self.width//2 - (bbox[2] - bbox[0])//2, row_height//2 - (bbox[3] - bbox[1])//2),
+                      text, (0, 0, 0), font_medium)
+            self._cells[key] = cell
+        img.paste(cell, (x, y))
+
+
+class ScoreColumn(StatColumn):
+    """正确场次"""
+
+    def __init__(self, width, title=""):
+        super().__init__(width, title, lambda row: str(row.correct_count))
+
+
+class RankColumn(StatColumn):
+    """名次（行中的 rank）"""
+
+    def __init__(self, width, title="名次"):
+        super().__init__(width, title, lambda row: str(row.rank))
+
+
+class ScenarioColumn(Column):
+    """情形分析：上面是最好名次，下面是进入前N名的概率（每个玩家都不同，直接画）"""
+
+    grid = False
+
+    def __init__(self, width, top_n):
+        super().__init__(width, f"最好/前{top_n}")
+        self.top_n = top_n
+
+    def draw_cell(self, img, draw, x, y, row_idx, row):
+        style = self.style
+        draw.rectangle([x, y, x + self.width, y + style.row_height],
+                       fill=style.row_colors[row_idx % 2], outline=style.grid_color)
+        draw.line([x, y, x, y + style.row_height], fill=style.grid_color, width=style.border_width)
+
+        font_small = self.fonts[2]
+        lines = [f"最好第{row.best_rank}名", f"前{self.top_n} {row.probability:.0%}"]
+        for line_idx, text in enumerate(lines):
+            bbox = text_bbox(text, font_small)
+            draw_text(img, (x + self.width//2 - (bbox[2] - bbox[0])//2, y + style.row_height//2 - 30 + line_idx * 34),
+                      text, (0, 0, 0), font_small)
+
+
+class BoardLayout:
+    """表格布局：每列的起点、表格宽度和整行背景的宽度，创建表时算好一次"""
+
+    def __init__(self, columns, style):
+        self.col_x = []  # 每列左边的 x
+        x = style.margin
+        previous = None
+        for column in columns:
+            if isinstance(previous, PickColumn) and isinstance(column, PickColumn):
+                x += style.col_spacing
+            self.col_x.append(x)
+            x += column.width
+            previous = column
+        self.width = x + style.margin
+        # 整行背景的宽度：到最后一个 grid 列为止
+        grid_ends = [x + column.width for x, column in zip(self.col_x, columns) if column.grid]
+        self.grid_width = grid_ends[-1] if grid_ends else 0
+        self.header_height = style.header_height
+        self.row_height = style.row_height
+
+    def height(self, num_rows, extra_height=0):
+        """表头 + num_rows 行 + 底部额外空间的高度"""
+        return self.header_height + num_rows * self.row_height + extra_height
+
+
+class Board:
+    """一张表：样式 + 列 + 算好的布局，按布局画表头和行"""
+
+    def __init__(self, style, columns, fonts, title=None):
+        self.style = style
+        self.fonts = fonts
+        self.title = style.title if title is None else title  # 表头中的标题，默认用样式中的
+        self.columns = [column.bind(style, fonts, self) for column in columns]
+        self.layout = BoardLayout(self.columns, style)
+        self._row_backgrounds = None
+        if style.row_colors is not None:
+            self._row_backgrounds = [self._render_row_background(color) for color in style.row_colors]
+
+    @property
+    def width(self):
+        return self.layout.width
+
+    def _render_row_background(self, row_color):
+        """整行背景：底色、垂直和水平分割线，以及各列自己的背景"""
+        style = self.style
+        width, row_height = self.layout.grid_width, style.row_height
+        row = Image.new('RGB', (width, row_height))
+        draw = ImageDraw.Draw(row)
+        draw.rectangle([0, 0, width, row_height], fill=row_color, outline=style.grid_color)
+        grid_x = [x for x, column in zip(self.layout.col_x, self.columns) if column.grid]
+        for x in grid_x[1:]:
+            draw.line([x, 0, x, row_height], fill=style.grid_color, width=style.border_width)
+        draw.line([0, row_height, width, row_height], fill=style.grid_color, width=style.border_width)
+        for x, column in zip(self.layout.col_x, self.columns):
+            if column.grid:
+                column.draw_row_background(draw, x, row_color)
+        return row
+
+    def row_background(self, row_idx):
+        return self._row_backgrounds[row_idx % 2]
+
+    def draw_header(self, img):
+        """在 img 顶部画表头：底色、标题和每列的标题"""
+        style = self.style
+        draw = ImageDraw.Draw(img)
+        if style.header_background is not None:
+            draw.rectangle([0, 0, self.width, style.header_height], fill=style.header_background, outline=style.header_outline)
+        bbox = text_bbox(self.title, self.fonts[0])
+        draw_text(img, (self.width//2 - (bbox[2] - bbox[0])//2, style.title_y), self.title, style.header_text_color,
+                  self.fonts[0])
+        for column, x in zip(self.columns, self.layout.col_x):
+            column.draw_header(img, draw, x)
+
+    def draw_rows(self, img, rows, y_offset=0, first_row_idx=0):
+        """从 y_offset 开始画 rows（BoardRow 列表），第一行是整张表的第 first_row_idx 行（决定交替底色）"""
+        draw = ImageDraw.Draw(img)
+        row_height = self.style.row_height
+        placed = list(zip(self.columns, self.layout.col_x))
+        for offset, row in enumerate(rows):
+            row_idx = first_row_idx + offset
+            y = y_offset + offset * row_height
+            if self._row_backgrounds is not None:
+                img.paste(self._row_backgrounds[row_idx % 2], (0, y))
+            for column, x in placed:
+                column.draw_cell(img, draw, x, y, row_idx, row)
+
+
+# 渲染进程中的状态，由 _init_render_worker 设置
+_worker_fonts = None  # 加载好的字体
+
+
+def _init_render_worker(font_path, match_titles, warm=None):
+    """渲染进程初始化：加载字体，按表头找到队伍标志，warm 不为空时调用 warm(比赛数) 预热素材"""
+    global FONT_PATH, _worker_fonts
+    FONT_PATH = font_path
+    _worker_fonts = load_fonts(font_path)
+    set_match_titles(match_titles)
+    if warm is not None:
+        warm(len(match_titles))
+
+
+def open_render_pool(workers, match_titles, warm=None):
+    """创建渲染进程池，每个进程启动时加载主进程查找到的字体；warm 是模块级函数，见 _init_render_worker"""
+    # 只有多进程渲染才需要 multiprocessing，避免每次启动都导入
+    from concurrent.futures import ProcessPoolExecutor
+    load_table_fonts()
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                               initargs=(FONT_PATH, list(match_titles), warm))
+
+
+def _worker_task(func, *args):
+    """在渲染进程中执行 func(字体, *args)"""
+    return func(_worker_fonts, *args)
+
+
+def iter_worker_results(pool, func, jobs, window=4):
+    """在 open_render_pool 创建的进程池中按顺序执行 func(字体, *job)（func 是模块级函数），按提交顺序返回结果"""
+    return iter_pool_results(pool, _worker_task, ((func, *job) for job in jobs), window)
+
+
+def iter_pool_results(pool, task, jobs, window=4):
+    """在进程池中按顺序执行 task(*job)，同时最多有 window 个任务在执行或等待取走，按提交顺序返回结果"""
+    pending = deque()
+    for job in jobs:
+        pending.append(pool.submit(task, *job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,115 @@
+"""字体缓存：中文字体路径只查找一次并保存到磁盘，字体对象在进程内只加载一次
+
+没有中文字体时用的其他字体也会缓存（标为 fallback），装上中文字体后运行 python font_cache.py --refresh 重新查找。
+"""
+import json
+import os
+from PIL import ImageFont
+from profiler import count_event, profiled, record_failure
+
+# 配置参数
+CACHE_DIR = ".cache"  # 本地缓存目录
+FONT_CACHE_FILE = os.path.join(CACHE_DIR, "font.json")  # 字体路径缓存文件
+CHINESE_FONT_KEYWORDS = ['msyh', 'simhei', 'simsun', 'notosanscjk']  # 微软雅黑、黑体、宋体、Noto Sans CJK
+FONT_SIZES = (28, 22, 18)  # 大、中、小三种字号
+
+_loaded_fonts = {}  # 字体路径 -> (大, 中, 小) 字体对象
+
+
+def _is_chinese_font(path):
+    name = path.lower()
+    return any(keyword in name for keyword in CHINESE_FONT_KEYWORDS)
+
+
+def _read_cached_font_path():
+    """读取磁盘上缓存的 (字体路径, 是否为代替用的非中文字体)，字体文件已不存在时视为未命中"""
+    try:
+        with open(FONT_CACHE_FILE, encoding='utf-8') as f:
+            cached = json.load(f)
+        path, fallback = cached.get('path'), bool(cached.get('fallback'))
+    except (OSError, ValueError, AttributeError):
+        return None
+    if path and os.path.isfile(path) and (fallback or _is_chinese_font(path)):
+        return path, fallback
+    return None
+
+
+def _write_cached_font_path(path, fallback=False):
+    """把字体路径写入磁盘缓存，写入失败不影响出图"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_file = FONT_CACHE_FILE + ".tmp"
+        with open(tmp_file, mode='w', encoding='utf-8') as f:
+            json.dump({'path': path, 'fallback': fallback}, f, ensure_ascii=False)
+        os.replace(tmp_file, FONT_CACHE_FILE)
+    except OSError as e:
+        print(f"字体缓存写入失败: {e}")
+
+
+def _scan_system_fonts():
+    """扫描系统字体，优先返回中文字体，没有则返回按路径排序的第一个字体（每次结果相同）"""
+    # 只有缓存未命中时才需要 matplotlib，避免每次启动都导入
+    import matplotlib.font_manager as fm
+
+    fonts = sorted(fm.findSystemFonts())
+    for font in fonts:
+        if _is_chinese_font(font):
+            return font
+    return fonts[0] if fonts else None
+
+
+@profiled('find_font')
+def find_system_chinese_font(refresh=False):
+    """自动查找系统中的中文字体，结果缓存在磁盘上
+
+    没有中文字体时用的第一个系统字体也写入缓存并标为 fallback，之后不再每次扫描；
+    缓存的字体文件被删除或 refresh 为 True 时重新扫描。
+    """
+    cached = None if refresh else _read_cached_font_path()
+    if cached:
+        count_event('font_cache_hit')
+        return cached[0]
+    count_event('font_scan')
+    try:
+        path = _scan_system_fonts()
+    except Exception as e:
+        print(f"系统字体查找失败: {e}")
+        record_failure('font', e)
+        return None
+    if path:
+        fallback = not _is_chinese_font(path)
+        if fallback:
+            print(f"没有找到中文字体，使用 {path}；装上中文字体后运行 python font_cache.py --refresh")
+        _write_cached_font_path(path, fallback)
+    return path
+
+
+def load_fonts(font_path=None):
+    """返回 (大, 中, 小) 三种字号的字体对象，同一字体路径只加载一次"""
+    fonts = _loaded_fonts.get(font_path)
+    if fonts is not None:
+        return fonts
+
+    count_event('font_load')
+    try:
+        if font_path:
+            fonts = tuple(ImageFont.truetype(font_path, size) for size in FONT_SIZES)
+        else:
+            fonts = tuple(ImageFont.load_default(size) for size in FONT_SIZES)
+    except Exception as e:
+        # 如果字体加载失败，使用默认字体并调整大小
+        record_failure('font', e)
+        default_font = ImageFont.load_default()
+        fonts = tuple(default_font.font_variant(size=size) for size in FONT_SIZES)
+
+    _loaded_fonts[font_path] = fonts
+    return fonts
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="查看或重新查找出图使用的中文字体: python font_cache.py [--refresh]")
+    parser.add_argument('--refresh', action='store_true', help="忽略缓存重新扫描系统字体（装上中文字体后使用）")
+    args = parser.parse_args()
+    print(f"字体: {find_system_chinese_font(refresh=args.refresh)}")
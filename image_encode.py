@@ -0,0 +1,147 @@
+"""输出图片编码：PNG 压缩级别预设、WebP（无损/有损）、自适应调色板 PNG，统计编码用时和文件大小
+
+同一张图还可以一次输出多个尺寸（原图存档、中图发群、缩略图给机器人预览），
+每个尺寸由上一个尺寸缩小得到，各个尺寸在线程中并行编码（Pillow 编码和缩放时会释放 GIL）。
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from profiler import count_event, profile_stage
+
+# 编码预设：名称 -> (格式, 保存参数, 是否转为调色板图)
+ENCODE_PRESETS = {
+    'fast': ('PNG', {'compress_level': 1}, False),  # 编码最快，文件最大
+    'default': ('PNG', {}, False),  # Pillow 默认设置（zlib 级别 6）
+    'small': ('PNG', {'compress_level': 9}, False),  # 文件更小，编码更慢
+    'palette': ('PNG', {'compress_level': 9}, True),  # 自适应 256 色调色板，适合发群
+    'webp': ('WEBP', {'lossless': True, 'method': 4}, False),  # WebP 无损
+    'webp-lossy': ('WEBP', {'quality': 85, 'method': 4}, False),  # WebP 有损，文件最小
+}
+DEFAULT_PRESET = 'default'
+PALETTE_COLORS = 256  # 调色板颜色数量
+FORMAT_EXTENSIONS = {'PNG': '.png', 'WEBP': '.webp'}
+SIZE_PRESETS = {'medium': 1200, 'small': 400}  # 常用的缩小尺寸：名称 -> 宽度（像素）
+ENCODE_THREADS = 3  # 多个尺寸并行编码的线程数
+
+
+def check_preset(preset):
+    if preset not in ENCODE_PRESETS:
+        raise ValueError(f"未知的编码预设: {preset}，可选: {', '.join(ENCODE_PRESETS)}")
+    return ENCODE_PRESETS[preset]
+
+
+def output_path(path, preset=DEFAULT_PRESET):
+    """按预设的格式替换输出文件的扩展名"""
+    image_format = check_preset(preset)[0]
+    stem, ext = os.path.splitext(path)
+    if ext.lower() == FORMAT_EXTENSIONS[image_format]:
+        return path
+    return stem + FORMAT_EXTENSIONS[image_format]
+
+
+def stream_compress_level(preset=DEFAULT_PRESET):
+    """流式写入 PNG 时使用的 zlib 级别；WebP 和调色板预设需要整张图，不能流式写入"""
+    image_format, options, palette = check_preset(preset)
+    if image_format != 'PNG' or palette:
+        raise ValueError(f"编码预设 {preset} 不支持分条流式写入，请使用 PNG 预设（fast/default/small）")
+    return options.get('compress_level', 6)
+
+
+def prepare_image(img, preset=DEFAULT_PRESET):
+    """按预设转换图片模式：调色板预设量化为 P 模式（保留透明度）"""
+    if check_preset(preset)[2]:
+        # FASTOCTREE 同时支持 RGB 和 RGBA，透明的地方量化后仍是透明的
+        return img.quantize(colors=PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+    return img
+
+
+def encode_image(img, fp, preset=DEFAULT_PRESET):
+    """按预设把图片写入文件路径或文件对象"""
+    image_format, options, _ = check_preset(preset)
+    prepare_image(img, preset).save(fp, format=image_format, **options)
+
+
+class EncodeStats:
+    """累计编码的文件数、用时和输出大小（可以在多个线程中记录）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.files = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def record(self, seconds, size):
+        with self._lock:
+            self.files += 1
+            self.seconds += seconds
+            self.bytes += size
+            count_event('encoded_bytes', size)
+
+
+# 进程内共用的编码统计
+encode_stats = EncodeStats()
+
+
+def save_image(img, path, preset=DEFAULT_PRESET):
+    """按预设编码并保存，返回 (用时秒, 文件字节数)，同时计入编码统计"""
+    start = time.perf_counter()
+    with profile_stage('encode'):
+        encode_image(img, path, preset)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    encode_stats.record(elapsed, size)
+    return elapsed, size
+
+
+def parse_size(spec):
+    """解析一个输出尺寸：预设名（medium/small）或 名称=宽度，返回 (名称, 宽度)"""
+    name, sep, width = spec.partition('=')
+    name = name.strip()
+    if not sep:
+        if name not in SIZE_PRESETS:
+            raise ValueError(f"未知的输出尺寸: {spec}，可选: {', '.join(SIZE_PRESETS)}，或写成 名称=宽度")
+        return name, SIZE_PRESETS[name]
+    if not name or not width.strip().isdigit() or int(width) <= 0:
+        raise ValueError(f"输出尺寸的格式应为 名称=宽度（正整数）: {spec}")
+    return name, int(width)
+
+
+def sized_path(path, name):
+    """缩小尺寸的输出文件名：predictions_table.png -> predictions_table_small.png"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{name}{ext}"
+
+
+def save_image_set(img, path, preset=DEFAULT_PRESET, sizes=(), threads=ENCODE_THREADS):
+    """保存原图和 sizes 中的各个缩小尺寸，返回 [(路径, 编码用时, 文件字节数)]，原图在最前面
+
+    sizes 是 [(名称, 宽度)]，按宽度从大到小依次由上一个尺寸缩小（不放大），
+    缩小下一个尺寸的同时，前面的尺寸已经在线程中编码。
+    """
+    if not sizes:
+        return [(path, *save_image(img, path, preset))]
+    paths = [path]
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="encode") as pool:
+        futures = [pool.submit(save_image, img, path, preset)]
+        current = img
+        for name, width in sorted(sizes, key=lambda size: -size[1]):
+            if width < current.width:
+                with profile_stage('downscale'):
+                    height = max(1, round(img.height * width / img.width))
+                    current = current.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            paths.append(sized_path(path, name))
+            futures.append(pool.submit(save_image, current, paths[-1], preset))
+        return [(sized_file, *future.result()) for sized_file, future in zip(paths, futures)]
+
+
+def print_encode_stats(preset=DEFAULT_PRESET):
+    """打印编码用时和输出大小，用来比较不同预设"""
+    stats = encode_stats
+    if not stats.files:
+        return
+    print(f"编码({preset}): {stats.files} 个文件，用时 {stats.seconds:.2f} 秒，共 {stats.bytes / 1024:.0f} KB")
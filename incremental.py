@@ -0,0 +1,181 @@
+"""增量出图：反复导出的CSV只解析新增的提交，并把新增的行拼接到上次的图片下方
+
+上次处理到的位置按 提交者（自动）+ 提交时间（自动） 记录在状态文件中。
+文件末尾不完整的行（导出还没写完）不处理，也不记录位置，下次刷新时整行重新读取。
+表头、队伍标志和已有的行都不会重新绘制；如果表头变了或者之前的提交被改动，自动整张重画。
+增量模式的底部背景图是平铺的（与 --stream/--rows-per-page 相同），这样新增行不会影响已有的行。
+"""
+import csv
+import json
+import os
+import time
+from PIL import Image
+import script
+from avatar_cache import prefetch_avatar
+from logo_index import set_match_titles
+from pick_parser import PickParser
+from predictions import Predictions, write_predictions_csv
+
+# 配置参数
+INCREMENTAL_STATE_FILE = os.path.join(".cache", "incremental.json")  # 增量状态文件
+WATCH_INTERVAL = 2.0  # 监视模式下检查输入文件的间隔（秒）
+
+
+def submission_key(row):
+    """一条提交的标识：提交者（自动）+ 提交时间（自动）"""
+    return [row[0], row[1]] if len(row) >= 2 else list(row)
+
+
+class IncrementalBoard:
+    """记录已经画到图上的提交，刷新时只处理新增的提交"""
+
+    def __init__(self, input_file, output_image=script.OUTPUT_IMAGE, output_csv=script.OUTPUT_CSV,
+                 state_file=INCREMENTAL_STATE_FILE):
+        self.input_file = input_file
+        self.output_image = output_image
+        self.output_csv = output_csv
+        self.state_file = state_file
+        self.state = self._load_state()
+        self.canvas = None  # 监视模式下常驻内存的画布，避免每次重新解码上次的图片
+
+    def _load_state(self):
+        """读取上次的状态，与当前输入/输出不匹配时视为没有状态"""
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('input') != os.path.abspath(self.input_file) or state.get('output') != self.output_image:
+            return None
+        return state
+
+    def _save_state(self, match_titles, rows, last_key):
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        self.state = {
+            'input': os.path.abspath(self.input_file),
+            'output': self.output_image,
+            'match_titles': match_titles,
+            'rows': rows,
+            'last_key': last_key,
+            'output_mtime': os.stat(self.output_image).st_mtime_ns,
+        }
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, mode='w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_file, self.state_file)
+
+    def _read_new_rows(self):
+        """读取输入CSV，返回 (新增的预测, 是否需要整张重画, 最后一条提交的标识)"""
+        state = self.state
+        with open(self.input_file, mode='r', encoding='utf-8') as infile:
+            csv_reader = csv.reader(infile)
+            headers = next(csv_reader)
+            match_titles = headers[3:]
+            rebuild = state is None or state['match_titles'] != match_titles
+            skip_rows = 0 if rebuild else state['rows']
+
+            new_rows = Predictions(match_titles)
+            parser = PickParser()
+            seen = 0
+            last_key = None if rebuild else state['last_key']
+            for row in csv_reader:
+                if not row:
+                    continue
+                if len(row) < 3 + len(match_titles):
+                    # 导出可能还在写入：这一行和之后的行等下次刷新再处理
+                    print(f"第{csv_reader.line_num}行不完整，可能还在写入，下次刷新时再处理")
+                    break
+                if seen < skip_rows:
+                    # 已经画过的提交只核对最后一条的标识，不再解析
+                    seen += 1
+                    if seen == skip_rows and submission_key(row) != state['last_key']:
+                        return self._read_all_rows()
+                    continue
+                new_rows.add(row[2], parser.parse_row(row[3:], new_rows.num_matches, csv_reader.line_num))
+                prefetch_avatar(script.avatar_path(row[2]), script.AVATAR_SIZE)
+                last_key = submission_key(row)
+
+        if seen < skip_rows:
+            # 之前的提交被删掉了
+            return self._read_all_rows()
+        parser.print_report()
+        return new_rows, rebuild, last_key
+
+    def _read_all_rows(self):
+        self.state = None
+        self.canvas = None
+        return self._read_new_rows()
+
+    def _load_canvas(self):
+        """取得上次的画布：常驻内存的优先，否则读取上次输出的图片"""
+        if self.canvas is not None:
+            return self.canvas
+        try:
+            if os.stat(self.output_image).st_mtime_ns != self.state.get('output_mtime'):
+                return None  # 图片被其他程序覆盖过
+            with Image.open(self.output_image) as image:
+                return image.convert('RGBA')
+        except OSError:
+            return None
+
+    def refresh(self):
+        """处理新增的提交并更新图片，返回新增的行数"""
+        new_rows, rebuild, last_key = self._read_new_rows()
+        canvas = None if rebuild else self._load_canvas()
+        if canvas is None and not rebuild:
+            new_rows, rebuild, last_key = self._read_all_rows()
+
+        if not rebuild and new_rows.num_players == 0:
+            return 0
+
+        fonts = script.load_table_fonts()
+        set_match_titles(new_rows.match_titles)  # 按表头中的队名找到队伍标志
+        old_rows = 0 if rebuild else self.state['rows']
+        body_top = script.HEADER_HEIGHT + old_rows * script.ROW_HEIGHT  # 新增行的起点（即原来底部空间的起点）
+
+        img_width = script.table_width(new_rows.num_matches)
+        img_height = body_top + new_rows.num_players * script.ROW_HEIGHT + script.FOOTER_HEIGHT
+        img = Image.new('RGBA', (img_width, img_height), color=(0, 0, 0, 0))
+        if rebuild:
+            img.paste(script.render_header_strip(new_rows.num_matches, fonts), (0, 0))
+        else:
+            # 保留表头和已有的行，去掉原来的底部空间
+            img.paste(canvas.crop((0, 0, img_width, body_top)), (0, 0))
+
+        strip = script.render_row_strip(new_rows, 0, new_rows.num_players, fonts, script.FOOTER_HEIGHT,
+                                        body_offset=old_rows * script.ROW_HEIGHT)
+        img.paste(strip, (0, body_top))
+        img.save(self.output_image)
+        self.canvas = img
+
+        if self.output_csv:
+            # 中间CSV不存在（被删除或第一次写）时重新写出，带标题行
+            write_predictions_csv(new_rows, self.output_csv, append=not rebuild and os.path.exists(self.output_csv))
+        self._save_state(new_rows.match_titles, old_rows + new_rows.num_players, last_key)
+
+        if rebuild:
+            print(f"已重新生成预测图（{new_rows.num_players} 人）: {self.output_image}")
+        else:
+            print(f"新增 {new_rows.num_players} 人，已更新预测图: {self.output_image}")
+        return new_rows.num_players
+
+    def watch(self, interval=WATCH_INTERVAL):
+        """监视输入文件，文件更新后增量刷新，按 Ctrl+C 退出"""
+        print(f"正在监视 {self.input_file}，按 Ctrl+C 退出")
+        last_mtime = None
+        try:
+            while True:
+                try:
+                    mtime = os.stat(self.input_file).st_mtime_ns
+                except OSError:
+                    mtime = None
+                if mtime is not None and mtime != last_mtime:
+                    try:
+                        self.refresh()
+                        last_mtime = mtime
+                    except (OSError, ValueError, IndexError, csv.Error, StopIteration) as e:
+                        # 文件可能还在写入中，下次再试
+                        print(f"增量刷新失败，稍后重试: {e}")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("已停止监视")
@@ -0,0 +1,282 @@
+"""队伍标志索引：从表头“AWG vs AXIZ 的比分会是？”中解析队名，在标志目录中找到对应的图片
+
+标志目录（teams/、teams2/ 等）中的文件名是 200px-AXIZ_WAVE_LOGO.png 这种形式。索引为每个文件生成若干别名：
+完整队名、去掉“电竞俱乐部”等后缀的队名、各个单词、单词首字母、队名中的大写字母（Arneb_with_WoG -> AWG）、括号中的名字。
+表头中的队名先查 team_aliases.csv 中的手工别名，再查索引中的别名，都没有时按字母顺序模糊匹配（RVL -> Rival_Esports）。
+索引保存在 .cache/logo_index.json，只有目录的修改时间变了（增删或改名了文件）才重新扫描这个目录；
+长时间运行的进程（渲染服务、--watch、批量出图）每隔 DIR_RECHECK_INTERVAL 秒检查一次，目录有变化时重建索引。
+表头解析不出队名或找不到标志时，仍然使用 team_logos/match{n}_left.png / match{n}_right.png；
+为某一轮专门指定的标志目录中的 match 文件优先于表头解析出的标志。
+"""
+import csv
+import difflib
+import json
+import os
+import re
+import time
+from font_cache import CACHE_DIR
+
+# 配置参数
+LOGO_DIRS = ["team_logos", "teams", "teams2"]  # 按顺序建立索引，同样匹配时前面的目录优先
+LOGO_INDEX_FILE = os.path.join(CACHE_DIR, "logo_index.json")  # 索引缓存文件
+LOGO_ALIAS_FILE = "team_aliases.csv"  # 可选的手工别名：每行 “表头中的队名,标志文件名或队名”
+LOGO_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+IGNORED_LOGOS = re.compile(r'^(match\d+_(left|right)|bg)$')  # 不是队伍标志的文件
+CLUB_SUFFIXES = re.compile(r'(电子竞技俱乐部|电竞俱乐部|俱乐部|战队|esports|gaming)$', re.IGNORECASE)
+MIN_FUZZY_SCORE = 0.6  # 模糊匹配的最低得分，低于它视为找不到
+MIN_SUBSEQUENCE_LENGTH = 3  # 按字母顺序匹配（RVL -> Rival_Esports）的最短队名，更短的只认别名
+DIR_RECHECK_INTERVAL = 1.0  # 建好索引后，标志目录和别名文件的修改时间最多每隔这么多秒检查一次
+INDEX_VERSION = 1
+
+# vs 前后不能紧挨着字母，否则 “NAVS vs FL” 会从 NAVS 中间断开
+MATCHUP_PATTERN = re.compile(r'^\s*(.+?)\s*(?:(?<![A-Za-z])v\.?s\.?(?![A-Za-z])|对阵)\s*(.+?)\s*(?:的比分|比分|的|[（(？?]|$)',
+                             re.IGNORECASE)
+
+
+def parse_matchup(title):
+    """从表头中解析出 (左边队名, 右边队名)，解析不出时返回 None"""
+    match = MATCHUP_PATTERN.match(title or '')
+    if not match or not match.group(1) or not match.group(2):
+        return None
+    return match.group(1), match.group(2)
+
+
+def normalize(name):
+    """统一大小写，只保留字母、数字和汉字"""
+    return ''.join(ch for ch in name.casefold() if ch.isalnum())
+
+
+def team_name(filename):
+    """从标志文件名得到队名和括号中的别名：200px-RealizeDream_LOGO（COAⅥ）.png -> ('RealizeDream', ['COAⅥ'])"""
+    stem = os.path.splitext(filename)[0]
+    extras = re.findall(r'[（(]([^）)]*)[）)]', stem)
+    stem = re.sub(r'[（(][^）)]*[）)]', '', stem)
+    stem = re.sub(r'^\d+px-', '', stem)
+    stem = re.sub(r'[_\s-]*logo$', '', stem, flags=re.IGNORECASE)
+    return stem, [extra for extra in extras if extra]
+
+
+def team_aliases(name, extras=()):
+    """队名的所有别名（已 normalize）"""
+    words = [word for word in re.split(r'[_\s\-.]+', name) if word]
+    aliases = {normalize(name), normalize(CLUB_SUFFIXES.sub('', name))}
+    aliases.update(normalize(word) for word in words)
+    if len(words) > 1:
+        aliases.add(normalize(''.join(word[0] for word in words)))  # 单词首字母
+    capitals = ''.join(ch for ch in name if ch.isupper())
+    if len(capitals) > 1:
+        aliases.add(normalize(capitals))  # 驼峰或缩写中的大写字母
+    aliases.update(normalize(extra) for extra in extras)
+    aliases.discard('')
+    return sorted(aliases)
+
+
+def _is_subsequence(query, text):
+    """query 的字符是否按顺序出现在 text 中（首字符必须相同）"""
+    if not query or not text or query[0] != text[0]:
+        return False
+    chars = iter(text)
+    return all(ch in chars for ch in query)
+
+
+class LogoIndex:
+    """标志目录的别名索引，按目录缓存在磁盘上"""
+
+    def __init__(self, logo_dirs=LOGO_DIRS, index_file=LOGO_INDEX_FILE, alias_file=LOGO_ALIAS_FILE):
+        self.logo_dirs = list(logo_dirs)
+        self.index_file = index_file
+        self.alias_file = alias_file
+        self._dirs = None  # 目录 -> {'mtime': 修改时间, 'teams': [[文件名, 队名, 别名列表], ...]}
+        self._entries = None  # [(路径, 队名, 完整队名 normalize, 别名集合)]，按目录顺序
+        self._manual = None  # 手工别名 normalize -> 标志文件名或队名
+        self._resolved = {}  # normalize 后的队名 -> 路径或 None
+        self._built_mtimes = {}  # 建立索引时各目录和别名文件的修改时间
+        self._dir_mtimes = {}  # 目录或文件 -> (检查时间, 修改时间)
+        self.generation = 0  # 每次重建索引加一，按表头缓存的查找结果据此失效
+
+    # ---- 建立索引 ----
+
+    def _load_cache(self):
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') == INDEX_VERSION:
+                return dict(cached.get('dirs', {}))
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+            tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(tmp_file, mode='w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'dirs': self._dirs}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            print(f"队伍标志索引写入失败: {e}")
+
+    @staticmethod
+    def scan_dir(logo_dir):
+        """扫描一个标志目录，返回 [[文件名, 队名, 别名列表], ...]"""
+        teams = []
+        for filename in sorted(os.listdir(logo_dir)):
+            stem, ext = os.path.splitext(filename)
+            if ext.lower() not in LOGO_EXTENSIONS or IGNORED_LOGOS.match(stem):
+                continue
+            name, extras = team_name(filename)
+            teams.append([filename, name, team_aliases(name, extras)])
+        return teams
+
+    def _mtime(self, path):
+        """目录或文件的修改时间，短时间内重复查询时直接用上次的结果"""
+        now = time.monotonic()
+        checked = self._dir_mtimes.get(path)
+        if checked is not None and now - checked[0] < DIR_RECHECK_INTERVAL:
+            return checked[1]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        self._dir_mtimes[path] = (now, mtime)
+        return mtime
+
+    def _watched_paths(self):
+        return [*self.logo_dirs, self.alias_file] if self.alias_file else list(self.logo_dirs)
+
+    def _ensure(self):
+        """第一次使用时读取缓存，修改时间变了的目录重新扫描；之后目录或别名文件有变化时重建索引"""
+        if self._entries is not None:
+            if all(self._mtime(path) == self._built_mtimes.get(path) for path in self._watched_paths()):
+                return
+            self._entries = None
+            self._resolved.clear()
+        self._dir_mtimes.clear()
+        self._built_mtimes = {path: self._mtime(path) for path in self._watched_paths()}
+        cached = self._load_cache()
+        self._dirs = {}
+        changed = False
+        for logo_dir in self.logo_dirs:
+            mtime = self._built_mtimes[logo_dir]
+            if mtime is None:
+                continue
+            entry = cached.get(logo_dir)
+            if entry is None or entry.get('mtime') != mtime:
+                entry = {'mtime': mtime, 'teams': self.scan_dir(logo_dir)}
+                changed = True
+                print(f"队伍标志索引已更新: {logo_dir}（{len(entry['teams'])} 个标志）")
+            self._dirs[logo_dir] = entry
+        if changed or set(cached) != set(self._dirs):
+            self._save_cache()
+
+        self._entries = []
+        for logo_dir, entry in self._dirs.items():
+            for filename, name, aliases in entry['teams']:
+                self._entries.append((os.path.join(logo_dir, filename), name, normalize(name), set(aliases)))
+        self._manual = self._load_manual_aliases()
+        self.generation += 1
+
+    def _load_manual_aliases(self):
+        manual = {}
+        if not self.alias_file or not os.path.exists(self.alias_file):
+            return manual
+        with open(self.alias_file, encoding='utf-8-sig', newline='') as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and row[0].strip() and not row[0].startswith('#'):
+                    manual[normalize(row[0])] = row[1].strip()
+        return manual
+
+    # ---- 查询 ----
+
+    def _score(self, query, full_name, aliases):
+        if query == full_name:
+            return 1.0
+        if query in aliases:
+            return 0.9
+        subsequence_of = [name for name in (full_name, *aliases)
+                          if len(query) >= MIN_SUBSEQUENCE_LENGTH and _is_subsequence(query, name)]
+        if subsequence_of:
+            return 0.6 + 0.2 * len(query) / min(len(name) for name in subsequence_of)
+        return difflib.SequenceMatcher(None, query, full_name).ratio() * 0.8
+
+    def _lookup(self, query):
+        best_path, best_score = None, MIN_FUZZY_SCORE
+        for path, _, full_name, aliases in self._entries:
+            score = self._score(query, full_name, aliases)
+            if score > best_score:
+                best_path, best_score = path, score
+        return best_path
+
+    def resolve(self, team):
+        """返回队伍标志的路径，找不到时返回 None"""
+        self._ensure()
+        query = normalize(team)
+        if query in self._resolved:
+            return self._resolved[query]
+        path = None
+        target = self._manual.get(query)
+        if target is not None:
+            # 手工别名可以直接写文件名，也可以写成索引中能找到的队名
+            path = next((entry[0] for entry in self._entries if os.path.basename(entry[0]) == target), None)
+            if path is None:
+                path = self._lookup(normalize(target))
+        elif query:
+            path = self._lookup(query)
+        self._resolved[query] = path
+        return path
+
+    def match_logos(self, match_titles):
+        """每场比赛的 {'left': 路径, 'right': 路径}，解析不出或找不到的一方没有对应的键"""
+        logos = []
+        for title in match_titles:
+            teams = parse_matchup(title)
+            sides = {}
+            if teams is not None:
+                for side, team in zip(('left', 'right'), teams):
+                    path = self.resolve(team)
+                    if path is not None:
+                        sides[side] = path
+            logos.append(sides)
+        return logos
+
+
+# 进程内共用的索引，以及当前这一轮每场比赛的标志
+logo_index = LogoIndex()
+_round_titles = None  # (表头, 索引版本)
+_round_logos = []
+
+
+def set_match_titles(match_titles, verbose=False):
+    """切换到一轮比赛（表头和标志目录都不变时什么也不做），之后 team_logo_path 按这一轮的表头查找标志"""
+    global _round_titles, _round_logos
+    match_titles = list(match_titles)
+    logo_index._ensure()
+    if (match_titles, logo_index.generation) == _round_titles:
+        return _round_logos
+    _round_titles = (match_titles, logo_index.generation)
+    _round_logos = logo_index.match_logos(match_titles)
+    if verbose:
+        for i, (title, sides) in enumerate(zip(match_titles, _round_logos)):
+            teams = parse_matchup(title)
+            if teams is None:
+                continue
+            for side, team in zip(('left', 'right'), teams):
+                found = sides.get(side)
+                print(f"第{i+1}场 {team}: {found}" if found else f"第{i+1}场 {team}: 没有找到标志，使用 match{i+1}_{side}.png")
+    return _round_logos
+
+
+def team_logo_path(logo_dir, match_idx, side):
+    """第 match_idx 场（从0开始）左边或右边队伍的标志路径
+
+    logo_dir 是专门指定的目录（批量出图的 --logos 或 team_logos/<文件名>/）时，其中的 match 文件优先；
+    其次用表头解析出的标志，最后用 logo_dir 中的 match 文件。
+    """
+    match_file = os.path.join(logo_dir, f"match{match_idx+1}_{side}.png")
+    if os.path.normpath(logo_dir) != os.path.normpath(LOGO_DIRS[0]) and os.path.exists(match_file):
+        return match_file
+    if match_idx < len(_round_logos):
+        path = _round_logos[match_idx].get(side)
+        if path is not None:
+            return path
+    return match_file
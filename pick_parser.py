@@ -0,0 +1,84 @@
+"""预测解析：把腾讯文档里填写的答案（如 "2：0"、"1：1左赢"、"右边赢…"）解析为预测编码
+
+绝大多数格子只是少数几种写法，每种不同的写法只解析一次，之后查表。
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from predictions import PICK_UNKNOWN, PICK_LEFT, PICK_RIGHT, PICK_DRAW
+
+# 关键字优先于比分，按顺序匹配（"1：1右赢" 这类写法以关键字为准）
+OUTCOME_KEYWORDS = [
+    ('右', PICK_RIGHT),
+    ('左', PICK_LEFT),
+]
+SCORE_PATTERN = re.compile(r'(\d+)[:\-比](\d+)')  # 全角半角统一后的比分，如 2:0、2-0、2比0
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+ParsedPick = namedtuple('ParsedPick', ['outcome', 'left_score', 'right_score'])  # 没有比分时分数为 None
+
+
+def normalize_answer(text):
+    """全角转半角并去掉所有空白"""
+    return WHITESPACE_PATTERN.sub('', unicodedata.normalize('NFKC', text))
+
+
+def classify_answer(text):
+    """解析一个答案，返回 ParsedPick；无法识别时 outcome 为 PICK_UNKNOWN"""
+    text = normalize_answer(text)
+
+    left_score = right_score = None
+    match = SCORE_PATTERN.search(text)
+    if match:
+        left_score, right_score = int(match.group(1)), int(match.group(2))
+
+    for keyword, outcome in OUTCOME_KEYWORDS:
+        if keyword in text:
+            return ParsedPick(outcome, left_score, right_score)
+
+    if match is None:
+        return ParsedPick(PICK_UNKNOWN, None, None)
+    if left_score > right_score:
+        outcome = PICK_LEFT
+    elif left_score < right_score:
+        outcome = PICK_RIGHT
+    else:
+        outcome = PICK_DRAW
+    return ParsedPick(outcome, left_score, right_score)
+
+
+class PickParser:
+    """带备忘表的解析器，记录无法识别的格子而不是抛出异常"""
+
+    def __init__(self):
+        self._memo = {}  # 原始答案 -> ParsedPick
+        self.cells = 0  # 解析过的格子数
+        self.malformed = []  # (行号, 第几场, 原始答案)
+
+    def parse(self, text):
+        """解析一个答案，相同的原始字符串只解析一次"""
+        self.cells += 1
+        parsed = self._memo.get(text)
+        if parsed is None:
+            parsed = self._memo[text] = classify_answer(text)
+        return parsed
+
+    def parse_row(self, cells, num_matches, line_number=None):
+        """解析一行中的 num_matches 个答案，返回预测编码列表；缺失的格子视为无法识别"""
+        picks = []
+        for i in range(num_matches):
+            text = cells[i] if i < len(cells) else ''
+            outcome = self.parse(text).outcome
+            if outcome == PICK_UNKNOWN:
+                self.malformed.append((line_number, i + 1, text))
+            picks.append(outcome)
+        return picks
+
+    @property
+    def unique_answers(self):
+        return len(self._memo)
+
+    def print_report(self):
+        """打印无法识别的格子"""
+        for line_number, match_no, text in self.malformed:
+            print(f"第{line_number}行 第{match_no}场 无法识别的预测: {text!r}")
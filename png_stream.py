@@ -0,0 +1,83 @@
+"""流式 PNG 写入：按横条逐段写入图片数据，内存中只保留当前横条"""
+import struct
+import zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_COLOR_TYPES = {'RGBA': (6, 4), 'RGB': (2, 3), 'L': (0, 1)}  # 模式 -> (颜色类型, 每像素字节数)
+IDAT_CHUNK_SIZE = 1 << 16  # 压缩数据攒够这么多就写出一个 IDAT 块
+
+
+class StreamingPNGWriter:
+    """先声明整张图的尺寸，再按从上到下的顺序写入横条"""
+
+    def __init__(self, path, width, height, mode='RGBA', compress_level=6):
+        if mode not in PNG_COLOR_TYPES:
+            raise ValueError(f"不支持的图片模式: {mode}")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = []
+        self._pending_size = 0
+        self._file = open(path, 'wb')
+
+        color_type, self._bytes_per_pixel = PNG_COLOR_TYPES[mode]
+        self._file.write(PNG_SIGNATURE)
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)) & 0xffffffff))
+
+    def _queue(self, data):
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size >= IDAT_CHUNK_SIZE:
+            self._write_chunk(b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def write_strip(self, strip):
+        """写入一个横条，宽度和模式必须与整张图一致"""
+        if strip.width != self.width or strip.mode != self.mode:
+            raise ValueError(f"横条尺寸/模式 {strip.size} {strip.mode} 与图片 {self.width} {self.mode} 不一致")
+        if self.rows_written + strip.height > self.height:
+            raise ValueError("写入的行数超过了图片高度")
+
+        raw = strip.tobytes()
+        stride = self.width * self._bytes_per_pixel
+        # 每一行前面加上过滤类型 0（不过滤）
+        for y in range(0, len(raw), stride * 64):
+            block = raw[y:y + stride * 64]
+            scanlines = b''.join(b'\x00' + block[i:i + stride] for i in range(0, len(block), stride))
+            self._queue(self._compressor.compress(scanlines))
+        self.rows_written += strip.height
+
+    def close(self):
+        """写完剩余数据和文件尾"""
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"只写入了 {self.rows_written} 行，图片高度为 {self.height}")
+            self._queue(self._compressor.flush())
+            if self._pending:
+                self._write_chunk(b'IDAT', b''.join(self._pending))
+                self._pending = []
+            self._write_chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
@@ -0,0 +1,89 @@
+"""预测数据：玩家 × 比赛的紧凑编码表，在解析和出图之间直接传递，不再经过中间CSV"""
+import csv
+from array import array
+
+# 预测编码（每个格子一个字节）
+PICK_UNKNOWN = 0  # 无法识别
+PICK_LEFT = 1  # 左边赢
+PICK_RIGHT = 2  # 右边赢
+PICK_DRAW = 3  # 平局
+
+PICK_LABELS = {PICK_UNKNOWN: '未知', PICK_LEFT: '左', PICK_RIGHT: '右', PICK_DRAW: '平'}  # 编码 -> 中间CSV中的文字
+PICK_SIDES = {PICK_LEFT: 'left', PICK_RIGHT: 'right'}  # 编码 -> 队伍标志文件名中的 left/right
+LABEL_CODES = {label: code for code, label in PICK_LABELS.items()}  # 中间CSV中的文字 -> 编码
+
+
+class Predictions:
+    """一轮预测：昵称列表 + 按行连续存放的预测编码（num_players × num_matches 的 int8 数组）"""
+
+    __slots__ = ('match_titles', 'nicknames', 'codes')
+
+    def __init__(self, match_titles, nicknames=None, codes=None):
+        self.match_titles = list(match_titles)  # 每场比赛的标题（原始表头）
+        self.nicknames = nicknames if nicknames is not None else []
+        self.codes = codes if codes is not None else array('b')
+
+    @property
+    def num_matches(self):
+        return len(self.match_titles)
+
+    @property
+    def num_players(self):
+        return len(self.nicknames)
+
+    def add(self, nickname, picks):
+        """追加一名玩家的预测，picks 是长度为 num_matches 的编码序列"""
+        if len(picks) != self.num_matches:
+            raise ValueError(f"{nickname} 的预测数量 {len(picks)} 与比赛数量 {self.num_matches} 不一致")
+        self.nicknames.append(nickname)
+        self.codes.extend(picks)
+
+    def row(self, player_idx):
+        """返回第 player_idx 名玩家的预测编码"""
+        start = player_idx * self.num_matches
+        return self.codes[start:start + self.num_matches]
+
+    def slice(self, start, stop):
+        """返回第 start 到 stop-1 名玩家组成的新预测表（复制数据，可以单独传给其他进程）"""
+        n = self.num_matches
+        return Predictions(self.match_titles, self.nicknames[start:stop], self.codes[start * n:stop * n])
+
+    def rows(self):
+        """依次返回 (昵称, 预测编码)"""
+        for player_idx, nickname in enumerate(self.nicknames):
+            yield nickname, self.row(player_idx)
+
+
+def write_predictions_csv(predictions, output_file, append=False):
+    """把预测写成中间CSV（昵称, 第1场赛, 第2场赛, ...），append 为 True 时只在文件末尾追加数据行"""
+    with open(output_file, mode='a' if append else 'w', encoding='utf-8', newline='') as outfile:
+        csv_writer = csv.writer(outfile)
+
+        # 写入标题行
+        if not append:
+            header = ['昵称'] + [f'第{i+1}场赛' for i in range(predictions.num_matches)]
+            csv_writer.writerow(header)
+
+        # 写入数据行
+        for nickname, picks in predictions.rows():
+            csv_writer.writerow([nickname] + [PICK_LABELS[code] for code in picks])
+
+
+def parse_predictions_csv(infile):
+    """从已打开的中间CSV格式文件中读取预测"""
+    csv_reader = csv.reader(infile)
+    headers = next(csv_reader)
+    predictions = Predictions(headers[1:])
+    for row in csv_reader:
+        if not row:
+            continue
+        picks = [LABEL_CODES.get(label.strip(), PICK_UNKNOWN) for label in row[1:1 + predictions.num_matches]]
+        picks += [PICK_UNKNOWN] * (predictions.num_matches - len(picks))
+        predictions.add(row[0], picks)
+    return predictions
+
+
+def read_predictions_csv(input_file):
+    """读取中间CSV格式的文件（如 output.csv、result.csv）"""
+    with open(input_file, mode='r', encoding='utf-8-sig') as infile:
+        return parse_predictions_csv(infile)
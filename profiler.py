@@ -0,0 +1,119 @@
+"""运行统计：各阶段的墙钟/CPU时间、图片解码和缩放次数、缓存命中、按类别统计的素材加载失败
+
+统计一直在记录（开销只是几次计时调用），加 --profile 时才写出 JSON。
+阶段可以嵌套（如 render 包含 encode），每个阶段单独累计。
+多进程渲染时，进程池中的统计不会汇总到主进程；同一进程中的多个线程（编码、提前加载头像）可以同时记录。
+"""
+import cProfile
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+# 配置参数
+FAILURE_SAMPLES = 5  # 每类加载失败最多保留几条错误信息
+
+
+class Profiler:
+    """累计各阶段耗时、计数和加载失败"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}  # 阶段名 -> [调用次数, 墙钟时间, CPU时间]
+        self.counters = Counter()
+        self.failures = Counter()
+        self.failure_samples = {}  # 类别 -> 前几条错误信息
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """计时一个阶段，同名阶段的时间累加"""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            with self._lock:
+                totals = self.stages.setdefault(name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += wall
+                totals[2] += cpu
+
+    def timed(self, name):
+        """装饰器：把整个函数计为一个阶段"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def record_failure(self, category, error):
+        """记录一次素材加载失败，category 如 avatar、team_logo、background"""
+        with self._lock:
+            self.failures[category] += 1
+            samples = self.failure_samples.setdefault(category, [])
+            if len(samples) < FAILURE_SAMPLES:
+                samples.append(str(error))
+
+    def report(self, extra=None):
+        """汇总成可以写成 JSON 的字典，extra 中的内容原样附加"""
+        report = {
+            'total_wall_s': round(time.perf_counter() - self.started, 6),
+            'stages': {
+                name: {'calls': calls, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6)}
+                for name, (calls, wall, cpu) in self.stages.items()
+            },
+            'counters': dict(self.counters),
+            'asset_failures': {
+                category: {'count': count, 'samples': self.failure_samples.get(category, [])}
+                for category, count in self.failures.items()
+            },
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+
+# 进程内共用的统计实例
+profiler = Profiler()
+profile_stage = profiler.stage
+profiled = profiler.timed
+count_event = profiler.count
+record_failure = profiler.record_failure
+
+
+def write_profile(path, extra=None):
+    """把统计写成 JSON 文件"""
+    with open(path, mode='w', encoding='utf-8') as f:
+        json.dump(profiler.report(extra), f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"运行统计已保存到 {path}")
+
+
+@contextmanager
+def capture_cprofile(path):
+    """path 不为空时用 cProfile 记录这段代码，结果保存为 pstats 文件（可用 snakeviz 等工具查看）"""
+    if not path:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(path)
+        print(f"cProfile 结果已保存到 {path}")
@@ -0,0 +1,347 @@
+"""本地出图服务：常驻进程，收到CSV直接返回图片，字体、队伍标志和头像缩略图一直留在内存中
+
+用法:
+    python render_server.py --port 8000 --workers 2
+
+接口:
+    POST /render        请求体是腾讯文档导出的CSV（同 input.csv），返回预测图
+    POST /render?answers=左,右,左,左
+                        同上，按给出的结果评分，返回评分后的表格（同 result.py）
+    POST /score         请求体是第一行为标准答案的中间CSV（同 result.csv），返回评分后的表格
+    GET  /health        服务状态
+    GET  /metrics       请求数、排队数、耗时、各渲染进程的缓存命中等统计（JSON）
+
+POST 接口都可以加 encode=<预设> 选择输出编码（见 image_encode.ENCODE_PRESETS）。
+出图在固定数量的渲染进程中进行，正在渲染和排队的请求总数超过上限时直接返回 503。
+渲染进程意外退出（如内存不足被杀掉）时，当时的请求返回 500，进程池自动重新启动。
+"""
+import csv
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import board
+import result
+import script
+from asset_cache import sprite_cache
+from avatar_cache import avatar_cache
+from font_cache import find_system_chinese_font, load_fonts
+from image_encode import DEFAULT_PRESET, ENCODE_PRESETS, encode_image
+from logo_index import set_match_titles
+from predictions import LABEL_CODES, PICK_UNKNOWN, parse_predictions_csv
+from scoring import score_round, split_answer_row
+from text_cache import text_cache
+
+# 配置参数
+SERVER_HOST = "127.0.0.1"  # 只监听本机
+SERVER_PORT = 8000
+RENDER_WORKERS = 2  # 渲染进程数
+MAX_QUEUE = 16  # 最多排队的请求数（不含正在渲染的）
+MAX_UPLOAD_BYTES = 16 * 1024 * 1024  # 上传CSV的大小上限
+RENDER_TIMEOUT = 120  # 单个请求最长等待时间（秒）
+CONTENT_TYPES = {'PNG': 'image/png', 'WEBP': 'image/webp'}
+ANSWER_ALIASES = {'left': LABEL_CODES['左'], 'right': LABEL_CODES['右'], 'draw': LABEL_CODES['平'], '': PICK_UNKNOWN}
+
+
+class RequestError(Exception):
+    """请求内容有误，返回 400"""
+
+
+def parse_answers(text):
+    """把 "左,右,左,左" 解析为结果编码，空白或无法识别的一项表示该场还没有结果"""
+    answers = []
+    for label in text.replace('，', ',').split(','):
+        label = label.strip()
+        answers.append(LABEL_CODES.get(label, ANSWER_ALIASES.get(label.lower(), PICK_UNKNOWN)))
+    return answers
+
+
+# ---- 渲染进程 ----
+
+def _init_service_worker(font_path):
+    """渲染进程初始化：加载字体（队伍标志按每个请求的表头查找，第一次用到时加载并留在素材缓存中）"""
+    board.FONT_PATH = font_path
+    load_fonts(font_path)
+
+
+def _worker_ping(_):
+    """空任务，用来让进程池提前启动渲染进程"""
+    return os.getpid()
+
+
+def _render_task(kind, csv_text, answers, preset):
+    """在渲染进程中解析CSV并出图，返回 (图片数据, 统计)"""
+    start = time.perf_counter()
+    infile = io.StringIO(csv_text)
+    if kind == 'score':
+        # 同 result.py：第一行是标准答案
+        answers, predictions = split_answer_row(parse_predictions_csv(infile))
+    else:
+        predictions = script.read_submissions(infile)
+
+    set_match_titles(predictions.match_titles)  # 按表头中的队名找到队伍标志
+    if answers is None:
+        img = script.render_full_image(predictions, script.load_table_fonts())
+    else:
+        try:
+            scores = score_round(predictions, answers)
+        except ValueError as e:
+            raise RequestError(str(e))
+        img = result.render_scored_table(predictions, scores)
+    render_time = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    encode_image(img, buffer, preset)
+    # 渲染进程退出时不执行 atexit，每次出图后直接保存头像索引和负缓存（没有变化时什么也不写）
+    avatar_cache.save_index()
+    stats = {
+        'pid': os.getpid(),
+        'players': predictions.num_players,
+        'matches': predictions.num_matches,
+        'render_s': render_time,
+        'encode_s': time.perf_counter() - start - render_time,
+        'sprite_cache': sprite_cache.stats(),
+        'text_cache': text_cache.stats(),
+    }
+    return buffer.getvalue(), stats
+
+
+# ---- 服务进程 ----
+
+class RenderService:
+    """渲染进程池 + 请求数限制 + 运行统计"""
+
+    def __init__(self, workers=RENDER_WORKERS, max_queue=MAX_QUEUE, timeout=RENDER_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.font_path = find_system_chinese_font()
+        self.pool = self._open_pool()
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.in_flight = 0  # 正在渲染和排队的请求数
+        self.requests = {}  # 接口 -> 请求数
+        self.errors = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.rendered = 0
+        self.restarts = 0  # 渲染进程意外退出后重新启动进程池的次数
+        self.worker_stats = {}  # 进程号 -> 最近一次的 (素材缓存, 文字缓存) 统计
+
+    def _open_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_service_worker,
+                                   initargs=(self.font_path,))
+
+    def _restart_pool(self, broken_pool):
+        """渲染进程意外退出后进程池不能再用：换一个新的进程池并提前启动（多个请求同时发现时只换一次）"""
+        with self._lock:
+            if self.pool is not broken_pool:
+                return
+            self.pool = self._open_pool()
+            self.restarts += 1
+            self.worker_stats.clear()
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+        print("渲染进程意外退出，已重新启动进程池")
+        self.warm_up()
+
+    def warm_up(self):
+        """启动全部渲染进程，让字体和素材在第一个请求之前就加载好"""
+        list(self.pool.map(_worker_ping, range(self.workers)))
+        print(f"已启动 {self.workers} 个渲染进程")
+
+    def render(self, kind, csv_text, answers, preset):
+        """提交一次出图，返回 (图片数据, 统计)；队列已满时返回 None"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return None
+        start = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+        pool = self.pool
+        try:
+            future = pool.submit(_render_task, kind, csv_text, answers, preset)
+        except BaseException as e:
+            self._release_slot()
+            if isinstance(e, BrokenProcessPool):
+                self._restart_pool(pool)
+            raise
+        # 等待超时后渲染进程仍在出图，名额要等任务真正结束才归还，否则超时的请求会越积越多
+        future.add_done_callback(self._release_slot)
+        try:
+            data, stats = future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            self._restart_pool(pool)
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.rendered += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+            self.worker_stats[stats['pid']] = (stats['sprite_cache'], stats['text_cache'])
+        stats['total_s'] = elapsed
+        return data, stats
+
+    def _release_slot(self, _future=None):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def count_request(self, endpoint, error=False):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if error:
+                self.errors += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'uptime_s': round(time.time() - self.started, 3),
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'queued': max(self.in_flight - self.workers, 0),
+                'requests': dict(self.requests),
+                'rendered': self.rendered,
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'restarts': self.restarts,
+                'latency_avg_s': round(self.latency_total / self.rendered, 6) if self.rendered else None,
+                'latency_max_s': round(self.latency_max, 6),
+                'font': self.font_path,
+                'sprite_cache': {str(pid): stats[0] for pid, stats in self.worker_stats.items()},
+                'text_cache': {str(pid): stats[1] for pid, stats in self.worker_stats.items()},
+            }
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """处理单个 HTTP 请求，出图交给 RenderService"""
+
+    service = None  # 由 serve() 设置
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body, content_type, extra_headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), "application/json; charset=utf-8")
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self.service.count_request(path)
+            self._send_json(200, {'status': 'ok', 'in_flight': self.service.in_flight})
+        elif path == '/metrics':
+            self.service.count_request(path)
+            self._send_json(200, self.service.metrics())
+        else:
+            self._send_json(404, {'error': f"未知的接口: {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ('/render', '/score'):
+            self._send_json(404, {'error': f"未知的接口: {url.path}"})
+            return
+        query = parse_qs(url.query)
+        preset = query.get('encode', [DEFAULT_PRESET])[0]
+        answers = parse_answers(query['answers'][0]) if 'answers' in query and url.path == '/render' else None
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # 负数会让 rfile.read 一直读到连接关闭
+            self.service.count_request(url.path, error=True)
+            self._send_json(400, {'error': "Content-Length 需要是非负整数"})
+            self.close_connection = True
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self.service.count_request(url.path, error=True)
+            self._send_json(413, {'error': f"CSV 超过 {MAX_UPLOAD_BYTES} 字节"})
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+
+        try:
+            if preset not in ENCODE_PRESETS:
+                raise RequestError(f"未知的编码预设: {preset}，可选: {', '.join(ENCODE_PRESETS)}")
+            try:
+                csv_text = body.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise RequestError("CSV 需要是 UTF-8 编码")
+            rendered = self.service.render(url.path.lstrip('/'), csv_text, answers, preset)
+        except (RequestError, ValueError, csv.Error, StopIteration, IndexError) as e:
+            self.service.count_request(url.path, error=True)
+            self._send_json(400, {'error': str(e) or "CSV 内容为空或格式不对"})
+            return
+        except FutureTimeout:
+            self.service.count_request(url.path, error=True)
+            self._send_json(504, {'error': f"出图超过 {self.service.timeout} 秒"})
+            return
+        except BrokenProcessPool:
+            self.service.count_request(url.path, error=True)
+            self._send_json(500, {'error': "渲染进程意外退出，已重新启动，请重试"})
+            return
+        except Exception as e:
+            self.service.count_request(url.path, error=True)
+            self._send_json(500, {'error': f"出图失败: {e}"})
+            return
+
+        if rendered is None:
+            self.service.count_request(url.path, error=True)
+            self._send_json(503, {'error': "渲染队列已满，请稍后重试"})
+            return
+        data, stats = rendered
+        self.service.count_request(url.path)
+        self._send(200, data, CONTENT_TYPES[ENCODE_PRESETS[preset][0]], {
+            'X-Players': str(stats['players']),
+            'X-Render-Time': f"{stats['render_s']:.4f}",
+            'X-Encode-Time': f"{stats['encode_s']:.4f}",
+            'X-Total-Time': f"{stats['total_s']:.4f}",
+        })
+
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, workers=RENDER_WORKERS, max_queue=MAX_QUEUE):
+    """启动出图服务，按 Ctrl+C 退出"""
+    service = RenderService(workers, max_queue)
+    service.warm_up()
+    RenderRequestHandler.service = service
+    server = ThreadingHTTPServer((host, port), RenderRequestHandler)
+    server.daemon_threads = True
+    print(f"出图服务已启动: http://{host}:{server.server_port}/ （按 Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("出图服务已停止")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地出图服务: POST CSV 到 /render 或 /score，返回图片")
+    parser.add_argument('--host', default=SERVER_HOST, help="监听地址")
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help="监听端口")
+    parser.add_argument('--workers', type=int, default=RENDER_WORKERS, help="渲染进程数，0 表示使用全部CPU核心")
+    parser.add_argument('--queue', type=int, default=MAX_QUEUE, help="最多排队的请求数，超出时返回 503")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers or os.cpu_count() or 1, args.queue)
@@ -1,270 +1,202 @@
-import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import os
-import matplotlib.font_manager as fm
+from asset_cache import print_cache_stats, sprite_cache
+from avatar_cache import prefetch_avatar
+from board import (Board, BoardRow, BoardStyle, PlayerColumn, ScenarioColumn, ScoreColumn, ScoredPickColumn, avatar_path,
+                   iter_worker_results, load_table_fonts, open_render_pool, team_logo)
+from image_encode import DEFAULT_PRESET, ENCODE_PRESETS, SIZE_PRESETS, output_path, parse_size, print_encode_stats, save_image_set
+from logo_index import set_match_titles
+from predictions import read_predictions_csv
+from profiler import capture_cprofile, profile_stage, profiled, write_profile
+from scoring import score_round, split_answer_row
 
-# 配置参数
-FONT_PATH = None  # 初始设为None，会自动查找系统中文字体
-AVATAR_DIR = "avatars"  # 头像目录
-TEAM_LOGO_DIR = "team_logos"  # 队伍标志目录
+# 配置参数（字体、头像目录和队伍标志目录在 board.py 中，与 script.py 共用）
 OUTPUT_FILE = "predictions_table.png"  # 输出文件
 
-def find_system_chinese_font():
-    """自动查找系统中的中文字体"""
-    try:
-        # 尝试常见的中文字体
-        for font in fm.findSystemFonts():
-            if 'msyh' in font.lower():  # 微软雅黑
-                return font
-            if 'simhei' in font.lower():  # 黑体
-                return font
-            if 'simsun' in font.lower():  # 宋体
-                return font
-            if 'notosanscjk' in font.lower():  # Noto Sans CJK
-                return font
-        # 如果没找到，返回第一个字体
-        return fm.findSystemFonts()[0]
-    except:
-        return None
+# 表格尺寸参数
+HEADER_HEIGHT = 120
+ROW_HEIGHT = 120
+AVATAR_COL_WIDTH = 150
+MATCH_COL_WIDTH = 180
+RESULT_COL_WIDTH = 100  # 新增的正确场次列宽度
+SCENARIO_COL_WIDTH = 160  # 情形分析列（最好名次、进入前N名的概率）宽度，只在指定 --top-n 时出现
+BORDER_WIDTH = 2
+STRIP_ROWS = 32  # 多进程渲染时每段的行数
 
-def generate_table_visualization(csv_path):
-    # 读取CSV数据
-    df = pd.read_csv(csv_path)
-    
-    # 获取标准答案（第一行）
-    standard_answers = df.iloc[0, 1:].tolist()
-    
-    # 移除第一行（标准答案）
-    df = df.iloc[1:]
-    
-    num_matches = 4  # 假设有4场比赛
-    num_players = len(df)
-    
-    # 计算每个玩家的正确场次并添加到DataFrame中
-    correct_counts = []
-    for _, row in df.iterrows():
-        matches = [row[f'第{i}场赛'] for i in range(1, num_matches + 1)]
-        correct_count = sum(1 for i in range(num_matches) if matches[i] == standard_answers[i])
-        correct_counts.append(correct_count)
-    
-    df['正确场次'] = correct_counts
-    
-    # 按正确场次从高到低排序
-    df = df.sort_values(by='正确场次', ascending=False).reset_index(drop=True)
-    
-    # 设置字体 - 优先使用系统中文字体
-    global FONT_PATH
-    if FONT_PATH is None:
-        FONT_PATH = find_system_chinese_font()
-    
-    try:
-        font_large = ImageFont.truetype(FONT_PATH, 28) if FONT_PATH else ImageFont.load_default(28)
-        font_medium = ImageFont.truetype(FONT_PATH, 22) if FONT_PATH else ImageFont.load_default(22)
-        font_small = ImageFont.truetype(FONT_PATH, 18) if FONT_PATH else ImageFont.load_default(18)
-    except:
-        # 如果字体加载失败，使用默认字体并调整大小
-        default_font = ImageFont.load_default()
-        font_large = default_font.font_variant(size=28)
-        font_medium = default_font.font_variant(size=22)
-        font_small = default_font.font_variant(size=18)
-    
-    # 表格尺寸参数
-    header_height = 120
-    row_height = 120
-    avatar_col_width = 150
-    match_col_width = 180
-    result_col_width = 100  # 新增的正确场次列宽度
-    border_width = 2
-    
-    # 计算总图片尺寸 (增加一列用于显示正确场次)
-    img_width = avatar_col_width + num_matches * match_col_width + result_col_width
-    img_height = header_height + num_players * row_height
+# 颜色
+ROW_COLORS = [(220, 220, 220), (255, 255, 255)]  # 行背景 (交替颜色)
+GRID_COLOR = (150, 150, 150)  # 分割线
+CORRECT_COLOR = (144, 238, 144)  # 预测正确：绿色
+INCORRECT_COLOR = (255, 182, 193)  # 预测错误：粉色
+AVATAR_SIZE = 80  # 头像拉伸到的边长
+
+# 评分表的画法：表头和每行都有底色和分割线，预测格子按是否正确着色
+BOARD_STYLE = BoardStyle(HEADER_HEIGHT, ROW_HEIGHT, header_row_y=60, header_row_height=HEADER_HEIGHT - 60,
+                         avatar_path=avatar_path, logo_path=team_logo, overlay=False, title="预测结果表", title_y=20,
+                         header_background=(70, 130, 180), header_fill=(100, 150, 200), text_color=(0, 0, 0),
+                         header_logo_size=25, header_logo_spacing=8, match_labels=True,
+                         pick_logo_size=min(MATCH_COL_WIDTH - 20, ROW_HEIGHT - 20), avatar_size=AVATAR_SIZE, name_top=98,
+                         row_colors=ROW_COLORS, grid_color=GRID_COLOR, border_width=BORDER_WIDTH,
+                         pick_colors=(CORRECT_COLOR, INCORRECT_COLOR))
+
+def scored_board(num_matches, fonts, top_n=None):
+    """评分表：玩家列 + 每场比赛一列 + 正确场次列，top_n 指定时最右边再加一列情形分析"""
+    columns = [PlayerColumn(AVATAR_COL_WIDTH, "玩家")]
+    columns += [ScoredPickColumn(MATCH_COL_WIDTH, i) for i in range(num_matches)]
+    columns.append(ScoreColumn(RESULT_COL_WIDTH, "正确场次"))
+    if top_n is not None:
+        columns.append(ScenarioColumn(SCENARIO_COL_WIDTH, top_n))
+    return Board(BOARD_STYLE, columns, fonts)
+
+def scored_rows(predictions, scores, scenarios=None):
+    """按正确场次从高到低排列的每一行"""
+    rows = []
+    for player_idx in scores.order:
+        best_rank = probability = None
+        if scenarios is not None:
+            best_rank, probability = scenarios.best_ranks[player_idx], scenarios.top_probability[player_idx]
+        rows.append(BoardRow(predictions.nicknames[player_idx], scores.picks[player_idx], scores.correct[player_idx],
+                             scores.correct_counts[player_idx], best_rank, probability))
+    return rows
+
+_band_boards = {}  # 渲染进程中建好的评分表：(比赛数, top_n) -> Board（各段共用，列中缓存的格子不用每段重新画）
+
+def _render_band(fonts, num_matches, top_n, rows, first_row_idx):
+    """在渲染进程中渲染一段行（不含表头），第一行是整张表的第 first_row_idx 行"""
+    board = _band_boards.get((num_matches, top_n))
+    if board is None:
+        board = _band_boards[(num_matches, top_n)] = scored_board(num_matches, fonts, top_n)
+    strip = Image.new('RGB', (board.width, len(rows) * ROW_HEIGHT), color=(240, 240, 240))
+    board.draw_rows(strip, rows, 0, first_row_idx)
+    return strip
+
+def render_scored_table(predictions, scores, scenarios=None, pool=None, window=4):
+    """根据评分结果渲染表格图片，按正确场次从高到低排列
+    
+    scenarios 是 scenarios.ScenarioReport 时在最右边增加一列最好名次和进入前N名的概率。
+    pool 不为空时每 STRIP_ROWS 行为一段在进程池中并行渲染，同时最多有 window 段在渲染或等待取走。
+    """
+    num_matches = predictions.num_matches
+    fonts = load_table_fonts()
+    set_match_titles(predictions.match_titles)  # 按表头中的队名找到队伍标志
+    top_n = scenarios.top_n if scenarios is not None else None
+    board = scored_board(num_matches, fonts, top_n)
+    rows = scored_rows(predictions, scores, scenarios)
     
     # 创建画布
-    img = Image.new('RGB', (img_width, img_height), color=(240, 240, 240))
-    draw = ImageDraw.Draw(img)
-    
-    # 绘制表头背景
-    draw.rectangle([0, 0, img_width, header_height], fill=(70, 130, 180), outline=(50, 50, 50))
-    
-    # 绘制标题 - 确保中文显示
-    title = "预测结果表"
-    bbox = draw.textbbox((0, 0), title, font=font_large)
-    title_width = bbox[2] - bbox[0]
-    title_height = bbox[3] - bbox[1]
-    draw.text((img_width//2 - title_width//2, 20), title, fill=(255, 255, 255), font=font_large)
-    
-    # 计算表头第二行的高度和位置
-    header_row2_height = header_height - 60  # 标题占据60像素
-    header_row2_y = 60  # 第二行从60像素开始
-    
-    # 绘制表头 - 玩家列
-    draw.rectangle([0, header_row2_y, avatar_col_width, header_height], fill=(100, 150, 200), outline=(50, 50, 50))
-    
-    # 玩家列标题
-    player_text = "玩家"
-    bbox = draw.textbbox((0, 0), player_text, font=font_medium)
-    player_text_width = bbox[2] - bbox[0]
-    player_text_height = bbox[3] - bbox[1]
-    draw.text((avatar_col_width//2 - player_text_width//2, 
-               header_row2_y + (header_row2_height - player_text_height)//2), 
-              player_text, fill=(255, 255, 255), font=font_medium)
-    
-    # 绘制表头 - 比赛列
-    for i in range(num_matches):
-        x_start = avatar_col_width + i * match_col_width
-        x_end = x_start + match_col_width
-        
-        # 比赛列背景
-        draw.rectangle([x_start, header_row2_y, x_end, header_height], fill=(100, 150, 200), outline=(50, 50, 50))
-        
-        # 比赛标题 - 使用中文数字
-        chinese_numbers = ["一", "二", "三", "四", "五", "六", "七", "八", "九", "十"]
-        match_num = chinese_numbers[i] if i < len(chinese_numbers) else str(i+1)
-        match_title = f"第{match_num}场"
-        
-        # 计算文本位置
-        bbox = draw.textbbox((0, 0), match_title, font=font_medium)
-        match_title_width = bbox[2] - bbox[0]
-        match_title_height = bbox[3] - bbox[1]
-        
-        # 图标大小和间距设置
-        logo_size = 25
-        spacing = 8  # 图标和文字之间的间距
-        
-        # 计算总宽度(左图标+间距+文字+间距+右图标)
-        total_width = logo_size + spacing + match_title_width + spacing + logo_size
-        
-        # 计算起始位置(居中)
-        start_x = x_start + (match_col_width - total_width) // 2
-        
-        # 加载并绘制队伍标志
-        try:
-            # 左图标
-            left_logo = Image.open(os.path.join(TEAM_LOGO_DIR, f"match{i+1}_left.png"))
-            left_logo = left_logo.resize((logo_size, logo_size))
-            img.paste(left_logo, (start_x, 
-                                header_row2_y + (header_row2_height - logo_size)//2))
-            
-            # 文字
-            draw.text((start_x + logo_size + spacing, 
-                      header_row2_y + (header_row2_height - match_title_height)//2), 
-                     match_title, fill=(255, 255, 255), font=font_medium)
-            
-            # 右图标
-            right_logo = Image.open(os.path.join(TEAM_LOGO_DIR, f"match{i+1}_right.png"))
-            right_logo = right_logo.resize((logo_size, logo_size))
-            img.paste(right_logo, (start_x + logo_size + spacing + match_title_width + spacing, 
-                                 header_row2_y + (header_row2_height - logo_size)//2))
-        except:
-            # 如果图标加载失败，只绘制文字
-            draw.text((x_start + (match_col_width - match_title_width) // 2, 
-                      header_row2_y + (header_row2_height - match_title_height) // 2), 
-                     match_title, fill=(255, 255, 255), font=font_medium)
-    
-    # 绘制表头 - 正确场次列
-    x_start = avatar_col_width + num_matches * match_col_width
-    x_end = x_start + result_col_width
-    draw.rectangle([x_start, header_row2_y, x_end, header_height], fill=(100, 150, 200), outline=(50, 50, 50))
-    
-    # 正确场次列标题
-    result_text = "正确场次"
-    bbox = draw.textbbox((0, 0), result_text, font=font_medium)
-    result_text_width = bbox[2] - bbox[0]
-    result_text_height = bbox[3] - bbox[1]
-    draw.text((x_start + result_col_width//2 - result_text_width//2, 
-               header_row2_y + (header_row2_height - result_text_height)//2), 
-              result_text, fill=(255, 255, 255), font=font_medium)
+    img = Image.new('RGB', (board.width, board.layout.height(len(rows))), color=(240, 240, 240))
+    board.draw_header(img)
     
     # 绘制表格内容
-    for row_idx, (_, row) in enumerate(df.iterrows()):
-        nickname = row['昵称']
-        matches = [row[f'第{i}场赛'] for i in range(1, num_matches + 1)]
-        correct_count = row['正确场次']
-        y_start = header_height + row_idx * row_height
-        y_end = y_start + row_height
-        
-        # 绘制行背景 (交替颜色)
-        row_color = (220, 220, 220) if row_idx % 2 == 0 else (255, 255, 255)
-        draw.rectangle([0, y_start, img_width, y_end], fill=row_color, outline=(150, 150, 150))
-        
-        # 绘制垂直分割线
-        for i in range(num_matches + 2):  # 增加一条线用于正确场次列
-            x = avatar_col_width + i * match_col_width if i <= num_matches else avatar_col_width + num_matches * match_col_width
-            draw.line([x, y_start, x, y_end], fill=(150, 150, 150), width=border_width)
-        
-        # 绘制水平分割线
-        draw.line([0, y_end, img_width, y_end], fill=(150, 150, 150), width=border_width)
-        
-        # 绘制头像
-        try:
-            avatar = Image.open(os.path.join(AVATAR_DIR, f"{nickname}.png"))
-            avatar = avatar.resize((80, 80))
-            img.paste(avatar, (avatar_col_width//2 - 40, y_start + 20))
-        except:
-            draw.rectangle([avatar_col_width//2 - 40, y_start + 20, avatar_col_width//2 + 40, y_start + 100], 
-                        outline=(100, 100, 100))
-            draw.text((avatar_col_width//2 - 20, y_start + 50), "头像", fill=(100, 100, 100), font=font_small)
+    if pool is None:
+        board.draw_rows(img, rows, HEADER_HEIGHT)
+        return img
+    starts = range(0, len(rows), STRIP_ROWS)
+    jobs = ((num_matches, top_n, rows[start:start + STRIP_ROWS], start) for start in starts)
+    for start, strip in zip(starts, iter_worker_results(pool, _render_band, jobs, window)):
+        img.paste(strip, (0, HEADER_HEIGHT + start * ROW_HEIGHT))
+    return img
+
+@profiled('main')
+def generate_table_visualization(csv_path, cprofile_file=None, preset=DEFAULT_PRESET, output_file=OUTPUT_FILE,
+                                 top_n=None, samples=None, sizes=(), light=False, workers=1):
+    """根据带标准答案的CSV（第一行是标准答案）生成评分后的表格图片，返回其余玩家的预测
 
-        # 绘制昵称 
-        bbox = draw.textbbox((0, 0), nickname, font=font_small)
-        name_width = bbox[2] - bbox[0]
-        name_height = bbox[3] - bbox[1]
-        draw.text((avatar_col_width//2 - name_width//2, y_start + 98), 
-                nickname, fill=(0, 0, 0), font=font_small)
-       
-        # 绘制每场比赛的预测选择
-        for match_idx, choice in enumerate(matches):
-            x_start = avatar_col_width + match_idx * match_col_width
-            x_end = x_start + match_col_width
-            
-            # 确定选择的队伍
-            team = "left" if choice == "左" else "right"
-            
-            # 判断预测是否正确
-            is_correct = choice == standard_answers[match_idx]
-            highlight_color = (144, 238, 144) if is_correct else (255, 182, 193)  # 正确绿色，错误粉色
-            
-            # 绘制高亮背景
-            draw.rectangle([x_start + border_width, y_start + border_width, 
-                          x_end - border_width, y_end - border_width], 
-                          fill=highlight_color)
-            
-            try:
-                # 加载并绘制所选队伍的完整图标
-                team_logo = Image.open(os.path.join(TEAM_LOGO_DIR, f"match{match_idx+1}_{team}.png"))
-                # 调整大小填满格子空间 (保留10像素边距)
-                logo_size = min(match_col_width - 20, row_height - 20)
-                team_logo = team_logo.resize((logo_size, logo_size))
-                img.paste(team_logo, (x_start + match_col_width//2 - logo_size//2, y_start + row_height//2 - logo_size//2))
-            except:
-                # 如果图标不存在，绘制占位符
-                draw.rectangle([x_start + 10, y_start + 10, x_end - 10, y_end - 10], 
-                              fill=(200, 200, 200), outline=(150, 150, 150))
-                bbox = draw.textbbox((0, 0), choice, font=font_medium)
-                choice_width = bbox[2] - bbox[0]
-                draw.text((x_start + match_col_width//2 - choice_width//2, y_start + row_height//2 - 10), 
-                         choice, fill=(0, 0, 0), font=font_medium)
-        
-        # 绘制正确场次数
-        x_start = avatar_col_width + num_matches * match_col_width
-        x_end = x_start + result_col_width
-        
-        # 绘制背景
-        draw.rectangle([x_start, y_start, x_end, y_end], fill=row_color, outline=(150, 150, 150))
-        
-        # 绘制数字
-        count_text = str(correct_count)
-        bbox = draw.textbbox((0, 0), count_text, font=font_medium)
-        count_width = bbox[2] - bbox[0]
-        count_height = bbox[3] - bbox[1]
-        draw.text((x_start + result_col_width//2 - count_width//2, 
-                  y_start + row_height//2 - count_height//2), 
-                 count_text, fill=(0, 0, 0), font=font_medium)
+    cprofile_file 指定时用 cProfile 记录出图部分；preset 是输出图片的编码预设（见 image_encode.ENCODE_PRESETS）。
+    top_n 指定时对还没有结果的比赛做情形分析，增加一列最好名次和进入前 top_n 名的概率，
+    剩余情形数超过 samples（默认 scenarios.SCENARIO_SAMPLES）时改为抽样 samples 次。
+    sizes 是 [(名称, 宽度)]，同一次渲染再输出这些缩小尺寸。light 为 True 时不用 numpy 评分（不能做情形分析）。
+    workers 大于 1 时按行分段，在多个进程中并行渲染后再拼接。
+    """
+    if light and top_n is not None:
+        raise ValueError("轻量模式不支持情形分析")
+    # 读取CSV数据，第一行是标准答案
+    with profile_stage('parse'):
+        standard_answers, predictions = split_answer_row(read_predictions_csv(csv_path))
+    
+    # 评分和绘制表头的同时，在后台加载头像缩略图
+    for nickname in predictions.nicknames:
+        prefetch_avatar(avatar_path(nickname), AVATAR_SIZE, keep_ratio=False)
+    
+    # 计算每个玩家的正确场次和排名（按正确场次从高到低，同分保持原顺序）
+    with profile_stage('score'):
+        scores = score_round(predictions, standard_answers, light)
+    print_match_accuracy(scores)
+    
+    # 剩余比赛的情形分析
+    scenarios = None
+    if top_n is not None:
+        # 情形分析需要 numpy，只在用到时才导入
+        from scenarios import SCENARIO_SAMPLES, analyze_round
+        with profile_stage('scenarios'):
+            scenarios = analyze_round(scores, top_n, samples or SCENARIO_SAMPLES)
+        print(f"情形分析: {scenarios.describe()}")
+    
+    set_match_titles(predictions.match_titles, verbose=True)
+    pool = open_render_pool(workers, predictions.match_titles) if workers > 1 else None
+    try:
+        with capture_cprofile(cprofile_file), profile_stage('render'):
+            img = render_scored_table(predictions, scores, scenarios, pool, window=workers * 2)
+    finally:
+        if pool is not None:
+            pool.shutdown()
     
     # 保存图片
-    img.save(OUTPUT_FILE)
-    print(f"已生成表格化预测图: {OUTPUT_FILE}")
+    output_file = output_path(output_file, preset)
+    saved = save_image_set(img, output_file, preset, sizes)
+    print(f"已生成表格化预测图: {output_file}")
+    if len(saved) > 1:
+        print(f"缩小尺寸: {', '.join(path for path, _, _ in saved[1:])}")
+    print_cache_stats()
+    print_encode_stats(preset)
+    return predictions
+
+def print_match_accuracy(scores):
+    """打印每场比赛的正确率"""
+    parts = []
+    for i, accuracy in enumerate(scores.match_accuracy):
+        parts.append(f"第{i+1}场 {accuracy:.0%}" if accuracy == accuracy else f"第{i+1}场 未出结果")
+    print("每场正确率: " + "，".join(parts))
 
-# 使用示例
-generate_table_visualization("result.csv")
\ No newline at end of file
+if __name__ == '__main__':
+    import argparse
+    
+    # 使用示例: python result.py [result.csv]
+    parser = argparse.ArgumentParser(description="根据带标准答案的CSV生成评分后的表格图片: python result.py [result.csv]")
+    parser.add_argument('csv_path', nargs='?', default="result.csv", help="第一行是标准答案的CSV文件")
+    parser.add_argument('--encode', choices=list(ENCODE_PRESETS), default=DEFAULT_PRESET,
+                        help="输出编码预设：fast/default/small 为不同压缩级别的PNG，palette 为256色PNG，webp/webp-lossy 为WebP")
+    parser.add_argument('--profile', metavar='JSON', help="把各阶段耗时、解码次数、缓存命中和加载失败写入JSON文件")
+    parser.add_argument('--cprofile', metavar='PROF', help="用 cProfile 记录出图部分，结果保存为 pstats 文件")
+    parser.add_argument('--top-n', type=int, metavar='N',
+                        help="对还没有结果（标为“未知”）的比赛做情形分析，增加一列最好名次和最终进入前N名的概率")
+    parser.add_argument('--samples', type=int,
+                        help="情形分析的预算：剩余情形数不超过它时精确枚举，否则随机抽样这么多次")
+    parser.add_argument('--sizes', nargs='+', default=[], metavar='尺寸',
+                        help=f"同一次渲染再输出缩小的图：{'/'.join(SIZE_PRESETS)}，或 名称=宽度（如 chat=1000）")
+    parser.add_argument('--light', action='store_true',
+                        help="轻量模式：只用标准库 csv 和 Pillow，不导入 numpy（启动更快，不能和 --top-n 一起用）")
+    parser.add_argument('--workers', type=int, default=1, help="并行渲染的进程数，0 表示使用全部CPU核心")
+    args = parser.parse_args()
+    try:
+        sizes = [parse_size(spec) for spec in args.sizes]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.top_n is not None and args.top_n < 1:
+        parser.error("--top-n 需要是正整数")
+    if args.samples is not None and args.samples < 1:
+        parser.error("--samples 需要是正整数")
+    if args.light and args.top_n is not None:
+        parser.error("--light 不能和 --top-n 同时使用（情形分析需要 numpy）")
+    
+    workers = args.workers or os.cpu_count() or 1
+    predictions = generate_table_visualization(args.csv_path, args.cprofile, args.encode, top_n=args.top_n,
+                                               samples=args.samples, sizes=sizes, light=args.light, workers=workers)
+    if args.profile:
+        write_profile(args.profile, {
+            'players': predictions.num_players,
+            'matches': predictions.num_matches,
+            'workers': workers,
+            'encode_preset': args.encode,
+            'sprite_cache': sprite_cache.stats(),
+        })
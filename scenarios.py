@@ -0,0 +1,155 @@
+"""剩余比赛的情形分析：部分比赛已出结果时，计算每个玩家最好能拿到的名次和进入前 N 名的概率
+
+每个玩家对未出结果的比赛的预测编码为两个位集（选左的场次、选右的场次），
+一种情形（每场谁赢）也是一个位集，玩家在该情形下的得分 = 已得分 + popcount(选左 & 左赢) + popcount(选右 & 右赢)，
+一次对 情形 × 玩家 的矩阵做位运算即可算出所有得分，不需要逐个枚举。
+剩余情形数不超过预算（samples）时精确枚举全部情形，否则按预算做蒙特卡洛抽样。
+
+最好名次：玩家所选的一方全部获胜时，他与每个其他玩家的分差都达到最大，所以这个情形下的名次就是最好名次；
+玩家有未选（无法识别/平局）的比赛时，这些比赛取选择人数较少的一方获胜，再与枚举/抽样中出现过的最好名次取较好者。
+"""
+import numpy as np
+from predictions import PICK_LEFT, PICK_RIGHT, PICK_UNKNOWN
+
+# 配置参数
+SCENARIO_SAMPLES = 1 << 16  # 情形数预算：剩余情形不超过这个数时精确枚举，否则抽样这么多次
+SCENARIO_CELL_BUDGET = 1 << 22  # 每批计算的 情形数 × 玩家数 上限，控制内存占用
+TOP_N = 3  # 默认统计进入前几名的概率
+
+
+def _popcount(words):
+    """逐元素统计 uint64 中 1 的个数"""
+    return np.bitwise_count(words)
+
+
+if not hasattr(np, 'bitwise_count'):  # numpy 2.0 之前没有 bitwise_count，按字节查表
+    _BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        counts = _BYTE_POPCOUNT[np.ascontiguousarray(words).view(np.uint8)]
+        return counts.reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def pack_bits(flags):
+    """把 (行数, 场数) 的 bool 矩阵按行打包为 (行数, 字数) 的 uint64 位集，第 k 场对应第 k 位"""
+    rows, width = flags.shape
+    words = max((width + 63) // 64, 1)
+    padded = np.zeros((rows, words * 64), dtype=bool)
+    padded[:, :width] = flags
+    return np.packbits(padded, axis=1, bitorder='little').view('<u8').reshape(rows, words)
+
+
+class ScenarioReport:
+    """情形分析结果，下标对应 predictions 中的玩家顺序"""
+
+    __slots__ = ('best_ranks', 'top_probability', 'top_n', 'open_matches', 'scenarios', 'exact')
+
+    def __init__(self, best_ranks, top_probability, top_n, open_matches, scenarios, exact):
+        self.best_ranks = best_ranks  # (玩家数,) 最好名次
+        self.top_probability = top_probability  # (玩家数,) 最终进入前 top_n 名的概率
+        self.top_n = top_n
+        self.open_matches = open_matches  # 未出结果的比赛下标
+        self.scenarios = scenarios  # 实际计算的情形数
+        self.exact = exact  # 是否精确枚举了全部情形
+
+    def describe(self):
+        if not len(self.open_matches):
+            return "所有比赛都已出结果"
+        method = "精确枚举" if self.exact else "蒙特卡洛抽样"
+        return f"剩余 {len(self.open_matches)} 场未出结果，{method} {self.scenarios} 种情形"
+
+
+class ScenarioEngine:
+    """对一轮的评分结果（scoring.RoundScores）做剩余比赛的情形分析"""
+
+    def __init__(self, scores, left_probability=None):
+        """left_probability 是每场未出结果的比赛左边获胜的概率（默认各 50%）"""
+        self.open_matches = np.flatnonzero(scores.answers == PICK_UNKNOWN)
+        open_picks = scores.picks[:, self.open_matches]
+        self.base = scores.correct_counts.astype(np.int32)
+        self.left = pack_bits(open_picks == PICK_LEFT)
+        self.right = pack_bits(open_picks == PICK_RIGHT)
+        self.open_picks = open_picks
+        self.max_score = scores.picks.shape[1]
+        num_open = len(self.open_matches)
+        if left_probability is None:
+            left_probability = np.full(num_open, 0.5)
+        self.left_probability = np.asarray(left_probability, dtype=np.float64)
+
+    @property
+    def num_players(self):
+        return len(self.base)
+
+    def scenario_scores(self, scenarios):
+        """scenarios 是 (情形数, 字数) 的位集（1 表示左边赢），返回 (情形数, 玩家数) 的得分"""
+        left_wins = scenarios[:, None, :] & self.left[None, :, :]
+        right_wins = ~scenarios[:, None, :] & self.right[None, :, :]
+        gained = _popcount(left_wins).sum(axis=2, dtype=np.int32) + _popcount(right_wins).sum(axis=2, dtype=np.int32)
+        return self.base[None, :] + gained
+
+    def scenario_ranks(self, scores):
+        """每种情形下每个玩家的名次（1 + 得分严格更高的人数），按得分直方图计算，不需要排序"""
+        num_scenarios = scores.shape[0]
+        bins = self.max_score + 1
+        flat = scores + (np.arange(num_scenarios, dtype=np.int32) * bins)[:, None]
+        counts = np.bincount(flat.ravel(), minlength=num_scenarios * bins).reshape(num_scenarios, bins)
+        at_least = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+        higher = at_least - counts
+        return 1 + np.take_along_axis(higher, scores, axis=1)
+
+    def best_case_ranks(self):
+        """每个玩家自己所选的一方全部获胜（未选的比赛取选择人数较少的一方获胜）时的名次"""
+        num_open = len(self.open_matches)
+        lefts = (self.open_picks == PICK_LEFT).sum(axis=0)
+        rights = (self.open_picks == PICK_RIGHT).sum(axis=0)
+        fallback = lefts < rights  # 没选的比赛让选的人少的一方赢
+        flags = np.where(self.open_picks == PICK_LEFT, True,
+                         np.where(self.open_picks == PICK_RIGHT, False, fallback[None, :]))
+        best = np.empty(self.num_players, dtype=np.int64)
+        chunk = self._chunk_size()
+        for start in range(0, self.num_players, chunk):
+            stop = min(start + chunk, self.num_players)
+            scenarios = pack_bits(flags[start:stop] if num_open else np.zeros((stop - start, 0), dtype=bool))
+            ranks = self.scenario_ranks(self.scenario_scores(scenarios))
+            best[start:stop] = ranks[np.arange(stop - start), np.arange(start, stop)]
+        return best
+
+    def _chunk_size(self):
+        return max(1, SCENARIO_CELL_BUDGET // max(self.num_players * self.left.shape[1], 1))
+
+    def _iter_scenarios(self, samples, rng):
+        """按批生成 (情形位集, 权重)：情形数不超过 samples 时精确枚举，否则抽样"""
+        num_open = len(self.open_matches)
+        chunk = self._chunk_size()
+        if num_open < 63 and (1 << num_open) <= samples:
+            total = 1 << num_open
+            bit_values = np.uint64(1) << np.arange(num_open, dtype=np.uint64)
+            for start in range(0, total, chunk):
+                codes = np.arange(start, min(start + chunk, total), dtype=np.uint64)
+                flags = (codes[:, None] & bit_values[None, :]) != 0
+                weights = np.where(flags, self.left_probability, 1 - self.left_probability).prod(axis=1)
+                yield pack_bits(flags), weights
+        else:
+            for start in range(0, samples, chunk):
+                count = min(chunk, samples - start)
+                flags = rng.random((count, num_open)) < self.left_probability
+                yield pack_bits(flags), np.full(count, 1.0 / samples)
+
+    def analyze(self, top_n=TOP_N, samples=SCENARIO_SAMPLES, seed=0):
+        """返回 ScenarioReport"""
+        num_open = len(self.open_matches)
+        exact = num_open < 63 and (1 << num_open) <= samples
+        best = self.best_case_ranks()
+        top_probability = np.zeros(self.num_players)
+        evaluated = 0
+        for scenarios, weights in self._iter_scenarios(samples, np.random.default_rng(seed)):
+            ranks = self.scenario_ranks(self.scenario_scores(scenarios))
+            top_probability += weights @ (ranks <= top_n)
+            best = np.minimum(best, ranks.min(axis=0))
+            evaluated += len(weights)
+        return ScenarioReport(best, np.clip(top_probability, 0.0, 1.0), top_n, self.open_matches, evaluated, exact)
+
+
+def analyze_round(scores, top_n=TOP_N, samples=SCENARIO_SAMPLES, left_probability=None, seed=0):
+    """对一轮的评分结果做情形分析，参数见 ScenarioEngine"""
+    return ScenarioEngine(scores, left_probability).analyze(top_n, samples, seed)
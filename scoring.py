@@ -0,0 +1,109 @@
+"""评分引擎：把预测编码看作 玩家 × 比赛 的 int8 矩阵，用数组运算计算正确场次、每场正确率和排名
+
+numpy 只在评分时才导入。没有安装 numpy 或指定 light=True 时改用纯 Python 逐行计算，
+结果相同，只是矩阵换成了列表（result.py --light 只依赖标准库和 Pillow）。
+"""
+from array import array
+from predictions import Predictions, PICK_UNKNOWN
+
+
+class RoundScores:
+    """一轮预测的评分结果，下标都对应 predictions 中的玩家顺序"""
+
+    __slots__ = ('picks', 'answers', 'correct', 'correct_counts', 'match_accuracy', 'order', 'ranks')
+
+    def __init__(self, picks, answers, correct, correct_counts, match_accuracy, order, ranks):
+        self.picks = picks  # (玩家数, 比赛数) int8 预测编码
+        self.answers = answers  # (比赛数,) int8 标准答案，PICK_UNKNOWN 表示还没有结果
+        self.correct = correct  # (玩家数, 比赛数) bool，预测是否正确
+        self.correct_counts = correct_counts  # (玩家数,) 正确场次
+        self.match_accuracy = match_accuracy  # (比赛数,) 每场正确率，没有结果的比赛为 nan
+        self.order = order  # 按正确场次从高到低排列的玩家下标，同分保持原顺序
+        self.ranks = ranks  # (玩家数,) 名次，同分并列
+
+
+def _import_numpy():
+    """导入 numpy，没有安装时返回 None"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def pick_matrix(predictions):
+    """把预测编码数组零拷贝地看作 (玩家数, 比赛数) 的 int8 矩阵"""
+    import numpy as np
+    picks = np.frombuffer(predictions.codes, dtype=np.int8) if len(predictions.codes) else np.zeros(0, dtype=np.int8)
+    return picks.reshape(predictions.num_players, predictions.num_matches)
+
+
+def split_answer_row(predictions):
+    """把第一行（标准答案）拆出来，返回 (标准答案, 其余玩家的预测)"""
+    if predictions.num_players == 0:
+        raise ValueError("缺少标准答案行")
+    num_matches = predictions.num_matches
+    answers = predictions.row(0)
+    players = Predictions(predictions.match_titles, predictions.nicknames[1:],
+                          array('b', predictions.codes[num_matches:]))
+    return answers, players
+
+
+def score_round(predictions, answers, light=False):
+    """对一轮预测评分，answers 是每场比赛的结果编码，没有结果的比赛不计分
+
+    light 为 True（或没有安装 numpy）时用纯 Python 计算，RoundScores 中的数组都是列表。
+    """
+    np = None if light else _import_numpy()
+    if np is None:
+        return _score_round_python(predictions, answers)
+
+    picks = pick_matrix(predictions)
+    answers = np.asarray(answers, dtype=np.int8)
+    if answers.shape != (predictions.num_matches,):
+        raise ValueError(f"标准答案数量 {answers.size} 与比赛数量 {predictions.num_matches} 不一致")
+
+    decided = answers != PICK_UNKNOWN
+    correct = (picks == answers) & decided
+    correct_counts = correct.sum(axis=1, dtype=np.int32)
+
+    # 每场正确率，没有结果或没有玩家时为 nan
+    match_accuracy = np.full(predictions.num_matches, np.nan)
+    if predictions.num_players:
+        match_accuracy[decided] = correct[:, decided].mean(axis=0)
+
+    # 稳定排序：同分的玩家保持提交顺序
+    order = np.argsort(-correct_counts, kind='stable')
+    # 名次 = 1 + 正确场次严格更高的人数
+    sorted_desc = -correct_counts[order]
+    ranks = np.searchsorted(sorted_desc, -correct_counts, side='left') + 1
+
+    return RoundScores(picks, answers, correct, correct_counts, match_accuracy, order, ranks)
+
+
+def _score_round_python(predictions, answers):
+    """score_round 的纯 Python 版本"""
+    answers = array('b', answers)
+    if len(answers) != predictions.num_matches:
+        raise ValueError(f"标准答案数量 {len(answers)} 与比赛数量 {predictions.num_matches} 不一致")
+
+    decided = [answer != PICK_UNKNOWN for answer in answers]
+    picks = [predictions.row(player_idx) for player_idx in range(predictions.num_players)]
+    correct = [[is_decided and code == answer for code, answer, is_decided in zip(row, answers, decided)]
+               for row in picks]
+    correct_counts = [sum(row) for row in correct]
+
+    # 每场正确率，没有结果或没有玩家时为 nan
+    match_accuracy = [sum(row[match_idx] for row in correct) / len(correct) if is_decided and correct else float('nan')
+                      for match_idx, is_decided in enumerate(decided)]
+
+    # sorted 是稳定排序：同分的玩家保持提交顺序；同分并列，名次 = 1 + 正确场次严格更高的人数
+    order = sorted(range(predictions.num_players), key=lambda player_idx: -correct_counts[player_idx])
+    ranks = [0] * predictions.num_players
+    previous_count = None
+    for position, player_idx in enumerate(order):
+        if correct_counts[player_idx] != previous_count:
+            rank, previous_count = position + 1, correct_counts[player_idx]
+        ranks[player_idx] = rank
+
+    return RoundScores(picks, answers, correct, correct_counts, match_accuracy, order, ranks)
@@ -1,300 +1,437 @@
 import csv
-import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
+import time
+from PIL import Image
 import os
-import matplotlib.font_manager as fm
+from asset_cache import load_sprite, print_cache_stats, sprite_cache
+from avatar_cache import prefetch_avatar
+from board import (Board, BoardRow, BoardStyle, PickColumn, PlayerColumn, avatar_path, iter_worker_results,
+                   load_table_fonts, open_render_pool, team_logo)
+from image_encode import (DEFAULT_PRESET, ENCODE_PRESETS, SIZE_PRESETS, encode_stats, output_path, parse_size, print_encode_stats,
+                          save_image_set, stream_compress_level)
+from logo_index import set_match_titles
+from pick_parser import PickParser
+from png_stream import StreamingPNGWriter
+from predictions import Predictions, write_predictions_csv
+from profiler import capture_cprofile, profile_stage, profiled, record_failure, write_profile
 
-# 配置参数
-FONT_PATH = None  # 初始设为None，会自动查找系统中文字体
-AVATAR_DIR = "avatars"  # 头像目录
-TEAM_LOGO_DIR = "team_logos"  # 队伍标志目录
+# 配置参数（字体、头像目录和队伍标志目录在 board.py 中，与 result.py 共用）
 BACKGROUND_DIR = "background"  # 背景图目录
 OUTPUT_CSV = "output.csv"  # 中间CSV文件名
 OUTPUT_IMAGE = "predictions_table.png"  # 输出图片文件名
 
-def find_system_chinese_font():
-    """自动查找系统中的中文字体"""
-    try:
-        # 尝试常见的中文字体
-        for font in fm.findSystemFonts():
-            if 'msyh' in font.lower():  # 微软雅黑
-                return font
-            if 'simhei' in font.lower():  # 黑体
-                return font
-            if 'simsun' in font.lower():  # 宋体
-                return font
-            if 'notosanscjk' in font.lower():  # Noto Sans CJK
-                return font
-        # 如果没找到，返回第一个字体
-        return fm.findSystemFonts()[0]
-    except:
-        return None
+# 表格尺寸参数（调整后的布局）
+HEADER_HEIGHT = 250  # 增加表头高度
+ROW_HEIGHT = 150  # 增加行高
+AVATAR_COL_WIDTH = 180  # 增加头像列宽度
+MATCH_COL_WIDTH = 220  # 增加比赛列宽度（从200增加到220）
+SIDE_MARGIN = 10  # 左右边距各10像素
+TEAM_LOGO_SPACING = 5  # 同一场比赛两个队伍标志之间的间距（从10减少到5）
+MATCH_COL_SPACING = 0  # 不同比赛列之间的间距（增加间距）
+FOOTER_HEIGHT = 100  # 底部额外空间
+STRIP_ROWS = 32  # 分条渲染时每个横条的行数
+AVATAR_SIZE = 80  # 头像缩放到的最大边长
 
-def process_predictions(input_file):
-    """处理原始预测数据并生成中间CSV文件"""
-    # 读取输入CSV文件
-    with open(input_file, mode='r', encoding='utf-8') as infile:
-        csv_reader = csv.reader(infile)
-        
-        # 获取标题行
-        headers = next(csv_reader)
-        
-        # 确定比赛列的范围（从第3列开始）
-        match_columns = headers[3:]
-        num_matches = len(match_columns)
-        
-        # 准备结果列表
-        results = []
-        
-        for row in csv_reader:
-            nickname = row[2]  # 第3列是昵称
-            
-            # 处理每场比赛预测
-            predictions = []
-            for i in range(num_matches):
-                prediction = row[3 + i]  # 从第4列开始是比赛预测
-                
-                # 处理预测结果
-                if '右边赢' in prediction or '右' in prediction:
-                    pred = '右'
-                elif '左边赢' in prediction or '左' in prediction:
-                    pred = '左'
-                else:
-                    # 解析比分
-                    scores = prediction.split('：')
-                    if len(scores) == 2:
-                        left, right = scores
-                        pred = '左' if int(left) > int(right) else '右'
-                    else:
-                        pred = '未知'
-                
-                predictions.append(pred)
-            
-            # 添加到结果列表 [昵称, 预测1, 预测2, ...]
-            results.append([nickname] + predictions)
+def read_submissions(infile, prefetch_avatars=True):
+    """从已打开的腾讯文档导出CSV中读取预测，返回内存中的预测表
+
+    prefetch_avatars 为 True 时，每读到一个玩家就在后台线程中开始加载他的头像缩略图。
+    """
+    csv_reader = csv.reader(infile)
     
-    # 写入输出CSV文件
-    with open(OUTPUT_CSV, mode='w', encoding='utf-8', newline='') as outfile:
-        csv_writer = csv.writer(outfile)
-        
-        # 写入标题行
-        header = ['昵称'] + [f'第{i+1}场赛' for i in range(num_matches)]
-        csv_writer.writerow(header)
+    # 获取标题行
+    headers = next(csv_reader)
+    
+    # 确定比赛列的范围（从第4列开始）
+    predictions = Predictions(headers[3:])
+    num_matches = predictions.num_matches
+    
+    # 每种不同的答案写法只解析一次
+    parser = PickParser()
+    for row in csv_reader:
+        if not row:
+            continue
+        nickname = row[2]  # 第3列是昵称
+        if prefetch_avatars:
+            prefetch_avatar(avatar_path(nickname), AVATAR_SIZE)
         
-        # 写入数据行
-        csv_writer.writerows(results)
+        # 处理每场比赛预测（从第4列开始）
+        picks = parser.parse_row(row[3:], num_matches, csv_reader.line_num)
+        predictions.add(nickname, picks)
     
-    print(f"预测数据处理完成！中间结果已保存到 {OUTPUT_CSV}")
-    return num_matches  # 返回比赛数量
+    parser.print_report()
+    return predictions
 
-def generate_table_visualization(num_matches):
-    """根据中间CSV文件生成可视化表格图片"""
-    # 读取CSV数据
-    df = pd.read_csv(OUTPUT_CSV)
-    num_players = len(df)
-    
-    # 设置字体 - 优先使用系统中文字体
-    global FONT_PATH
-    if FONT_PATH is None:
-        FONT_PATH = find_system_chinese_font()
+@profiled('parse')
+def process_predictions(input_file, output_csv=OUTPUT_CSV, prefetch_avatars=True):
+    """处理原始预测数据，返回内存中的预测表；指定 output_csv 时同时写出中间CSV文件"""
+    # 读取输入CSV文件
+    with open(input_file, mode='r', encoding='utf-8') as infile:
+        predictions = read_submissions(infile, prefetch_avatars)
     
+    # 中间CSV只是附带输出，出图直接使用内存中的数据
+    if output_csv:
+        write_predictions_csv(predictions, output_csv)
+        print(f"预测数据处理完成！中间结果已保存到 {output_csv}")
+    else:
+        print("预测数据处理完成！")
+    return predictions
+
+def table_width(num_matches):
+    """计算总图片宽度（包含左右边距）"""
+    return SIDE_MARGIN * 2 + AVATAR_COL_WIDTH + num_matches * MATCH_COL_WIDTH + (num_matches - 1) * MATCH_COL_SPACING
+
+# 预测图的画法：画在背景图上，没有底色和分割线
+BOARD_STYLE = BoardStyle(HEADER_HEIGHT, ROW_HEIGHT, header_row_y=HEADER_HEIGHT - 100 - 20, header_row_height=100,
+                         avatar_path=avatar_path, logo_path=team_logo, margin=SIDE_MARGIN, col_spacing=MATCH_COL_SPACING,
+                         title="", title_y=30, header_logo_size=80, header_logo_spacing=TEAM_LOGO_SPACING,
+                         pick_logo_size=100, avatar_size=AVATAR_SIZE, name_top=110)
+
+def prediction_board(num_matches, fonts):
+    """预测图：头像昵称列 + 每场比赛一列"""
+    columns = [PlayerColumn(AVATAR_COL_WIDTH, " ")] + [PickColumn(MATCH_COL_WIDTH, i) for i in range(num_matches)]
+    return Board(BOARD_STYLE, columns, fonts)
+
+def draw_header(img, num_matches, fonts, board=None):
+    """在 img 顶部绘制表头（标题、玩家列、每场比赛的两个队伍标志）"""
+    (board or prediction_board(num_matches, fonts)).draw_header(img)
+
+def draw_rows(img, predictions, start, stop, y_offset, fonts, board=None):
+    """绘制第 start 到 stop-1 名玩家的行，第 start 行的顶部位于 y_offset"""
+    board = board or prediction_board(predictions.num_matches, fonts)
+    rows = [BoardRow(predictions.nicknames[row_idx], predictions.row(row_idx)) for row_idx in range(start, stop)]
+    board.draw_rows(img, rows, y_offset, start)
+
+def render_header_strip(num_matches, fonts):
+    """渲染只包含表头的横条，头部背景图缩放到表头大小"""
+    img_width = table_width(num_matches)
+    strip = Image.new('RGBA', (img_width, HEADER_HEIGHT), color=(0, 0, 0, 0))
+    try:
+        head_bg = load_sprite(os.path.join(BACKGROUND_DIR, "head.png"), (img_width, HEADER_HEIGHT), keep_ratio=False)
+        strip.paste(head_bg, (0, 0))
+    except Exception as e:
+        print(f"背景图加载失败: {e}")
+        record_failure('background', e)
+    draw_header(strip, num_matches, fonts)
+    return strip
+
+def render_row_strip(predictions, start, stop, fonts, extra_height=0, body_offset=0, stretch_height=None, board=None):
+    """渲染第 start 到 stop-1 名玩家的横条
+
+    extra_height 是横条底部额外留出的高度，body_offset 是横条顶部相对表格内容顶部的位置。
+    默认底部背景图按原始比例平铺；stretch_height 指定时，背景图和整张图模式一样拉伸到这个高度，
+    横条只取其中对应的一段。连续的横条传入各自的 body_offset，拼起来时背景是连续的。
+    连续渲染多个横条时可以传入同一个 board（prediction_board），布局和格子位置只算一次。
+    """
+    img_width = table_width(predictions.num_matches)
+    strip_height = (stop - start) * ROW_HEIGHT + extra_height
+    strip = Image.new('RGBA', (img_width, strip_height), color=(0, 0, 0, 0))
     try:
-        font_large = ImageFont.truetype(FONT_PATH, 28) if FONT_PATH else ImageFont.load_default(28)
-        font_medium = ImageFont.truetype(FONT_PATH, 22) if FONT_PATH else ImageFont.load_default(22)
-        font_small = ImageFont.truetype(FONT_PATH, 18) if FONT_PATH else ImageFont.load_default(18)
-    except:
-        # 如果字体加载失败，使用默认字体并调整大小
-        default_font = ImageFont.load_default()
-        font_large = default_font.font_variant(size=28)
-        font_medium = default_font.font_variant(size=22)
-        font_small = default_font.font_variant(size=18)
+        if stretch_height:
+            with Image.open(os.path.join(BACKGROUND_DIR, "foot.png")) as foot_bg:
+                # 只缩放背景图中属于这个横条的部分，结果与整张拉伸后再裁剪一致
+                scale = foot_bg.height / stretch_height
+                box = (0, body_offset * scale, foot_bg.width, min((body_offset + strip_height) * scale, foot_bg.height))
+                strip.paste(foot_bg.resize((img_width, strip_height), box=box), (0, 0))
+        else:
+            foot_tile = load_sprite(os.path.join(BACKGROUND_DIR, "foot.png"), (img_width, None))
+            tile_height = foot_tile.height
+            y = -(body_offset % tile_height)
+            while y < strip_height:
+                strip.paste(foot_tile, (0, y))
+                y += tile_height
+    except Exception as e:
+        print(f"背景图加载失败: {e}")
+        record_failure('background', e)
+    draw_rows(strip, predictions, start, stop, 0, fonts, board)
+    return strip
+
+def render_page(header, predictions, start, stop, fonts, board=None):
+    """把表头和第 start 到 stop-1 名玩家拼成一页，board 见 render_row_strip"""
+    body = render_row_strip(predictions, start, stop, fonts, extra_height=FOOTER_HEIGHT, board=board)
+    page = Image.new('RGBA', (header.width, HEADER_HEIGHT + body.height), color=(0, 0, 0, 0))
+    page.paste(header, (0, 0))
+    page.paste(body, (0, HEADER_HEIGHT))
+    return page
+
+def warm_table_assets(num_matches):
+    """预先解码并缩放队伍标志和背景图，放进素材缓存"""
+    for i in range(num_matches):
+        for team in ("left", "right"):
+            for logo_size in (BOARD_STYLE.header_logo_size, BOARD_STYLE.pick_logo_size):  # 表头和表格内容中的图标大小
+                try:
+                    load_sprite(team_logo(i, team), logo_size)
+                except Exception:
+                    pass  # 缺失的图标在绘制时再提示
+    try:
+        load_sprite(os.path.join(BACKGROUND_DIR, "foot.png"), (table_width(num_matches), None))
+    except Exception:
+        pass
+
+_page_headers = {}  # 渲染进程中渲染好的表头：比赛数 -> 表头（分页输出时每页共用）
+_band_boards = {}  # 渲染进程中建好的表格：比赛数 -> Board（各段共用，列中缓存的格子不用每段重新画）
+
+def _band_board(num_matches, fonts):
+    board = _band_boards.get(num_matches)
+    if board is None:
+        board = _band_boards[num_matches] = prediction_board(num_matches, fonts)
+    return board
+
+def _render_band(fonts, band, body_offset, extra_height, stretch_height):
+    """在渲染进程中渲染一段玩家（band 是切出来的预测表）"""
+    return render_row_strip(band, 0, band.num_players, fonts, extra_height, body_offset, stretch_height,
+                            _band_board(band.num_matches, fonts))
+
+def _save_page(fonts, band, output_file, preset=DEFAULT_PRESET, sizes=()):
+    """在渲染进程中渲染并保存一页（以及它的各个缩小尺寸），返回 [(路径, 编码用时, 文件大小)]"""
+    header = _page_headers.get(band.num_matches)
+    if header is None:
+        header = _page_headers[band.num_matches] = render_header_strip(band.num_matches, fonts)
+    page = render_page(header, band, 0, band.num_players, fonts, _band_board(band.num_matches, fonts))
+    return save_image_set(page, output_file, preset, sizes)
+
+def iter_row_strips(predictions, fonts, band_rows=STRIP_ROWS, stretch_height=None, pool=None, window=4):
+    """按从上到下的顺序生成 (起始行, 横条)，最后一个横条带底部额外空间
+
+    pool 不为空时横条在进程池中并行渲染，同时最多有 window 个横条在渲染或等待取走，避免占用过多内存。
+    """
+    num_players = predictions.num_players
+    bands = [(start, min(start + band_rows, num_players)) for start in range(0, max(num_players, 1), band_rows)]
     
-    # 表格尺寸参数（调整后的布局）
-    header_height = 250  # 增加表头高度
-    row_height = 150  # 增加行高
-    avatar_col_width = 180  # 增加头像列宽度
-    match_col_width = 220  # 增加比赛列宽度（从200增加到220）
-    side_margin = 10  # 左右边距各10像素
-    team_logo_spacing = 5  # 同一场比赛两个队伍标志之间的间距（从10减少到5）
-    match_col_spacing = 0  # 不同比赛列之间的间距（增加间距）
+    if pool is None:
+        board = prediction_board(predictions.num_matches, fonts)
+        for start, stop in bands:
+            extra_height = FOOTER_HEIGHT if stop == num_players else 0
+            yield start, render_row_strip(predictions, start, stop, fonts, extra_height,
+                                          start * ROW_HEIGHT, stretch_height, board)
+        return
+    
+    jobs = ((predictions.slice(start, stop), start * ROW_HEIGHT, FOOTER_HEIGHT if stop == num_players else 0, stretch_height)
+            for start, stop in bands)
+    for (start, _), strip in zip(bands, iter_worker_results(pool, _render_band, jobs, window)):
+        yield start, strip
+
+def render_full_image(predictions, fonts, pool=None, window=4):
+    """在一整张画布上绘制表格，底部背景图拉伸到整个表格高度"""
+    num_matches = predictions.num_matches
+    num_players = predictions.num_players
     
     # 计算总图片尺寸（增加左右边距）
-    img_width = side_margin * 2 + avatar_col_width + num_matches * match_col_width + (num_matches - 1) * match_col_spacing
-    img_height = header_height + num_players * row_height + 100  # 增加底部额外空间
+    img_width = table_width(num_matches)
+    img_height = HEADER_HEIGHT + num_players * ROW_HEIGHT + FOOTER_HEIGHT  # 增加底部额外空间
     
     # 创建透明背景
     img = Image.new('RGBA', (img_width, img_height), color=(0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
+    
+    if pool is not None:
+        # 并行模式：表头在本进程渲染，各段玩家在进程池中渲染后按位置拼接
+        img.paste(render_header_strip(num_matches, fonts), (0, 0))
+        for start, strip in iter_row_strips(predictions, fonts, stretch_height=img_height - HEADER_HEIGHT,
+                                            pool=pool, window=window):
+            img.paste(strip, (0, HEADER_HEIGHT + start * ROW_HEIGHT))
+        return img
     
     try:
         # 加载头部背景图
         head_bg = Image.open(os.path.join(BACKGROUND_DIR, "head.png"))
         # 调整头部背景图宽度以匹配表格尺寸
-        head_bg = head_bg.resize((img_width, header_height))  # 使用新的header_height
+        head_bg = head_bg.resize((img_width, HEADER_HEIGHT))  # 使用新的HEADER_HEIGHT
         
         # 加载底部背景图
         foot_bg = Image.open(os.path.join(BACKGROUND_DIR, "foot.png"))
         # 计算底部背景图需要的高度
-        foot_height = img_height - header_height  # 总高度减去头部高度
+        foot_height = img_height - HEADER_HEIGHT  # 总高度减去头部高度
         # 调整底部背景图尺寸
         foot_bg = foot_bg.resize((img_width, foot_height))
         
         # 将头部背景图粘贴到顶部
         img.paste(head_bg, (0, 0))
         # 将底部背景图粘贴到头部下方
-        img.paste(foot_bg, (0, header_height))
+        img.paste(foot_bg, (0, HEADER_HEIGHT))
         
     except Exception as e:
         print(f"背景图加载失败: {e}")
+        record_failure('background', e)
         # 如果背景图加载失败，保持透明背景
     
-    # 绘制标题 - 确保中文显示
-    title = ""
-    bbox = draw.textbbox((0, 0), title, font=font_large)
-    title_width = bbox[2] - bbox[0]
-    title_height = bbox[3] - bbox[1]
-    draw.text((img_width//2 - title_width//2, 30), title, fill=(255, 255, 255), font=font_large)
+    board = prediction_board(num_matches, fonts)
+    draw_header(img, num_matches, fonts, board)
+    draw_rows(img, predictions, 0, num_players, HEADER_HEIGHT, fonts, board)
+    return img
+
+def save_full_image(predictions, fonts, output_image=OUTPUT_IMAGE, pool=None, window=4, preset=DEFAULT_PRESET, sizes=()):
+    """生成一整张图并按编码预设保存，sizes 中的各个缩小尺寸由同一张图缩小得到"""
+    img = render_full_image(predictions, fonts, pool, window)
     
-    # 计算表头第二行的高度和位置
-    header_row2_height = 100  # 固定第二行高度
-    header_row2_y = header_height - header_row2_height - 20  # 从header_height减去第二行高度和额外空间
+    # 保存图片
+    output_image = output_path(output_image, preset)
+    output_files = [path for path, _, _ in save_image_set(img, output_image, preset, sizes)]
+    print(f"已生成透明背景的预测图: {output_image}")
+    if len(output_files) > 1:
+        print(f"缩小尺寸: {', '.join(output_files[1:])}")
+    return output_files
+
+def save_paginated(predictions, rows_per_page, fonts, output_image=OUTPUT_IMAGE, pool=None, preset=DEFAULT_PRESET,
+                   sizes=()):
+    """每页 rows_per_page 行分页输出，每页都带表头，内存只占一页大小；sizes 见 save_full_image"""
+    num_players = predictions.num_players
+    stem, ext = os.path.splitext(output_path(output_image, preset))
+    pages = [(start, min(start + rows_per_page, num_players)) for start in range(0, max(num_players, 1), rows_per_page)]
+    page_files = [f"{stem}_{page_idx + 1}{ext}" for page_idx in range(len(pages))]
+    output_files = []
     
-    # 玩家列标题（添加左边距）
-    player_text = " "
-    bbox = draw.textbbox((0, 0), player_text, font=font_medium)
-    player_text_width = bbox[2] - bbox[0]
-    player_text_height = bbox[3] - bbox[1]
-    draw.text((side_margin + avatar_col_width//2 - player_text_width//2, 
-               header_row2_y + (header_row2_height - player_text_height)//2), 
-              player_text, fill=(255, 255, 255), font=font_medium)
+    if pool is not None:
+        # 并行模式：每页在进程池中渲染并直接保存
+        bands = [predictions.slice(start, stop) for start, stop in pages]
+        jobs = ((band, page_file, preset, sizes) for band, page_file in zip(bands, page_files))
+        for saved in iter_worker_results(pool, _save_page, jobs, window=len(pages)):
+            for path, elapsed, size in saved:
+                encode_stats.record(elapsed, size)
+                output_files.append(path)
+    else:
+        header = render_header_strip(predictions.num_matches, fonts)
+        board = prediction_board(predictions.num_matches, fonts)
+        for (start, stop), page_file in zip(pages, page_files):
+            saved = save_image_set(render_page(header, predictions, start, stop, fonts, board), page_file, preset, sizes)
+            output_files.extend(path for path, _, _ in saved)
     
-    # 绘制表头 - 比赛列
-    for i in range(num_matches):
-        x_start = side_margin + avatar_col_width + i * (match_col_width + match_col_spacing)
-        
-        # 图标大小设置 - 保持原始比例
-        logo_size = 80  # 固定大小
-        
-        try:
-            # 左图标 - 保持原始比例
-            left_logo = Image.open(os.path.join(TEAM_LOGO_DIR, f"match{i+1}_left.png"))
-            # 计算保持比例的缩放
-            left_ratio = min(logo_size / left_logo.width, logo_size / left_logo.height)
-            left_new_width = int(left_logo.width * left_ratio)
-            left_new_height = int(left_logo.height * left_ratio)
-            left_logo = left_logo.resize((left_new_width, left_new_height))
-            
-            # 右图标 - 保持原始比例
-            right_logo = Image.open(os.path.join(TEAM_LOGO_DIR, f"match{i+1}_right.png"))
-            right_ratio = min(logo_size / right_logo.width, logo_size / right_logo.height)
-            right_new_width = int(right_logo.width * right_ratio)
-            right_new_height = int(right_logo.height * right_ratio)
-            right_logo = right_logo.resize((right_new_width, right_new_height))
-            
-            # 计算总宽度和起始位置（使用更小的team_logo_spacing）
-            total_width = left_new_width + right_new_width + team_logo_spacing
-            start_x = x_start + (match_col_width - total_width) // 2
-            
-            # 粘贴左图标
-            img.paste(left_logo, (start_x, 
-                                header_row2_y + (header_row2_height - left_new_height)//2), left_logo)
-            
-            # 粘贴右图标（使用更小的team_logo_spacing）
-            img.paste(right_logo, (start_x + left_new_width + team_logo_spacing, 
-                                header_row2_y + (header_row2_height - right_new_height)//2), right_logo)
-        except Exception as e:
-            print(f"队伍标志加载失败: {e}")
-            # 如果图标加载失败，只绘制文字
-            match_title = f"比赛 {i+1}"
-            bbox = draw.textbbox((0, 0), match_title, font=font_medium)
-            match_title_width = bbox[2] - bbox[0]
-            match_title_height = bbox[3] - bbox[1]
-            draw.text((x_start + (match_col_width - match_title_width) // 2, 
-                      header_row2_y + (header_row2_height - match_title_height) // 2), 
-                     match_title, fill=(255, 255, 255), font=font_medium)
+    print(f"已分 {len(page_files)} 页生成透明背景的预测图: {page_files[0]} ~ {page_files[-1]}")
+    return output_files
+
+def save_streamed(predictions, fonts, output_image=OUTPUT_IMAGE, pool=None, window=4, preset=DEFAULT_PRESET):
+    """逐条渲染并流式写入一张完整的 PNG，内存只占几个横条大小（只支持 PNG 预设）"""
+    num_players = predictions.num_players
+    img_width = table_width(predictions.num_matches)
+    img_height = HEADER_HEIGHT + num_players * ROW_HEIGHT + FOOTER_HEIGHT
+    compress_level = stream_compress_level(preset)
     
-    # 绘制表格内容
-    for row_idx, (_, row) in enumerate(df.iterrows()):
-        nickname = row['昵称']
-        matches = [row[f'第{i+1}场赛'] for i in range(num_matches)]
-        y_start = header_height + row_idx * row_height
+    encode_time = 0.0
+    with StreamingPNGWriter(output_image, img_width, img_height, compress_level=compress_level) as writer:
+        def write(strip):
+            nonlocal encode_time
+            start = time.perf_counter()
+            with profile_stage('encode'):
+                writer.write_strip(strip)
+            encode_time += time.perf_counter() - start
         
-        # 绘制头像（添加左边距）
-        try:
-            avatar = Image.open(os.path.join(AVATAR_DIR, f"{nickname}.png"))
-            # 保持头像比例
-            avatar_ratio = min(80 / avatar.width, 80 / avatar.height)
-            avatar_new_width = int(avatar.width * avatar_ratio)
-            avatar_new_height = int(avatar.height * avatar_ratio)
-            avatar = avatar.resize((avatar_new_width, avatar_new_height))
-            # 使用alpha通道确保透明背景
-            if avatar.mode != 'RGBA':
-                avatar = avatar.convert('RGBA')
-            img.paste(avatar, (side_margin + avatar_col_width//2 - avatar_new_width//2, 
-                              y_start + 20), avatar)
-        except Exception as e:
-            print(f"头像加载失败: {e}")
-            # 如果头像加载失败，绘制透明占位符
-            pass
+        write(render_header_strip(predictions.num_matches, fonts))
+        for _, strip in iter_row_strips(predictions, fonts, pool=pool, window=window):
+            write(strip)
+    encode_stats.record(encode_time, os.path.getsize(output_image))
+    
+    print(f"已分条生成透明背景的预测图: {output_image}")
+    return [output_image]
+
+@profiled('render')
+def generate_table_visualization(predictions, rows_per_page=None, stream=False, workers=1, preset=DEFAULT_PRESET,
+                                 output_image=OUTPUT_IMAGE, sizes=()):
+    """根据预测表生成可视化表格图片，返回输出的文件列表
 
-        # 绘制昵称 （添加左边距）
-        bbox = draw.textbbox((0, 0), nickname, font=font_small)
-        name_width = bbox[2] - bbox[0]
-        name_height = bbox[3] - bbox[1]
-        draw.text((side_margin + avatar_col_width//2 - name_width//2, y_start + 110),  # 在头像下方预留足够空间
-                nickname, fill=(255, 255, 255), font=font_small)
-       
-        # 绘制每场比赛的预测选择
-        for match_idx, choice in enumerate(matches):
-            x_start = side_margin + avatar_col_width + match_idx * (match_col_width + match_col_spacing)
-            
-            # 确定选择的队伍
-            team = "left" if choice == "左" else "right"
-            
-            try:
-                # 加载并绘制所选队伍的完整图标
-                team_logo = Image.open(os.path.join(TEAM_LOGO_DIR, f"match{match_idx+1}_{team}.png"))
-                # 保持原始比例缩放
-                logo_size = 100  # 固定大小
-                logo_ratio = min(logo_size / team_logo.width, logo_size / team_logo.height)
-                logo_new_width = int(team_logo.width * logo_ratio)
-                logo_new_height = int(team_logo.height * logo_ratio)
-                team_logo = team_logo.resize((logo_new_width, logo_new_height))
-                # 使用alpha通道确保透明背景
-                if team_logo.mode != 'RGBA':
-                    team_logo = team_logo.convert('RGBA')
-                img.paste(team_logo, (x_start + match_col_width//2 - logo_new_width//2, 
-                                     y_start + row_height//2 - logo_new_height//2), team_logo)
-            except Exception as e:
-                print(f"预测队伍标志加载失败: {e}")
-                # 如果图标不存在，只绘制文字
-                bbox = draw.textbbox((0, 0), choice, font=font_medium)
-                choice_width = bbox[2] - bbox[0]
-                choice_height = bbox[3] - bbox[1]
-                draw.text((x_start + match_col_width//2 - choice_width//2, 
-                          y_start + row_height//2 - choice_height//2), 
-                         choice, fill=(255, 255, 255), font=font_medium)
+    默认生成一整张图；rows_per_page 指定时分页输出，stream 为 True 时分条流式写入一整张图。
+    后两种模式底部背景图平铺，内存占用与玩家数量无关。
+    workers 大于 1 时按行分段，在多个进程中并行渲染后再拼接。
+    preset 是输出图片的编码预设（见 image_encode.ENCODE_PRESETS）。
+    sizes 是 [(名称, 宽度)]，同一次渲染再输出这些缩小尺寸（如 predictions_table_small.png），流式写入时不支持。
+    """
+    if stream and sizes:
+        raise ValueError("分条流式写入时没有完整的图，不能同时输出缩小尺寸，请去掉 --stream 或 --sizes")
+    fonts = load_table_fonts()
+    set_match_titles(predictions.match_titles, verbose=True)  # 按表头中的队名找到队伍标志
     
-    # 保存图片
-    img.save(OUTPUT_IMAGE)
-    print(f"已生成透明背景的预测图: {OUTPUT_IMAGE}")
+    pool = open_render_pool(workers, predictions.match_titles, warm_table_assets) if workers > 1 else None
+    window = workers * 2
+    try:
+        if rows_per_page:
+            output_files = save_paginated(predictions, rows_per_page, fonts, output_image, pool=pool, preset=preset,
+                                          sizes=sizes)
+        elif stream:
+            output_files = save_streamed(predictions, fonts, output_image, pool=pool, window=window, preset=preset)
+        else:
+            output_files = save_full_image(predictions, fonts, output_image, pool=pool, window=window, preset=preset,
+                                           sizes=sizes)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print_cache_stats()
+    print_encode_stats(preset)
+    return output_files
 
-def main(input_file):
-    """主函数，处理整个流程"""
+@profiled('main')
+def main(input_file, output_csv=OUTPUT_CSV, rows_per_page=None, stream=False, workers=1, cprofile_file=None,
+         preset=DEFAULT_PRESET, sizes=()):
+    """主函数，处理整个流程；cprofile_file 指定时用 cProfile 记录出图部分，sizes 是额外输出的缩小尺寸"""
     # 第一步：处理原始预测数据
-    num_matches = process_predictions(input_file)
+    predictions = process_predictions(input_file, output_csv)
     
     # 第二步：生成可视化表格
-    generate_table_visualization(num_matches)
+    with capture_cprofile(cprofile_file):
+        generate_table_visualization(predictions, rows_per_page, stream, workers, preset, sizes=sizes)
     
     print("所有处理完成！")
+    return predictions
 
 if __name__ == '__main__':
-    import sys
+    import argparse
     
-    if len(sys.argv) < 2:
-        print("请指定输入文件: python script.py input.csv")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="根据腾讯文档导出的CSV生成预测图: python script.py input.csv")
+    parser.add_argument('input_file', help="输入CSV文件")
+    parser.add_argument('--no-csv', action='store_true', help=f"不写出中间CSV文件 {OUTPUT_CSV}")
+    parser.add_argument('--rows-per-page', type=int, help="每页的行数，分页输出多张图片（背景平铺，内存占用固定）")
+    parser.add_argument('--stream', action='store_true', help="分条渲染并流式写入一整张图片（背景平铺，内存占用固定）")
+    parser.add_argument('--workers', type=int, default=1, help="并行渲染的进程数，0 表示使用全部CPU核心")
+    parser.add_argument('--incremental', action='store_true', help="只处理上次之后新增的提交，拼接到上次的图片下方")
+    parser.add_argument('--watch', action='store_true', help="监视输入文件，每次重新导出后增量更新图片")
+    parser.add_argument('--interval', type=float, default=2.0, help="监视模式下检查输入文件的间隔（秒）")
+    parser.add_argument('--encode', choices=list(ENCODE_PRESETS), default=DEFAULT_PRESET,
+                        help="输出编码预设：fast/default/small 为不同压缩级别的PNG，palette 为256色PNG，webp/webp-lossy 为WebP")
+    parser.add_argument('--profile', metavar='JSON', help="把各阶段耗时、解码次数、缓存命中和加载失败写入JSON文件")
+    parser.add_argument('--cprofile', metavar='PROF', help="用 cProfile 记录出图部分，结果保存为 pstats 文件")
+    parser.add_argument('--sizes', nargs='+', default=[], metavar='尺寸',
+                        help=f"同一次渲染再输出缩小的图：{'/'.join(SIZE_PRESETS)}，或 名称=宽度（如 chat=1000），"
+                             "输出为 predictions_table_<名称>.png")
+    args = parser.parse_args()
+    if args.rows_per_page is not None and args.rows_per_page <= 0:
+        parser.error("--rows-per-page 必须是正整数")
+    if args.rows_per_page is not None and args.stream:
+        parser.error("--rows-per-page 不能和 --stream 同时使用")
+    if args.stream:
+        try:
+            stream_compress_level(args.encode)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        sizes = [parse_size(spec) for spec in args.sizes]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.stream and sizes:
+        parser.error("--stream 不能和 --sizes 同时使用")
+    if args.incremental or args.watch:
+        # 增量模式总是在单进程中把新增的行拼接到上次的图片下方，按默认编码保存
+        unsupported = [flag for flag, used in (('--workers', args.workers != 1), ('--stream', args.stream),
+                                               ('--rows-per-page', args.rows_per_page is not None),
+                                               ('--encode', args.encode != DEFAULT_PRESET), ('--sizes', bool(sizes)),
+                                               ('--profile', args.profile is not None),
+                                               ('--cprofile', args.cprofile is not None)) if used]
+        if unsupported:
+            parser.error(f"--incremental/--watch 不能和 {' '.join(unsupported)} 同时使用")
     
-    input_file = sys.argv[1]
-    main(input_file)
\ No newline at end of file
+    output_csv = None if args.no_csv else OUTPUT_CSV
+    if args.incremental or args.watch:
+        from incremental import IncrementalBoard
+        board = IncrementalBoard(args.input_file, output_csv=output_csv)
+        if args.watch:
+            board.watch(args.interval)
+        else:
+            board.refresh()
+    else:
+        workers = args.workers or os.cpu_count() or 1
+        predictions = main(args.input_file, output_csv, args.rows_per_page, args.stream, workers, args.cprofile,
+                           args.encode, sizes)
+        if args.profile:
+            write_profile(args.profile, {
+                'players': predictions.num_players,
+                'matches': predictions.num_matches,
+                'workers': workers,
+                'encode_preset': args.encode,
+                'sizes': dict(sizes),
+                'sprite_cache': sprite_cache.stats(),
+            })
@@ -0,0 +1,291 @@
+"""赛季积分榜：每轮评分后的预测和标准答案追加到紧凑的二进制列式存储，累计成绩增量更新
+
+存储目录（默认 season/）:
+    rounds.json     轮次清单（名称、来源、人数、场数、在各数据文件中的位置）
+    nicknames.json  昵称索引（玩家编号 -> 昵称），同一昵称在整个赛季中编号不变
+    picks.bin       每轮 玩家数 × 比赛数 的 int8 预测编码，按轮次依次追加，可以 memmap 读取
+    players.bin     与 picks.bin 的行一一对应的 int32 玩家编号
+    answers.bin     每轮的 int8 标准答案
+    totals.npz      每个玩家的累计 [参与轮数, 正确场次, 已出结果的场次]，以及累计到了第几轮
+添加一轮只评分这一轮并更新 totals.npz，不需要重新读取以前的CSV；需要时可以用 rebuild 从二进制数据重新累计。
+totals.npz 中记录的轮数与 rounds.json 不一致时（上次添加中途失败），打开赛季时自动从二进制数据重新累计。
+
+用法:
+    python season.py add result.csv --name 第1轮
+    python season.py show --top 20
+    python season.py render --top 50
+"""
+import json
+import os
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+import result
+from board import Board, PlayerColumn, RankColumn, StatColumn, load_table_fonts
+from image_encode import DEFAULT_PRESET, ENCODE_PRESETS, output_path, print_encode_stats, save_image
+from predictions import PICK_UNKNOWN, read_predictions_csv
+from scoring import score_round, split_answer_row
+
+# 配置参数
+SEASON_DIR = "season"  # 赛季数据目录
+SEASON_IMAGE = "season_table.png"  # 积分榜图片
+TOTAL_FIELDS = ('rounds', 'correct', 'decided')  # totals.npz 中累计成绩每列的含义
+
+# 积分榜的列宽，玩家列沿用 result.py 的宽度
+RANK_COL_WIDTH = 90
+STAT_COL_WIDTH = 130
+
+# 积分榜的一行
+LeaderboardRow = namedtuple('LeaderboardRow', ['rank', 'nickname', 'rounds', 'correct', 'decided'])
+
+
+class SeasonStore:
+    """一个赛季的列式存储"""
+
+    def __init__(self, root=SEASON_DIR):
+        self.root = root
+        self.rounds = self._read_json("rounds.json", [])
+        self.nicknames = self._read_json("nicknames.json", [])
+        self.player_ids = {nickname: idx for idx, nickname in enumerate(self.nicknames)}
+        self.totals = self._read_totals()
+
+    # ---- 文件读写 ----
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _read_json(self, name, default):
+        try:
+            with open(self._path(name), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _write_json(self, name, data):
+        tmp_file = self._path(name) + ".tmp"
+        with open(tmp_file, mode='w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self._path(name))
+
+    def _read_totals(self):
+        """读取累计成绩；没有累计过或累计的轮数与清单不一致时从二进制数据重新累计"""
+        try:
+            with np.load(self._path("totals.npz")) as data:
+                totals, num_rounds = data['totals'], int(data['rounds'])
+        except (FileNotFoundError, KeyError, ValueError):
+            totals, num_rounds = np.zeros((0, len(TOTAL_FIELDS)), dtype=np.int32), 0
+        if num_rounds != len(self.rounds):
+            if self.rounds:
+                print(f"累计成绩只包含 {num_rounds} 轮，与清单中的 {len(self.rounds)} 轮不一致，重新累计")
+            self.rebuild_totals()
+            return self.totals
+        if len(totals) < len(self.nicknames):
+            totals = np.vstack([totals, np.zeros((len(self.nicknames) - len(totals), len(TOTAL_FIELDS)), dtype=np.int32)])
+        return totals
+
+    def _write_totals(self):
+        """保存累计成绩和它包含的轮数（写入临时文件后替换，不会只写一半）"""
+        if not os.path.isdir(self.root):
+            return
+        tmp_file = self._path("totals.tmp.npz")
+        np.savez(tmp_file, totals=self.totals, rounds=len(self.rounds))
+        os.replace(tmp_file, self._path("totals.npz"))
+
+    def _append(self, name, expected_size, data):
+        """追加到数据文件末尾；上次写入中断留下的多余数据（清单中没有记录）先截掉"""
+        with open(self._path(name), 'ab') as f:
+            if f.tell() != expected_size:
+                f.truncate(expected_size)
+                f.seek(expected_size)
+            f.write(data)
+
+    def _data_sizes(self):
+        """根据清单计算各数据文件应有的字节数"""
+        if not self.rounds:
+            return 0, 0, 0
+        last = self.rounds[-1]
+        rows = last['row_offset'] + last['players']
+        cells = last['pick_offset'] + last['players'] * last['matches']
+        answers = last['answer_offset'] + last['matches']
+        return cells, rows * 4, answers
+
+    # ---- 读取 ----
+
+    def _memmap(self, name, dtype, offset, count):
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode='r', offset=offset * np.dtype(dtype).itemsize, shape=(count,))
+
+    def round_data(self, round_idx):
+        """返回第 round_idx 轮的 (玩家编号, 预测矩阵, 标准答案)，都是只读的 memmap"""
+        info = self.rounds[round_idx]
+        players = self._memmap("players.bin", np.int32, info['row_offset'], info['players'])
+        picks = self._memmap("picks.bin", np.int8, info['pick_offset'], info['players'] * info['matches'])
+        answers = self._memmap("answers.bin", np.int8, info['answer_offset'], info['matches'])
+        return players, picks.reshape(info['players'], info['matches']), answers
+
+    def find_round(self, name):
+        return next((idx for idx, info in enumerate(self.rounds) if info['name'] == name), None)
+
+    # ---- 写入 ----
+
+    def _player_id(self, nickname):
+        player_id = self.player_ids.get(nickname)
+        if player_id is None:
+            player_id = self.player_ids[nickname] = len(self.nicknames)
+            self.nicknames.append(nickname)
+        return player_id
+
+    def _accumulate(self, players, picks, answers):
+        """把一轮的成绩累加到 totals"""
+        if len(self.totals) < len(self.nicknames):
+            grow = np.zeros((len(self.nicknames) - len(self.totals), len(TOTAL_FIELDS)), dtype=np.int32)
+            self.totals = np.vstack([self.totals, grow])
+        decided = answers != PICK_UNKNOWN
+        correct_counts = ((picks == answers) & decided).sum(axis=1, dtype=np.int32)
+        # 同一轮中玩家编号不重复（添加时已去重），可以直接按编号累加
+        self.totals[players, 0] += 1
+        self.totals[players, 1] += correct_counts
+        self.totals[players, 2] += int(decided.sum())
+
+    def add_round(self, name, predictions, answers, source=None):
+        """添加一轮（predictions 不含标准答案行），同一昵称多次提交时只保留最后一次"""
+        if self.find_round(name) is not None:
+            raise ValueError(f"赛季中已经有名为 {name} 的一轮")
+        os.makedirs(self.root, exist_ok=True)
+
+        last_rows = {}
+        for row_idx, nickname in enumerate(predictions.nicknames):
+            last_rows[nickname] = row_idx
+        rows = sorted(last_rows.values())
+        if len(rows) < predictions.num_players:
+            print(f"{name}: {predictions.num_players - len(rows)} 条重复提交只保留了最后一次")
+
+        # 评分逻辑与 result.py 相同
+        scores = score_round(predictions, answers)
+        picks = np.ascontiguousarray(scores.picks[rows])
+        players = np.array([self._player_id(predictions.nicknames[row]) for row in rows], dtype=np.int32)
+        answers = np.ascontiguousarray(scores.answers)
+
+        pick_size, player_size, answer_size = self._data_sizes()
+        self._append("picks.bin", pick_size, picks.tobytes())
+        self._append("players.bin", player_size, players.tobytes())
+        self._append("answers.bin", answer_size, answers.tobytes())
+
+        info = {
+            'name': name,
+            'source': source,
+            'players': len(rows),
+            'matches': predictions.num_matches,
+            'match_titles': predictions.match_titles,
+            'row_offset': player_size // 4,
+            'pick_offset': pick_size,
+            'answer_offset': answer_size,
+        }
+        self._accumulate(players, picks, answers)
+        # 清单在数据之后写入：中途失败时数据文件末尾多出的部分会在下次添加时截掉；
+        # 累计成绩在清单之后写入，记录的轮数与清单不一致时打开赛季会重新累计
+        self._write_json("nicknames.json", self.nicknames)
+        self.rounds.append(info)
+        self._write_json("rounds.json", self.rounds)
+        self._write_totals()
+        return info
+
+    def rebuild_totals(self):
+        """从二进制数据重新累计所有轮次的成绩（不读取任何CSV）"""
+        self.totals = np.zeros((len(self.nicknames), len(TOTAL_FIELDS)), dtype=np.int32)
+        for round_idx in range(len(self.rounds)):
+            self._accumulate(*self.round_data(round_idx))
+        self._write_totals()
+
+    # ---- 积分榜 ----
+
+    def leaderboard(self, top=None):
+        """返回 [LeaderboardRow(名次, 昵称, 参与轮数, 正确场次, 已出结果场次)]，按正确场次从高到低，同分按首次出现的顺序"""
+        totals = self.totals[:len(self.nicknames)]
+        correct = totals[:, 1]
+        order = np.argsort(-correct, kind='stable')
+        sorted_desc = -correct[order]
+        ranks = np.searchsorted(sorted_desc, -correct[order], side='left') + 1
+        if top:
+            order = order[:top]
+        return [LeaderboardRow(int(rank), self.nicknames[idx], int(totals[idx, 0]), int(totals[idx, 1]), int(totals[idx, 2]))
+                for rank, idx in zip(ranks, order)]
+
+
+def add_result_csv(store, csv_path, name=None):
+    """把 result.csv 格式（第一行是标准答案）的一轮加入赛季"""
+    answers, predictions = split_answer_row(read_predictions_csv(csv_path))
+    name = name or os.path.splitext(os.path.basename(csv_path))[0]
+    info = store.add_round(name, predictions, answers, source=os.path.abspath(csv_path))
+    print(f"已添加 {name}: {info['players']} 人，{info['matches']} 场；赛季共 {len(store.rounds)} 轮，{len(store.nicknames)} 名玩家")
+    return info
+
+
+def accuracy_text(row):
+    """正确率，还没有出结果的场次时为 -"""
+    return f"{row.correct / row.decided:.0%}" if row.decided else "-"
+
+
+def leaderboard_board(fonts, num_rounds):
+    """积分榜：名次、玩家、参与轮数、正确场次、正确率，画法与 result.py 的评分表相同"""
+    columns = [RankColumn(RANK_COL_WIDTH, "名次"), PlayerColumn(result.AVATAR_COL_WIDTH, "玩家"),
+               StatColumn(STAT_COL_WIDTH, "参与轮数", lambda row: str(row.rounds)),
+               StatColumn(STAT_COL_WIDTH, "正确场次", lambda row: str(row.correct)),
+               StatColumn(STAT_COL_WIDTH, "正确率", accuracy_text)]
+    return Board(result.BOARD_STYLE, columns, fonts, title=f"赛季积分榜（{num_rounds} 轮）")
+
+
+def render_leaderboard(rows, num_rounds):
+    """按 result.py 的风格渲染积分榜"""
+    board = leaderboard_board(load_table_fonts(), num_rounds)
+    img = Image.new('RGB', (board.width, board.layout.height(len(rows))), color=(240, 240, 240))
+    board.draw_header(img)
+    board.draw_rows(img, rows, result.HEADER_HEIGHT)
+    return img
+
+
+def print_leaderboard(rows):
+    """以文字形式打印积分榜"""
+    for row in rows:
+        print(f"{row.rank:>4}  {row.nickname}  参与 {row.rounds} 轮  正确 {row.correct} 场  正确率 {accuracy_text(row)}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="赛季积分榜: python season.py add result.csv / show / render")
+    parser.add_argument('--season-dir', default=SEASON_DIR, help="赛季数据目录")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add_parser = commands.add_parser('add', help="添加一轮或多轮（result.csv 格式，第一行是标准答案）")
+    add_parser.add_argument('csv_paths', nargs='+', help="CSV文件")
+    add_parser.add_argument('--name', help="轮次名称（默认用文件名，只添加一个文件时可用）")
+    show_parser = commands.add_parser('show', help="打印积分榜")
+    show_parser.add_argument('--top', type=int, help="只显示前几名")
+    render_parser = commands.add_parser('render', help="生成积分榜图片")
+    render_parser.add_argument('--top', type=int, help="只显示前几名")
+    render_parser.add_argument('--output', default=SEASON_IMAGE, help="输出图片")
+    render_parser.add_argument('--encode', choices=list(ENCODE_PRESETS), default=DEFAULT_PRESET, help="输出编码预设")
+    commands.add_parser('rebuild', help="从二进制数据重新累计成绩")
+    args = parser.parse_args()
+
+    store = SeasonStore(args.season_dir)
+    if args.command == 'add':
+        if args.name and len(args.csv_paths) > 1:
+            parser.error("--name 只能在添加一个文件时使用")
+        try:
+            for csv_path in args.csv_paths:
+                add_result_csv(store, csv_path, args.name)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.command == 'show':
+        print_leaderboard(store.leaderboard(args.top))
+    elif args.command == 'render':
+        img = render_leaderboard(store.leaderboard(args.top), len(store.rounds))
+        output_file = output_path(args.output, args.encode)
+        save_image(img, output_file, args.encode)
+        print(f"已生成赛季积分榜: {output_file}")
+        print_encode_stats(args.encode)
+    elif args.command == 'rebuild':
+        store.rebuild_totals()
+        print(f"已重新累计 {len(store.rounds)} 轮的成绩")
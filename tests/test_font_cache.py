@@ -0,0 +1,25 @@
+import font_cache
+
+
+def test_fallback_font_is_cached_until_missing(tmp_path, monkeypatch):
+    monkeypatch.setattr(font_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(font_cache, "FONT_CACHE_FILE", str(tmp_path / "font.json"))
+    fallback = tmp_path / "DejaVuSans.ttf"
+    fallback.write_bytes(b"")
+    scans = []
+
+    def scan():
+        scans.append(1)
+        return str(fallback) if fallback.exists() else None
+    monkeypatch.setattr(font_cache, "_scan_system_fonts", scan)
+
+    assert font_cache.find_system_chinese_font() == str(fallback)
+    assert font_cache.find_system_chinese_font() == str(fallback)
+    assert len(scans) == 1  # 没有中文字体时也不再每次扫描
+
+    assert font_cache.find_system_chinese_font(refresh=True) == str(fallback)
+    assert len(scans) == 2
+
+    fallback.unlink()
+    assert font_cache.find_system_chinese_font() is None
+    assert len(scans) == 3
@@ -0,0 +1,66 @@
+import csv
+import pytest
+from incremental import IncrementalBoard
+
+HEADERS = ["提交者（自动）", "提交时间（自动）", "昵称", "AWG vs AXIZ 的比分会是？", "RC vs Omni 的比分会是？"]
+ROWS = [
+    ["森林渊子", "2025/4/15 19:49:03", "橘叶", "0：2", "2：0"],
+    ["Fengzhe", "2025/4/15 19:49:22", "官官", "1：1右赢", "2：0"],
+    ["森林渊子", "2025/4/15 19:59:03", "无名", "2：0", "0：2"],
+]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # 素材和缓存都按相对路径查找
+    return tmp_path
+
+
+def write_export(path, rows, tail=""):
+    with open(path, mode='w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows([HEADERS] + rows)
+        f.write(tail)
+
+
+def read_output_csv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+def make_board(workdir):
+    return IncrementalBoard(str(workdir / "input.csv"), output_image=str(workdir / "out.png"),
+                            output_csv=str(workdir / "output.csv"), state_file=str(workdir / "state.json"))
+
+
+def test_growing_export_waits_for_incomplete_rows(workdir):
+    input_file = workdir / "input.csv"
+    write_export(input_file, ROWS[:2])
+    board = make_board(workdir)
+    assert board.refresh() == 2
+
+    # 导出写到一半：最后一行只有提交者和提交时间
+    write_export(input_file, ROWS[:2], tail="森林渊子,2025/4/15 19:59:03\n")
+    assert board.refresh() == 0
+    assert board.state['rows'] == 2
+    assert board.state['last_key'] == ROWS[1][:2]
+
+    # 昵称已经写出，但预测还不全，也不能提前画上去
+    write_export(input_file, ROWS[:2], tail="森林渊子,2025/4/15 19:59:03,无名,2：0\n")
+    assert board.refresh() == 0
+    assert board.state['rows'] == 2
+
+    write_export(input_file, ROWS)
+    assert board.refresh() == 1
+    assert board.state['rows'] == 3
+    assert board.state['last_key'] == ROWS[2][:2]
+    assert read_output_csv(workdir / "output.csv")[1:] == [["橘叶", "右", "左"], ["官官", "右", "左"],
+                                                           ["无名", "左", "右"]]
+
+
+def test_state_survives_restart(workdir):
+    write_export(workdir / "input.csv", ROWS[:1])
+    assert make_board(workdir).refresh() == 1
+    write_export(workdir / "input.csv", ROWS)
+    board = make_board(workdir)
+    assert board.refresh() == 2
+    assert board.state['rows'] == 3
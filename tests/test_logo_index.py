@@ -0,0 +1,78 @@
+import os
+import pytest
+import logo_index
+from logo_index import LogoIndex, parse_matchup
+
+LOGO_FILES = ["200px-Arneb_with_WoG_LOGO.png", "200px-RealizeDream_LOGO（COAⅥ）.png", "Rival_Esports.png",
+              "Flash_Wolves.png", "match1_left.png"]
+
+
+@pytest.fixture
+def logo_dir(tmp_path):
+    logo_dir = tmp_path / "teams"
+    logo_dir.mkdir()
+    for filename in LOGO_FILES:
+        (logo_dir / filename).write_bytes(b"")
+    return logo_dir
+
+
+def make_index(tmp_path, logo_dir, alias_file=None):
+    return LogoIndex(logo_dirs=[str(logo_dir)], index_file=str(tmp_path / "logo_index.json"),
+                     alias_file=str(alias_file) if alias_file else None)
+
+
+@pytest.mark.parametrize("title, teams", [
+    ("NAVS vs FL", ("NAVS", "FL")),  # vs 不从 NAVS 中间断开
+    ("RVL VS FL", ("RVL", "FL")),
+    ("Team Vs. GG比分", ("Team", "GG")),
+    ("AWG vs AXIZ 的比分会是？", ("AWG", "AXIZ")),
+    ("第一场", None),
+])
+def test_parse_matchup(title, teams):
+    assert parse_matchup(title) == teams
+
+
+@pytest.mark.parametrize("team, filename", [
+    ("AWG", "200px-Arneb_with_WoG_LOGO.png"),  # 队名中的大写字母
+    ("RD", "200px-RealizeDream_LOGO（COAⅥ）.png"),
+    ("COAⅥ", "200px-RealizeDream_LOGO（COAⅥ）.png"),  # 括号中的名字
+    ("RVL", "Rival_Esports.png"),  # 按字母顺序匹配
+    ("FL", None),  # 太短，只认别名
+])
+def test_resolve(tmp_path, logo_dir, team, filename):
+    index = make_index(tmp_path, logo_dir)
+    expected = str(logo_dir / filename) if filename else None
+    assert index.resolve(team) == expected
+
+
+def test_match_files_are_not_indexed(tmp_path, logo_dir):
+    index = make_index(tmp_path, logo_dir)
+    assert index.resolve("match1_left") is None
+
+
+def test_manual_aliases(tmp_path, logo_dir):
+    alias_file = tmp_path / "team_aliases.csv"
+    alias_file.write_text("# 表头中的队名,标志文件名或队名\nFL,Flash_Wolves.png\n狼队,Flash Wolves\n", encoding='utf-8')
+    index = make_index(tmp_path, logo_dir, alias_file)
+    assert index.match_logos(["NAVS vs FL", "狼队 vs RD"]) == [
+        {'right': str(logo_dir / "Flash_Wolves.png")},
+        {'left': str(logo_dir / "Flash_Wolves.png"), 'right': str(logo_dir / "200px-RealizeDream_LOGO（COAⅥ）.png")},
+    ]
+
+
+def test_rebuilds_when_directory_changes(tmp_path, logo_dir, monkeypatch):
+    monkeypatch.setattr(logo_index, "DIR_RECHECK_INTERVAL", 0)
+    index = make_index(tmp_path, logo_dir)
+    assert index.resolve("NAVS") is None
+    generation = index.generation
+
+    (logo_dir / "NAVS.png").write_bytes(b"")
+    stat = os.stat(logo_dir)
+    os.utime(logo_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))  # 保证修改时间一定变化
+    assert index.resolve("NAVS") == str(logo_dir / "NAVS.png")
+    assert index.generation == generation + 1
+
+    # 新的进程读取磁盘上的索引，不需要重新扫描
+    cached = make_index(tmp_path, logo_dir)
+    monkeypatch.setattr(LogoIndex, "scan_dir", staticmethod(lambda _: pytest.fail("不应重新扫描")))
+    assert cached.resolve("NAVS") == str(logo_dir / "NAVS.png")
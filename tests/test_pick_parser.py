@@ -0,0 +1,36 @@
+import pytest
+from pick_parser import PickParser, classify_answer
+from predictions import PICK_DRAW, PICK_LEFT, PICK_RIGHT, PICK_UNKNOWN
+
+
+@pytest.mark.parametrize("text, outcome, left_score, right_score", [
+    ("2-0", PICK_LEFT, 2, 0),
+    ("0:2", PICK_RIGHT, 0, 2),
+    ("1：1", PICK_DRAW, 1, 1),  # 全角冒号
+    ("２：１", PICK_LEFT, 2, 1),  # 全角数字
+    (" 1 : 3 ", PICK_RIGHT, 1, 3),
+    ("3比2", PICK_LEFT, 3, 2),
+    ("1：1左赢", PICK_LEFT, 1, 1),  # 关键字优先于比分
+    ("2:0右", PICK_RIGHT, 2, 0),
+    ("右边赢…", PICK_RIGHT, None, None),
+    ("左", PICK_LEFT, None, None),
+    ("", PICK_UNKNOWN, None, None),
+    ("不知道", PICK_UNKNOWN, None, None),
+])
+def test_classify_answer(text, outcome, left_score, right_score):
+    assert classify_answer(text) == (outcome, left_score, right_score)
+
+
+def test_parse_row_records_malformed_cells():
+    parser = PickParser()
+    picks = parser.parse_row(["2:0", "???", "1：1"], 4, line_number=5)
+    assert picks == [PICK_LEFT, PICK_UNKNOWN, PICK_DRAW, PICK_UNKNOWN]
+    assert parser.malformed == [(5, 2, "???"), (5, 4, "")]
+
+
+def test_parse_memoizes_identical_answers():
+    parser = PickParser()
+    for _ in range(3):
+        parser.parse_row(["2:0", "0:2"], 2)
+    assert parser.cells == 6
+    assert parser.unique_answers == 2
@@ -0,0 +1,76 @@
+import itertools
+import random
+import pytest
+from predictions import PICK_DRAW, PICK_LEFT, PICK_RIGHT, PICK_UNKNOWN, Predictions
+from scoring import score_round
+
+np = pytest.importorskip("numpy")
+from scenarios import analyze_round  # noqa: E402
+
+CODES = [PICK_UNKNOWN, PICK_LEFT, PICK_RIGHT, PICK_DRAW]
+
+
+def random_scores(num_players, num_matches, num_open, seed, codes=CODES):
+    rng = random.Random(seed)
+    predictions = Predictions([f"第{i + 1}场" for i in range(num_matches)])
+    for player_idx in range(num_players):
+        predictions.add(f"玩家{player_idx}", [rng.choice(codes) for _ in range(num_matches)])
+    answers = [rng.choice([PICK_LEFT, PICK_RIGHT]) for _ in range(num_matches)]
+    for match_idx in rng.sample(range(num_matches), num_open):
+        answers[match_idx] = PICK_UNKNOWN
+    return score_round(predictions, answers)
+
+
+def brute_force(scores, top_n, left_probability):
+    """逐个枚举剩余比赛的所有结果，按定义计算最好名次和进入前 top_n 名的概率"""
+    picks = scores.picks.tolist()
+    answers = scores.answers.tolist()
+    open_matches = [idx for idx, answer in enumerate(answers) if answer == PICK_UNKNOWN]
+    best = [len(picks)] * len(picks)
+    probability = [0.0] * len(picks)
+    for outcome in itertools.product([PICK_LEFT, PICK_RIGHT], repeat=len(open_matches)):
+        final = list(answers)
+        weight = 1.0
+        for match_idx, result, p_left in zip(open_matches, outcome, left_probability):
+            final[match_idx] = result
+            weight *= p_left if result == PICK_LEFT else 1 - p_left
+        points = [sum(pick == answer for pick, answer in zip(row, final)) for row in picks]
+        for player_idx, score in enumerate(points):
+            rank = 1 + sum(other > score for other in points)
+            best[player_idx] = min(best[player_idx], rank)
+            if rank <= top_n:
+                probability[player_idx] += weight
+    return best, probability
+
+
+@pytest.mark.parametrize("num_players, num_matches, num_open, seed", [
+    (1, 3, 2, 0),
+    (6, 4, 0, 1),
+    (10, 6, 3, 2),
+    (25, 8, 6, 3),
+    (40, 12, 10, 4),
+])
+@pytest.mark.parametrize("uniform", [True, False])
+def test_exact_mode_matches_brute_force(num_players, num_matches, num_open, seed, uniform):
+    scores = random_scores(num_players, num_matches, num_open, seed)
+    rng = random.Random(seed)
+    left_probability = [0.5 if uniform else rng.uniform(0.1, 0.9) for _ in range(num_open)]
+    top_n = 3
+
+    report = analyze_round(scores, top_n, samples=1 << num_open, left_probability=left_probability)
+    best, probability = brute_force(scores, top_n, left_probability)
+
+    assert report.exact
+    assert report.scenarios == 1 << num_open
+    assert report.best_ranks.tolist() == best
+    assert report.top_probability.tolist() == pytest.approx(probability)
+
+
+def test_sampling_keeps_exact_best_ranks():
+    # 每场都选了一方时，最好名次就是自己所选的一方全部获胜时的名次，抽样时也是精确的
+    scores = random_scores(30, 10, 8, 5, codes=[PICK_LEFT, PICK_RIGHT])
+    report = analyze_round(scores, 3, samples=64)
+    best, _ = brute_force(scores, 3, [0.5] * 8)
+    assert not report.exact
+    assert report.scenarios == 64
+    assert report.best_ranks.tolist() == best
@@ -0,0 +1,52 @@
+import math
+import random
+import pytest
+from predictions import PICK_DRAW, PICK_LEFT, PICK_RIGHT, PICK_UNKNOWN, Predictions
+from scoring import score_round
+
+np = pytest.importorskip("numpy")
+
+CODES = [PICK_UNKNOWN, PICK_LEFT, PICK_RIGHT, PICK_DRAW]
+
+
+def random_round(num_players, num_matches, seed):
+    rng = random.Random(seed)
+    predictions = Predictions([f"第{i + 1}场" for i in range(num_matches)])
+    for player_idx in range(num_players):
+        predictions.add(f"玩家{player_idx}", [rng.choice(CODES) for _ in range(num_matches)])
+    answers = [rng.choice([PICK_UNKNOWN, PICK_LEFT, PICK_RIGHT]) for _ in range(num_matches)]
+    return predictions, answers
+
+
+@pytest.mark.parametrize("num_players, num_matches, seed", [(0, 3, 0), (1, 1, 1), (12, 4, 2), (200, 9, 3)])
+def test_light_mode_matches_numpy(num_players, num_matches, seed):
+    predictions, answers = random_round(num_players, num_matches, seed)
+    fast = score_round(predictions, answers)
+    light = score_round(predictions, answers, light=True)
+
+    assert [list(row) for row in light.picks] == fast.picks.tolist()
+    assert list(light.answers) == fast.answers.tolist()
+    assert light.correct == fast.correct.tolist()
+    assert light.correct_counts == fast.correct_counts.tolist()
+    assert list(light.order) == fast.order.tolist()
+    assert list(light.ranks) == fast.ranks.tolist()
+    for light_accuracy, fast_accuracy in zip(light.match_accuracy, fast.match_accuracy.tolist()):
+        assert (math.isnan(light_accuracy) and math.isnan(fast_accuracy)) or light_accuracy == pytest.approx(fast_accuracy)
+
+
+def test_ties_share_rank_and_keep_submission_order():
+    predictions = Predictions(["第1场", "第2场"])
+    for nickname, picks in [("甲", [PICK_LEFT, PICK_RIGHT]), ("乙", [PICK_LEFT, PICK_LEFT]),
+                            ("丙", [PICK_RIGHT, PICK_RIGHT]), ("丁", [PICK_LEFT, PICK_RIGHT])]:
+        predictions.add(nickname, picks)
+    for light in (False, True):
+        scores = score_round(predictions, [PICK_LEFT, PICK_RIGHT], light=light)
+        assert list(scores.order) == [0, 3, 1, 2]
+        assert list(scores.ranks) == [1, 3, 3, 1]
+
+
+@pytest.mark.parametrize("light", [False, True])
+def test_answer_count_must_match(light):
+    predictions, _ = random_round(3, 4, 0)
+    with pytest.raises(ValueError):
+        score_round(predictions, [PICK_LEFT] * 3, light=light)
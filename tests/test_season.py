@@ -0,0 +1,93 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from predictions import PICK_DRAW, PICK_LEFT, PICK_RIGHT, PICK_UNKNOWN, Predictions
+from season import SeasonStore
+
+L, R, D, U = PICK_LEFT, PICK_RIGHT, PICK_DRAW, PICK_UNKNOWN
+
+
+def make_round(rows, num_matches):
+    predictions = Predictions([f"A vs B {i}" for i in range(num_matches)])
+    for nickname, picks in rows:
+        predictions.add(nickname, picks)
+    return predictions
+
+
+ROUND_1 = make_round([("甲", [L, R, L]), ("乙", [R, R, D]), ("甲", [L, L, L])], 3)  # 甲的第二次提交覆盖第一次
+ANSWERS_1 = [L, L, U]
+ROUND_2 = make_round([("丙", [R, L]), ("乙", [L, L])], 2)
+ANSWERS_2 = [L, L]
+
+
+@pytest.fixture
+def season_dir(tmp_path):
+    return str(tmp_path / "season")
+
+
+def add_both_rounds(season_dir):
+    store = SeasonStore(season_dir)
+    store.add_round("r1", ROUND_1, ANSWERS_1)
+    store.add_round("r2", ROUND_2, ANSWERS_2)
+    return store
+
+
+def totals_by_name(store):
+    return {row.nickname: (row.rounds, row.correct, row.decided) for row in store.leaderboard()}
+
+
+EXPECTED_TOTALS = {"甲": (1, 2, 2), "乙": (2, 2, 4), "丙": (1, 1, 2)}
+
+
+def test_offsets_and_round_data(season_dir):
+    store = add_both_rounds(season_dir)
+    assert [(info['row_offset'], info['pick_offset'], info['answer_offset']) for info in store.rounds] == [
+        (0, 0, 0), (2, 6, 3)]
+    assert store.nicknames == ["乙", "甲", "丙"]  # 按保留下来的提交的顺序编号
+
+    players, picks, answers = SeasonStore(season_dir).round_data(1)
+    assert players.tolist() == [2, 0]
+    assert picks.tolist() == [[R, L], [L, L]]
+    assert answers.tolist() == ANSWERS_2
+    assert totals_by_name(store) == EXPECTED_TOTALS
+
+
+def test_append_truncates_half_written_round(season_dir):
+    store = SeasonStore(season_dir)
+    store.add_round("r1", ROUND_1, ANSWERS_1)
+    # 上次添加写了一半数据就中断了，清单中没有记录
+    for name in ("picks.bin", "players.bin"):
+        with open(os.path.join(season_dir, name), 'ab') as f:
+            f.write(b"\x7f" * 5)
+
+    store = SeasonStore(season_dir)
+    store.add_round("r2", ROUND_2, ANSWERS_2)
+    assert os.path.getsize(os.path.join(season_dir, "picks.bin")) == 6 + 4
+    assert os.path.getsize(os.path.join(season_dir, "players.bin")) == (2 + 2) * 4
+    players, picks, _ = store.round_data(1)
+    assert players.tolist() == [2, 0]
+    assert picks.tolist() == [[R, L], [L, L]]
+
+
+def test_missing_totals_are_rebuilt(season_dir):
+    add_both_rounds(season_dir)
+    os.remove(os.path.join(season_dir, "totals.npz"))
+    store = SeasonStore(season_dir)
+    assert totals_by_name(store) == EXPECTED_TOTALS
+    assert os.path.exists(os.path.join(season_dir, "totals.npz"))
+
+
+def test_stale_totals_are_rebuilt(season_dir):
+    store = SeasonStore(season_dir)
+    store.add_round("r1", ROUND_1, ANSWERS_1)
+    stale = os.path.join(os.path.dirname(season_dir), "totals_r1.npz")
+    shutil.copy(os.path.join(season_dir, "totals.npz"), stale)
+    store.add_round("r2", ROUND_2, ANSWERS_2)
+    # 添加第二轮时清单已经写入，累计成绩没有写入
+    shutil.copy(stale, os.path.join(season_dir, "totals.npz"))
+
+    store = SeasonStore(season_dir)
+    assert totals_by_name(store) == EXPECTED_TOTALS
+    with np.load(os.path.join(season_dir, "totals.npz")) as data:
+        assert int(data['rounds']) == 2
@@ -0,0 +1,94 @@
+"""文字缓存：测量好的文字边界和预先光栅化的文字蒙版按 (文字, 字体) 缓存，重复的文字只需要粘贴一次
+
+大号 TrueType 中文字体排版一段文字的开销比粘贴一张小图大得多，表头、数字、“头像”占位符等文字每张图都一样，
+服务和监视模式下昵称也会反复出现。蒙版是 L 模式的灰度图（即 draw.text 画出的覆盖度），
+颜色在粘贴时才填充，所以同一段文字换颜色也共用一份蒙版；粘贴结果与 draw.text 逐像素相同。
+"""
+from collections import OrderedDict
+from PIL import Image, ImageDraw
+from profiler import count_event
+
+# 配置参数
+TEXT_CACHE_SIZE = 4096  # 最多缓存的文字蒙版数量，超出后淘汰最久未使用的
+
+
+class TextCache:
+    """带 LRU 淘汰的文字边界和文字蒙版缓存"""
+
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._bboxes = OrderedDict()  # (文字, 字体) -> 边界
+        self._sprites = OrderedDict()  # (文字, 字体) -> (蒙版, 左上角偏移)，空白文字的蒙版为 None
+        self._measure = ImageDraw.Draw(Image.new('L', (1, 1)))  # 只用来测量文字
+
+    def _remember(self, items, key, value):
+        items[key] = value
+        if len(items) > self.maxsize:
+            items.popitem(last=False)
+
+    def bbox(self, text, font):
+        """与 draw.textbbox((0, 0), text, font=font) 相同"""
+        key = (text, font)
+        bbox = self._bboxes.get(key)
+        if bbox is None:
+            bbox = self._measure.textbbox((0, 0), text, font=font)
+            self._remember(self._bboxes, key, bbox)
+        else:
+            self._bboxes.move_to_end(key)
+        return bbox
+
+    def sprite(self, text, font):
+        """返回 (蒙版, (左, 上))：文字画在 (x, y) 时，蒙版的左上角在 (x + 左, y + 上)"""
+        key = (text, font)
+        cached = self._sprites.get(key)
+        if cached is not None:
+            self.hits += 1
+            count_event('text_sprite_hit')
+            self._sprites.move_to_end(key)
+            return cached
+
+        self.misses += 1
+        count_event('text_render')
+        left, top, right, bottom = self.bbox(text, font)
+        mask = None
+        if right > left and bottom > top:
+            mask = Image.new('L', (right - left, bottom - top), 0)
+            ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+        cached = (mask, (left, top))
+        self._remember(self._sprites, key, cached)
+        return cached
+
+    def draw(self, img, xy, text, fill, font):
+        """在 img 上与 draw.text(xy, text, fill=fill, font=font) 一样画出文字（xy 需要是整数）"""
+        mask, (left, top) = self.sprite(text, font)
+        if mask is None:
+            return
+        x, y = xy[0] + left, xy[1] + top
+        img.paste(fill, (x, y, x + mask.width, y + mask.height), mask)
+
+    def clear(self):
+        """清空缓存和计数"""
+        self._bboxes.clear()
+        self._sprites.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """返回命中/未命中次数和当前缓存数量"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._sprites)}
+
+
+# 进程内共用的缓存实例
+text_cache = TextCache()
+
+
+def text_bbox(text, font):
+    """从共用缓存中取文字边界，与 draw.textbbox((0, 0), text, font=font) 相同"""
+    return text_cache.bbox(text, font)
+
+
+def draw_text(img, xy, text, fill, font):
+    """用共用缓存中的文字蒙版画文字，参数同 TextCache.draw"""
+    text_cache.draw(img, xy, text, fill, font)